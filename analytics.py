@@ -0,0 +1,187 @@
+"""
+analytics.py
+
+This module is the shared analytics engine behind analyze.py and visuals.py.
+
+It loads the newest chart week, the albums it references and the
+materialized artist aggregates once, in one pass over a single connection,
+into pandas DataFrames, and computes every dataset the reports and charts
+need with vectorized operations:
+- Billboard rank vs Spotify popularity
+- Album release date vs rank, and chart songs per release year and month
+- Number of chart songs per artist
+- Total Spotify popularity per artist
+
+Results are memoized for the rest of the process. Before answering, the
+engine reads SQLite's PRAGMA data_version, which changes whenever another
+connection commits, and reloads only if the database has changed.
+"""
+import numpy as np
+import pandas as pd
+from database import connect
+import metrics
+
+DB_NAME = "music_data.sqlite"
+
+class AnalyticsEngine:
+    """
+    Loads the base tables once and memoizes every derived dataset until the
+    database changes.
+    """
+
+    def __init__(self, db_name=DB_NAME):
+        self.db_name = db_name
+        # Read-only, so dashboards never take a lock that could stall an ingest
+        self.conn = connect(db_name, read_only=True, check_same_thread=False)
+        self._data_version = None
+        self._tables = None
+        self._results = {}
+
+    def close(self):
+        """
+        Closes the engine's connection.
+        """
+        self.conn.close()
+
+    def _refresh(self):
+        """
+        Reloads the base tables if another connection has committed since the last load.
+        """
+        version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+        if version == self._data_version and self._tables is not None:
+            return
+        self._tables = self._load_tables()
+        self._results = {}
+        self._data_version = version
+
+    @metrics.timed('analytics.load')
+    def _load_tables(self):
+        """
+        Reads the newest chart week and the rows it references.
+
+        Returns:
+            dict: 'entries', 'albums' and 'artist_stats' DataFrames
+        """
+        # One read transaction, so all three frames see the same snapshot
+        self.conn.execute("BEGIN")
+        entries = pd.read_sql_query("""
+            SELECT id AS song_id, album_id, rank, popularity
+            FROM LatestChart
+            ORDER BY rank
+        """, self.conn)
+        albums = pd.read_sql_query("""
+            SELECT id AS album_id, release_date
+            FROM Albums
+            WHERE release_date IS NOT NULL
+              AND id IN (SELECT album_id FROM LatestChart)
+        """, self.conn)
+        # Already aggregated per artist by ingest, so this is one row per artist
+        artist_stats = pd.read_sql_query("""
+            SELECT artist_id, artist, song_count, total_popularity
+            FROM LatestArtistStats
+            ORDER BY artist_id
+        """, self.conn)
+        self.conn.execute("COMMIT")
+        return {'entries': entries, 'albums': albums, 'artist_stats': artist_stats}
+
+    def _memoized(self, name, compute):
+        """
+        Returns the cached result `name`, computing it from the base tables on first use.
+
+        Callers get a copy, so one that edits its DataFrame in place cannot
+        change what the next caller sees.
+        """
+        self._refresh()
+        if name not in self._results:
+            self._results[name] = compute(self._tables)
+        return self._results[name].copy()
+
+    def rank_vs_popularity(self):
+        """
+        Returns:
+            pd.DataFrame: 'rank' and 'popularity' for every song with a popularity, by rank
+        """
+        def compute(t):
+            entries = t['entries'].dropna(subset=['popularity'])
+            return pd.DataFrame({
+                'rank': entries['rank'].astype('int64'),
+                'popularity': entries['popularity'].astype('int64'),
+            }).reset_index(drop=True)
+        return self._memoized('rank_vs_popularity', compute)
+
+    def album_release_vs_rank(self):
+        """
+        Returns:
+            pd.DataFrame: 'rank' and 'release_date' for every song with a known album
+            release date, ordered by release date
+        """
+        def compute(t):
+            merged = t['entries'].merge(t['albums'], on='album_id', how='inner')
+            merged = merged.sort_values(['release_date', 'rank'], kind='mergesort')
+            return merged[['rank', 'release_date']].reset_index(drop=True)
+        return self._memoized('album_release_vs_rank', compute)
+
+    def release_month_counts(self):
+        """
+        Buckets the chart songs by album release year and month with one
+        bincount, whatever range of years the data spans.
+
+        Returns:
+            pd.DataFrame: 'year', 'month' (1-12, or 0 for year-only release dates)
+            and 'songs', 13 rows for every year that has a chart song, by year and month
+        """
+        def compute(t):
+            dates = t['entries'].merge(t['albums'], on='album_id', how='inner')['release_date']
+            years = pd.to_numeric(dates.str[:4], errors='coerce')
+            months = pd.to_numeric(dates.str[5:7], errors='coerce').fillna(0)
+            known = years.notna()
+            years = years[known].to_numpy(dtype=np.int64)
+            months = months[known].to_numpy(dtype=np.int64)
+            if len(years) == 0:
+                return pd.DataFrame({'year': [], 'month': [], 'songs': []}, dtype='int64')
+            first = years.min()
+            counts = np.bincount((years - first) * 13 + months,
+                                 minlength=(years.max() - first + 1) * 13).reshape(-1, 13)
+            present = np.nonzero(counts.sum(axis=1))[0]
+            return pd.DataFrame({
+                'year': np.repeat(present + first, 13),
+                'month': np.tile(np.arange(13), len(present)),
+                'songs': counts[present].ravel(),
+            })
+        return self._memoized('release_month_counts', compute)
+
+    def top_artists_by_song_count(self):
+        """
+        Returns:
+            pd.DataFrame: 'artist' and 'song_count', most songs first
+        """
+        def compute(t):
+            totals = t['artist_stats'].sort_values('song_count', ascending=False, kind='mergesort')
+            return totals[['artist', 'song_count']].reset_index(drop=True)
+        return self._memoized('top_artists_by_song_count', compute)
+
+    def artist_popularity_sum(self):
+        """
+        Returns:
+            pd.DataFrame: 'artist' and 'total_popularity', most popular first
+        """
+        def compute(t):
+            totals = t['artist_stats'].sort_values('total_popularity', ascending=False, kind='mergesort')
+            return totals[['artist', 'total_popularity']].reset_index(drop=True)
+        return self._memoized('artist_popularity_sum', compute)
+
+_engines = {}
+
+def get_engine(db_name=DB_NAME):
+    """
+    Returns the process-wide engine for a database file, creating it on first use.
+
+    Args:
+        db_name (str): Database file (default: music_data.sqlite)
+
+    Returns:
+        AnalyticsEngine: Shared engine
+    """
+    if db_name not in _engines:
+        _engines[db_name] = AnalyticsEngine(db_name)
+    return _engines[db_name]
@@ -4,13 +4,19 @@ analyze.py
 This module performs analysis on the normalized SQLite database (music_data.sqlite)
 created from Billboard and Spotify data.
 
+All datasets come from the shared engine in analytics.py, which loads the
+newest chart week that has Spotify data once per process and memoizes the
+results until the database changes.
+
 It uses pandas to:
 - Query and transform SQL data for analysis
 - Export a summary text file
+- Summarize the full chart history in bounded memory (see streaming.py)
 - Provide clean DataFrames for plotting and reporting
 """
-import sqlite3
-import pandas as pd
+from analytics import get_engine
+from streaming import summarize_history
+import metrics
 
 DB_NAME = "music_data.sqlite"
 
@@ -22,14 +28,7 @@ def get_rank_vs_popularity():
         pd.DataFrame: Contains two columns - 'rank' and 'popularity'
 
     """
-    conn = sqlite3.connect(DB_NAME)
-    df = pd.read_sql_query("""
-        SELECT rank, popularity
-        FROM Songs
-        WHERE popularity IS NOT NULL
-    """, conn)
-    conn.close()
-    return df
+    return get_engine(DB_NAME).rank_vs_popularity()
 
 def get_album_release_vs_rank():
     """
@@ -38,15 +37,7 @@ def get_album_release_vs_rank():
     Returns:
         pd.DataFrame: Contains two columns - 'rank' and 'release_date'
     """
-    conn = sqlite3.connect(DB_NAME)
-    df = pd.read_sql_query("""
-        SELECT Songs.rank, Albums.release_date
-        FROM Songs
-        JOIN Albums ON Songs.album_id = Albums.id
-        WHERE Albums.release_date IS NOT NULL
-    """, conn)
-    conn.close()
-    return df
+    return get_engine(DB_NAME).album_release_vs_rank()
 
 def get_top_artists_by_song_count():
     """
@@ -55,17 +46,7 @@ def get_top_artists_by_song_count():
     Returns:
         pd.DataFrame: Contains 'artist' and 'song_count'
     """
-    conn = sqlite3.connect(DB_NAME)
-    df = pd.read_sql_query("""
-        SELECT Artists.name AS artist, COUNT(*) AS song_count
-        FROM Songs
-        JOIN ArtistTopTracks ON Songs.name = ArtistTopTracks.track_name
-        JOIN Artists ON ArtistTopTracks.artist_id = Artists.id
-        GROUP BY Artists.name
-        ORDER BY song_count DESC
-    """, conn)
-    conn.close()
-    return df
+    return get_engine(DB_NAME).top_artists_by_song_count()
 
 def get_artist_popularity_sum():
     """
@@ -74,18 +55,9 @@ def get_artist_popularity_sum():
     Returns:
         pd.DataFrame: Contains 'artist' and 'total_popularity'
     """
-    conn = sqlite3.connect(DB_NAME)
-    df = pd.read_sql_query("""
-        SELECT Artists.name AS artist, SUM(Songs.popularity) AS total_popularity
-        FROM Songs
-        JOIN ArtistTopTracks ON Songs.name = ArtistTopTracks.track_name
-        JOIN Artists ON ArtistTopTracks.artist_id = Artists.id
-        GROUP BY Artists.name
-        ORDER BY total_popularity DESC
-    """, conn)
-    conn.close()
-    return df
+    return get_engine(DB_NAME).artist_popularity_sum()
 
+@metrics.timed('analyze.summary')
 def export_summary_text():
     """
     Writes a summary of the top 10 artists by song count and popularity to a text file.
@@ -103,6 +75,48 @@ def export_summary_text():
         f.write(popular_artists.to_string(index=False))
     print("✅ Summary written to analysis_summary.txt")
 
+@metrics.timed('analyze.history')
+def export_history_summary_text(start=None, end=None, chunksize=100_000):
+    """
+    Writes a summary of every stored chart week, read in chunks so memory
+    stays flat however long the history is.
+
+    Args:
+        start (str): First chart date to include, YYYY-MM-DD (default: all weeks)
+        end (str): Last chart date to include, YYYY-MM-DD (default: all weeks)
+        chunksize (int): Rows held in memory at once (default: 100,000)
+
+    Output:
+        history_summary.txt - Text file containing readable tables
+    """
+    summary = summarize_history(DB_NAME, start, end, chunksize)
+    artists = summary['artists']
+    popular = artists.sort_values('total_popularity', ascending=False, kind='mergesort')
+
+    with open("history_summary.txt", "w") as f:
+        f.write(f"Chart entries with Spotify popularity: {summary['entries']}\n")
+        f.write(f"Rank vs popularity correlation: {summary['rank_popularity_corr']:.3f}\n")
+        f.write("\nTop 10 Artists by # of Chart Entries:\n")
+        f.write(artists[['artist', 'entry_count']].head(10).to_string(index=False))
+        f.write("\n\nTop 10 Artists by Total Popularity:\n")
+        f.write(popular[['artist', 'total_popularity']].head(10).to_string(index=False))
+    print("✅ History summary written to history_summary.txt")
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Write the analysis summaries.")
+    parser.add_argument('--history', action='store_true',
+                        help="summarize every stored week (history_summary.txt) instead of the latest one")
+    parser.add_argument('--start', help="with --history, first chart date (YYYY-MM-DD)")
+    parser.add_argument('--end', help="with --history, last chart date (YYYY-MM-DD)")
+    parser.add_argument('--chunksize', type=int, default=100_000, help="with --history, rows per chunk (default: 100,000)")
+    args = parser.parse_args(argv)
+
+    if args.history:
+        export_history_summary_text(args.start, args.end, args.chunksize)
+    else:
+        export_summary_text()
+
 # Run this only when executing directly
 if __name__ == "__main__":
-    export_summary_text()
+    main()
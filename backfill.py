@@ -0,0 +1,192 @@
+"""
+backfill.py
+
+This module loads historical weekly Billboard Hot 100 charts into the
+Songs and ChartEntries tables of music_data.sqlite.
+
+How it works:
+- Pages are fetched from /charts/hot-100/<YYYY-MM-DD>/ by a bounded pool of
+  threads sharing one pooled requests session.
+- Each downloaded page is parsed in a process pool, so HTML parsing does not
+  compete with the fetch threads for the GIL.
+- Parsed weeks are written and committed one at a time as they finish, so an
+  interrupted backfill keeps everything loaded so far and skips it next time.
+
+Usage:
+    python backfill.py 2024-01-06 2024-12-28 --workers 8
+    python backfill.py 2024-01-06 2024-02-03 --base-url http://127.0.0.1:8000
+"""
+import argparse
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from datetime import date, timedelta
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from billboard import parse_chart
+from database import DB_NAME, MusicStore, chart_saturday, create_music_db
+
+BILLBOARD_URL = "https://www.billboard.com"
+
+def chart_dates(start, end):
+    """
+    Lists every weekly chart date between two dates.
+
+    Args:
+        start (str or date): First date, moved forward to its chart Saturday
+        end (str or date): Last date (inclusive)
+
+    Returns:
+        list of str: Chart dates as YYYY-MM-DD
+    """
+    if isinstance(start, str):
+        start = date.fromisoformat(start)
+    if isinstance(end, str):
+        end = date.fromisoformat(end)
+    day = date.fromisoformat(chart_saturday(start))
+    dates = []
+    while day <= end:
+        dates.append(day.isoformat())
+        day += timedelta(weeks=1)
+    return dates
+
+def chart_url(chart_date, base_url=BILLBOARD_URL):
+    """
+    Args:
+        chart_date (str): Chart week, YYYY-MM-DD
+        base_url (str): Billboard site, or a local fixture server
+
+    Returns:
+        str: URL of that week's Hot 100 page
+    """
+    return f"{base_url.rstrip('/')}/charts/hot-100/{chart_date}/"
+
+def make_session(max_workers):
+    """
+    Builds a requests session whose connection pool fits every fetch thread
+    and which retries transient server errors.
+
+    Args:
+        max_workers (int): Number of concurrent fetch threads
+
+    Returns:
+        requests.Session: Pooled HTTP session
+    """
+    session = requests.Session()
+    retry = Retry(total=3, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504))
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers, max_retries=retry)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+def _fetch(session, url):
+    response = session.get(url, timeout=30)
+    response.raise_for_status()
+    return response.content
+
+def iter_charts(dates, max_workers=8, processes=None, base_url=BILLBOARD_URL, backend=None):
+    """
+    Fetches and parses many weekly charts concurrently.
+
+    At most 2 * max_workers weeks are in flight at once, so memory stays
+    bounded however long the date range is.
+
+    Args:
+        dates (iterable of str): Chart dates to load
+        max_workers (int): Concurrent HTTP requests (default: 8)
+        processes (int): Parser processes (default: one per CPU)
+        base_url (str): Billboard site, or a local fixture server
+        backend (str): Parser backend name from billboard.PARSERS
+
+    Yields:
+        tuple: (chart date, songs dict), or (chart date, exception) for a
+        week that could not be fetched or parsed, in completion order
+    """
+    session = make_session(max_workers)
+    dates = iter(dates)
+    window = max_workers * 2
+    fetching = {}
+    parsing = {}
+
+    with session, ThreadPoolExecutor(max_workers=max_workers) as fetchers, \
+            ProcessPoolExecutor(max_workers=processes) as parsers:
+        def fill():
+            while len(fetching) + len(parsing) < window:
+                chart_date = next(dates, None)
+                if chart_date is None:
+                    return
+                fetching[fetchers.submit(_fetch, session, chart_url(chart_date, base_url))] = chart_date
+
+        fill()
+        while fetching or parsing:
+            done, _ = wait(list(fetching) + list(parsing), return_when=FIRST_COMPLETED)
+            for future in done:
+                if future in fetching:
+                    chart_date = fetching.pop(future)
+                    try:
+                        html = future.result()
+                    except Exception as e:
+                        yield chart_date, e
+                        continue
+                    parsing[parsers.submit(parse_chart, html, backend)] = chart_date
+                else:
+                    chart_date = parsing.pop(future)
+                    try:
+                        yield chart_date, future.result()
+                    except Exception as e:
+                        yield chart_date, e
+            fill()
+
+def backfill(start, end, db_name=DB_NAME, max_workers=8, processes=None, base_url=BILLBOARD_URL, backend=None):
+    """
+    Loads every weekly chart between two dates into ChartEntries.
+
+    Weeks already stored are skipped, and each week is committed as soon
+    as it is parsed.
+
+    Args:
+        start (str): First chart date, YYYY-MM-DD
+        end (str): Last chart date, YYYY-MM-DD
+        db_name (str): Database file (default: music_data.sqlite)
+        max_workers (int): Concurrent HTTP requests (default: 8)
+        processes (int): Parser processes (default: one per CPU)
+        base_url (str): Billboard site, or a local fixture server
+        backend (str): Parser backend name from billboard.PARSERS
+
+    Returns:
+        tuple: (weeks loaded, rows inserted, list of (date, error) for failed weeks)
+    """
+    create_music_db(db_name)
+    weeks = 0
+    rows = 0
+    failures = []
+    with MusicStore(db_name) as store:
+        stored = store.stored_chart_dates()
+        dates = [d for d in chart_dates(start, end) if d not in stored]
+        for chart_date, songs in iter_charts(dates, max_workers, processes, base_url, backend):
+            if isinstance(songs, Exception):
+                failures.append((chart_date, songs))
+                continue
+            rows += store.insert_chart(chart_date, songs)
+            store.commit()
+            weeks += 1
+    return weeks, rows, failures
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backfill weekly Billboard Hot 100 charts.")
+    parser.add_argument('start', help="first chart date, YYYY-MM-DD")
+    parser.add_argument('end', help="last chart date, YYYY-MM-DD")
+    parser.add_argument('--workers', type=int, default=8, help="concurrent HTTP requests (default: 8)")
+    parser.add_argument('--processes', type=int, default=None, help="parser processes (default: one per CPU)")
+    parser.add_argument('--base-url', default=BILLBOARD_URL, help="Billboard site or local fixture server")
+    parser.add_argument('--db', default=DB_NAME, help="database file (default: music_data.sqlite)")
+    args = parser.parse_args(argv)
+
+    weeks, rows, failures = backfill(args.start, args.end, args.db, args.workers, args.processes, args.base_url)
+    for chart_date, error in failures:
+        print(f"⚠️  {chart_date}: {error}")
+    print(f"✅ Loaded {weeks} weekly charts ({rows} rows) into {args.db}")
+
+if __name__ == "__main__":
+    main()
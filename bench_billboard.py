@@ -0,0 +1,117 @@
+"""
+bench_billboard.py
+
+Micro-benchmark for the Billboard chart parser backends in billboard.py.
+
+Parses a stored chart page with every registered backend, checks that they
+all agree, and prints the best time per backend and its speedup over the
+original approach (a full html.parser tree of the whole page).
+
+Usage:
+    python bench_billboard.py                 # synthetic Hot 100 page
+    python bench_billboard.py hot100.html     # page saved with billboard.save_snapshot
+"""
+import argparse
+import time
+
+from bs4 import BeautifulSoup
+
+from billboard import PARSERS, ROW_CLASS, DETAILS_CLASS, LABEL_CLASS, TITLE_CLASS, _song_entry, load_snapshot
+
+def parse_chart_original(html):
+    """
+    INPUT: chart page html
+    OUTPUT: songs dictionary, parsed the way top_hundred_songs used to (whole page, html.parser)
+    """
+    soup = BeautifulSoup(html, 'html.parser')
+    songs = {}
+    for tag in soup.find_all('div', class_=ROW_CLASS):
+        data = tag.find('span', class_=LABEL_CLASS)
+        details = tag.find('ul', class_=DETAILS_CLASS)
+        title = details.find('h3', class_=TITLE_CLASS)
+        label = details.find('span', class_=LABEL_CLASS)
+        name, info = _song_entry(data.text if data else None, title.text if title else None,
+                                 label.text if label else None)
+        songs[name] = info
+    return songs
+
+def sample_chart_html(rows=100, filler_blocks=400):
+    """
+    INPUT: number of chart rows, number of non-chart blocks around them
+    OUTPUT: html bytes shaped like the live Hot 100 page (same classes, nesting and whitespace)
+    """
+    filler = "".join(
+        f'<div class="lrv-u-flex a-font-secondary"><a href="/music/{i}">Story {i}</a>'
+        f'<p class="c-tagline">Related coverage {i}</p></div>'
+        for i in range(filler_blocks)
+    )
+    parts = ['<html><head><title>Billboard Hot 100</title></head><body>', filler]
+    for rank in range(1, rows + 1):
+        artists = f"Artist {rank % 37} FEATURING Guest {rank % 11}" if rank % 3 == 0 else f"Artist {rank % 37} &amp; Duo {rank % 7}"
+        parts.append(f'''
+<div class="o-chart-results-list-row-container">
+  <ul class="o-chart-results-list-row // lrv-a-unstyle-list lrv-u-flex u-height-97">
+    <li class="o-chart-results-list__item // lrv-u-background-color-black">
+      <span class="c-label  a-font-primary-bold-l u-font-size-32@tablet">
+\t\n\t{rank}\t</span>
+    </li>
+    <li class="lrv-u-width-100p">
+      <ul class="lrv-a-unstyle-list lrv-u-flex lrv-u-height-100p lrv-u-flex-direction-column@mobile-max">
+        <li class="o-chart-results-list__item // lrv-u-flex-grow-1">
+          <h3 id="title-of-a-story" class="c-title  a-no-trucate a-font-primary-bold-s">
+\t\n\t\tSong Title {rank}\t\t\n\t</h3>
+          <span class="c-label  a-no-trucate a-font-primary-s">
+\t\n\t{artists}\n</span>
+        </li>
+        <li class="o-chart-results-list__item"><span class="c-label">{rank + 1}</span></li>
+      </ul>
+    </li>
+  </ul>
+</div>''')
+    parts.append(filler + '</body></html>')
+    return "".join(parts).encode("utf-8")
+
+def time_backend(parser, html, repeat):
+    """
+    INPUT: parser function, page html, number of runs
+    OUTPUT: tuple of (best run time in seconds, parse result)
+    """
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = parser(html)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark Billboard chart parser backends.")
+    parser.add_argument('snapshot', nargs='?', help="saved chart page (default: synthetic Hot 100 page)")
+    parser.add_argument('--repeat', type=int, default=20, help="runs per backend, best is reported (default: 20)")
+    args = parser.parse_args(argv)
+
+    html = load_snapshot(args.snapshot) if args.snapshot else sample_chart_html()
+    print(f"Parsing {len(html) / 1024:.0f} KiB page, best of {args.repeat} runs")
+
+    timings = {}
+    results = {}
+    backends = dict(original=parse_chart_original, **PARSERS)
+    for name, backend in backends.items():
+        try:
+            timings[name], results[name] = time_backend(backend, html, args.repeat)
+        except ImportError as e:
+            print(f"  {name:>8}: skipped ({e})")
+
+    baseline = timings['original']
+    for name, seconds in timings.items():
+        print(f"  {name:>8}: {seconds * 1000:8.2f} ms  {len(results[name])} songs  {baseline / seconds:5.1f}x")
+
+    if len({repr(r) for r in results.values()}) > 1:
+        print("❌ Backends disagree on the parsed chart")
+        return 1
+    print("✅ All backends produced the same chart")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,178 @@
+"""
+bench_streaming.py
+
+Peak-memory benchmark for the chunked history analyses in streaming.py.
+
+For each size it builds a synthetic database with that many chart entries,
+then summarizes it in a fresh child process and reports the child's peak
+resident memory (RSS) and run time. With chunked reads the peak should stay
+roughly flat as the row count grows by orders of magnitude. For comparison,
+the eager approach (one read_sql_query over the whole history) is also
+measured up to --eager-limit rows.
+
+Usage:
+    python bench_streaming.py                          # 10^5, 10^6 and 10^7 rows
+    python bench_streaming.py --sizes 100000 1000000 --chunksize 50000
+"""
+import argparse
+import os
+import resource
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+from database import create_music_db
+
+SIZES = (10 ** 5, 10 ** 6, 10 ** 7)
+
+def build_synthetic_db(path, rows, artists=5000, albums=20000, seed=0):
+    """
+    Creates a database with `rows` chart entries spread over 100-row weeks.
+
+    Song credits follow synthetic.py's artist distribution (the same Zipf
+    sampler, exponent and share of featured artists), so the per-artist
+    aggregates see the same skew as the other benchmarks. Rows are bulk
+    inserted rather than simulated week by week through synthetic.populate,
+    which would take hours at 10^7 rows.
+
+    Args:
+        path (str): Database file to create (overwritten)
+        rows (int): Number of ChartEntries rows
+        artists (int): Number of distinct artists
+        albums (int): Number of distinct albums
+        seed (int): Random seed (default: 0)
+
+    Returns:
+        str: The database path
+    """
+    # Imported here so the measured child processes never load them
+    import numpy as np
+    from synthetic import FEATURED_SHARE, FIRST_CHART, ZIPF_S, zipf_sampler
+
+    if os.path.exists(path):
+        os.remove(path)
+    create_music_db(path)
+    songs = max(rows // 10, 100)
+    rng = np.random.default_rng(seed)
+    draw_artist = zipf_sampler(artists, ZIPF_S, rng)
+    leads = draw_artist(songs) + 1
+    guests = draw_artist(songs) + 1
+    featured = (rng.random(songs) < FEATURED_SHARE) & (guests != leads)
+
+    conn = sqlite3.connect(path)
+    # The materialized artist stats are not read here, so skip their upkeep
+    for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'").fetchall():
+        conn.execute(f"DROP TRIGGER {name}")
+    conn.executescript(f"""
+        PRAGMA journal_mode = OFF;
+        PRAGMA synchronous = OFF;
+        BEGIN;
+        WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < {artists})
+        INSERT INTO Artists (id, name) SELECT i, 'Artist ' || i FROM n;
+        WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < {albums})
+        INSERT INTO Albums (id, name, release_date)
+        SELECT i, 'Album ' || i,
+               CASE WHEN i % 10 = 0 THEN printf('%04d', 1960 + i % 65)
+                    ELSE printf('%04d-%02d-01', 1960 + i % 65, 1 + i % 12) END
+        FROM n;
+    """)
+    conn.executemany("INSERT INTO Songs (id, name, artists, album_id) VALUES (?, ?, ?, ?)", (
+        (i + 1, f"Song {i + 1}",
+         f"Artist {lead} FEATURING Artist {guest}" if feat else f"Artist {lead}", 1 + (i + 1) % albums)
+        for i, (lead, guest, feat) in enumerate(zip(leads.tolist(), guests.tolist(), featured.tolist()))
+    ))
+    # Positions count from 1 (lead) as in MusicStore.insert_song_artists
+    conn.executemany("INSERT INTO SongArtists (song_id, artist_id, position) VALUES (?, ?, ?)", (
+        (i + 1, lead, 1) for i, lead in enumerate(leads.tolist())
+    ))
+    conn.executemany("INSERT INTO SongArtists (song_id, artist_id, position) VALUES (?, ?, ?)", (
+        (int(i) + 1, int(guests[i]), 2) for i in np.flatnonzero(featured)
+    ))
+    # About 5% of entries have no Spotify popularity, as in synthetic.py
+    conn.execute(f"""
+        WITH RECURSIVE n(i) AS (SELECT 0 UNION ALL SELECT i + 1 FROM n WHERE i < {rows - 1})
+        INSERT INTO ChartEntries (chart_date, rank, song_id, popularity)
+        SELECT date('{FIRST_CHART}', '+' || ((i / 100) * 7) || ' days'), i % 100 + 1,
+               1 + abs(random()) % {songs},
+               CASE WHEN i % 20 = 0 THEN NULL ELSE 100 - i % 100 + abs(random()) % 20 - 10 END
+        FROM n
+    """)
+    conn.commit()
+    conn.close()
+    return path
+
+def _summarize_eager(db_name):
+    """
+    The non-chunked equivalent: loads every entry and artist link at once.
+    """
+    import pandas as pd
+    conn = sqlite3.connect(db_name)
+    entries = pd.read_sql_query("""
+        SELECT ChartEntries.rank, ChartEntries.popularity, Albums.release_date
+        FROM ChartEntries
+        JOIN Songs ON Songs.id = ChartEntries.song_id
+        LEFT JOIN Albums ON Albums.id = Songs.album_id
+    """, conn)
+    links = pd.read_sql_query("""
+        SELECT Artists.name AS artist, ChartEntries.popularity
+        FROM ChartEntries
+        JOIN SongArtists ON SongArtists.song_id = ChartEntries.song_id
+        JOIN Artists ON Artists.id = SongArtists.artist_id
+    """, conn)
+    conn.close()
+    entries['rank'].corr(entries['popularity'])
+    links.groupby('artist')['popularity'].agg(['count', 'sum'])
+
+def child(db_name, mode, chunksize):
+    """
+    Runs one summary and prints "<seconds> <peak RSS in KiB>".
+    """
+    start = time.perf_counter()
+    if mode == 'streaming':
+        from streaming import summarize_history
+        summarize_history(db_name, chunksize=chunksize)
+    else:
+        _summarize_eager(db_name)
+    elapsed = time.perf_counter() - start
+    print(f"{elapsed:.3f} {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}")
+
+def measure(db_name, mode, chunksize):
+    """
+    Returns:
+        tuple: (seconds, peak RSS in MiB) of a summary run in a fresh process
+    """
+    out = subprocess.run(
+        [sys.executable, __file__, '--child', db_name, '--mode', mode, '--chunksize', str(chunksize)],
+        check=True, capture_output=True, text=True,
+    ).stdout.split()
+    return float(out[0]), int(out[1]) / 1024
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark peak memory of the chunked history analyses.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(SIZES), help="chart entry counts (default: 10^5 10^6 10^7)")
+    parser.add_argument('--chunksize', type=int, default=100_000, help="rows per chunk (default: 100,000)")
+    parser.add_argument('--eager-limit', type=int, default=10 ** 6, help="largest size to also run without chunking (default: 10^6)")
+    parser.add_argument('--dir', default=None, help="where to build the synthetic databases (default: a temp dir)")
+    parser.add_argument('--child', metavar='DB', help=argparse.SUPPRESS)
+    parser.add_argument('--mode', default='streaming', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        child(args.child, args.mode, args.chunksize)
+        return 0
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as workdir:
+        print(f"{'rows':>10}  {'mode':>9}  {'time':>8}  {'peak RSS':>9}")
+        for rows in args.sizes:
+            db_name = build_synthetic_db(os.path.join(workdir, f"bench_{rows}.sqlite"), rows)
+            modes = ['streaming'] + (['eager'] if rows <= args.eager_limit else [])
+            for mode in modes:
+                seconds, peak = measure(db_name, mode, args.chunksize)
+                print(f"{rows:>10}  {mode:>9}  {seconds:7.2f}s  {peak:6.0f} MiB")
+            os.remove(db_name)
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,247 @@
+"""
+bench_suite.py
+
+End-to-end benchmark of the database, analysis and chart code at several
+data sizes, on synthetic weekly charts from synthetic.py.
+
+For every scale (a number of chart weeks, 100 entries each) it builds a
+fresh database and times:
+- insert: writing every week through pipeline.load_batch and MusicStore,
+  the ingest write path with its triggers and indexes (data generation is
+  not counted)
+- analyze.latest_week: a cold analytics engine computing every dataset
+  behind analyze.py and the charts
+- analyze.history: the chunked full-history summary (analyze.py --history)
+- render.<chart>: drawing each chart of visuals.py headlessly, with the
+  engine already warm
+
+Results are written as JSON. If a baseline file exists, every benchmark is
+compared with it and the ones that got slower by more than --tolerance
+are flagged, and the exit status is 1, so the suite can gate a build.
+Timings are machine specific, so save the baseline on the machine that
+will run the comparison.
+
+Usage:
+    python bench_suite.py --save-baseline          # record bench_baseline.json
+    python bench_suite.py                          # compare against it
+    python bench_suite.py --scales 52 520 10000    # up to one million chart entries
+"""
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from database import create_music_db, MusicStore
+from pipeline import load_batch
+from synthetic import CHART_SIZE, generate_weeks
+
+SCALES = (52, 520, 2600)
+RESULTS_NAME = 'bench_results.json'
+BASELINE_NAME = 'bench_baseline.json'
+
+# Differences smaller than this are timer noise, whatever the ratio
+MIN_DELTA = 0.005
+
+def time_insert(db_name, weeks, seed=0, commit_every=52):
+    """
+    Builds a synthetic database, timing only the writes.
+
+    Args:
+        db_name (str): Database file to create
+        weeks (int): Number of chart weeks
+        seed (int): Generator seed (default: 0)
+        commit_every (int): Weeks per transaction (default: 52)
+
+    Returns:
+        float: Seconds spent in load_batch and commits
+    """
+    create_music_db(db_name)
+    spent = 0.0
+    with MusicStore(db_name) as store:
+        for week, (chart_date, billboard_data, song_db, artist_db) in enumerate(generate_weeks(weeks, seed=seed)):
+            start = time.perf_counter()
+            load_batch(store, chart_date, billboard_data, song_db, artist_db)
+            if (week + 1) % commit_every == 0 or week + 1 == weeks:
+                store.commit()
+            spent += time.perf_counter() - start
+    return spent
+
+def time_runs(func, repeat):
+    """
+    Returns:
+        list of float: Seconds taken by each of `repeat` calls to func
+    """
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        runs.append(time.perf_counter() - start)
+    return runs
+
+def _result(scale, name, runs, rows):
+    return {
+        'scale': scale,
+        'benchmark': name,
+        'best': min(runs),
+        'median': statistics.median(runs),
+        'runs': runs,
+        'rows': rows,
+    }
+
+def run_scale(workdir, weeks, repeat=3, seed=0):
+    """
+    Runs every benchmark at one scale.
+
+    Args:
+        workdir (str): Directory for the database and rendered charts
+        weeks (int): Number of chart weeks
+        repeat (int): Runs per analysis and render benchmark (default: 3)
+        seed (int): Generator seed (default: 0)
+
+    Returns:
+        list of dict: One result per benchmark
+    """
+    from analytics import AnalyticsEngine, get_engine
+    from streaming import summarize_history
+    import visuals
+
+    db_name = os.path.join(workdir, f"bench_{weeks}.sqlite")
+    rows = weeks * CHART_SIZE
+    results = [_result(weeks, 'insert', [time_insert(db_name, weeks, seed)], rows)]
+
+    def latest_week():
+        engine = AnalyticsEngine(db_name)
+        engine.rank_vs_popularity()
+        engine.album_release_vs_rank()
+        engine.release_month_counts()
+        engine.top_artists_by_song_count()
+        engine.artist_popularity_sum()
+        engine.close()
+
+    results.append(_result(weeks, 'analyze.latest_week', time_runs(latest_week, repeat), rows))
+    results.append(_result(weeks, 'analyze.history',
+                           time_runs(lambda: summarize_history(db_name), repeat), rows))
+
+    out_dir = os.path.join(workdir, f"charts_{weeks}")
+    os.makedirs(out_dir, exist_ok=True)
+    for name in visuals.CHARTS:
+        # The first render also loads the shared engine, so it is not timed
+        visuals.render_chart(name, out_dir, db_path=db_name)
+        runs = time_runs(lambda: visuals.render_chart(name, out_dir, db_path=db_name), repeat)
+        results.append(_result(weeks, f"render.{name}", runs, rows))
+    get_engine(db_name).close()
+    return results
+
+def environment():
+    """
+    Returns:
+        dict: Versions of everything that affects the timings
+    """
+    import matplotlib
+    import numpy
+    import pandas
+    return {
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'numpy': numpy.__version__,
+        'pandas': pandas.__version__,
+        'matplotlib': matplotlib.__version__,
+        'machine': platform.machine(),
+        'system': platform.system(),
+        'processor': platform.processor(),
+    }
+
+def compare(results, baseline, tolerance):
+    """
+    Compares best times with a baseline report.
+
+    Args:
+        results (list of dict): Results from run_scale
+        baseline (dict): An earlier report written by this script
+        tolerance (float): Allowed slowdown, e.g. 0.25 for 25%
+
+    Returns:
+        list of tuple: (result, baseline best seconds or None, regressed) per result
+    """
+    previous = {(r['scale'], r['benchmark']): r['best'] for r in baseline.get('results', [])}
+    rows = []
+    for result in results:
+        before = previous.get((result['scale'], result['benchmark']))
+        regressed = (before is not None and result['best'] > before * (1 + tolerance)
+                     and result['best'] - before > MIN_DELTA)
+        rows.append((result, before, regressed))
+    return rows
+
+def print_report(rows):
+    """
+    Prints one line per benchmark, with the change against the baseline if there is one.
+    """
+    print(f"{'weeks':>6}  {'benchmark':<40} {'best':>9} {'median':>9} {'baseline':>9} {'change':>8}")
+    for result, before, regressed in rows:
+        line = (f"{result['scale']:>6}  {result['benchmark']:<40} {result['best'] * 1000:7.1f}ms "
+                f"{result['median'] * 1000:7.1f}ms")
+        if before is not None:
+            line += f" {before * 1000:7.1f}ms {(result['best'] / before - 1) * 100:+7.1f}%"
+        if regressed:
+            line += "  ⚠️  slower than baseline"
+        print(line)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark inserts, analyses and chart renders at several data sizes.")
+    parser.add_argument('--scales', type=int, nargs='+', default=list(SCALES),
+                        help="chart weeks per scale, 100 entries each (default: 52 520 2600)")
+    parser.add_argument('--repeat', type=int, default=3, help="runs per analysis and render benchmark (default: 3)")
+    parser.add_argument('--seed', type=int, default=0, help="synthetic data seed (default: 0)")
+    parser.add_argument('--out', default=RESULTS_NAME, help=f"results file (default: {RESULTS_NAME})")
+    parser.add_argument('--baseline', default=BASELINE_NAME, help=f"baseline to compare with (default: {BASELINE_NAME})")
+    parser.add_argument('--save-baseline', action='store_true', help="also write the results as the new baseline")
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help="slowdown flagged as a regression, as a fraction (default: 0.25)")
+    parser.add_argument('--dir', default=None, help="where to build the databases (default: a temp dir)")
+    args = parser.parse_args(argv)
+
+    results = []
+    with tempfile.TemporaryDirectory(dir=args.dir) as workdir:
+        for weeks in args.scales:
+            print(f"⏳ {weeks} weeks ({weeks * CHART_SIZE} chart entries)...", file=sys.stderr)
+            results.extend(run_scale(workdir, weeks, args.repeat, args.seed))
+
+    report = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'environment': environment(),
+        'seed': args.seed,
+        'repeat': args.repeat,
+        'results': results,
+    }
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+
+    baseline = {}
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get('environment') != report['environment']:
+            print(f"⚠️  {args.baseline} was recorded with different versions or hardware", file=sys.stderr)
+    rows = compare(results, baseline, args.tolerance)
+    print_report(rows)
+    print(f"✅ Results written to {args.out}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Baseline saved to {args.baseline}")
+        return 0
+    regressions = sum(regressed for _, _, regressed in rows)
+    if regressions:
+        print(f"❌ {regressions} benchmark(s) slower than {args.baseline} by more than {args.tolerance:.0%}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,9 +1,14 @@
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 import re
-import unittest
 import os
+import json
+import hashlib
+import importlib.util
+from datetime import datetime
 import requests
 
+import metrics
+
 """
 If you are getting "encoding errors" while trying to open, read, or write from a file, add the following argument to any of your open() functions:
     encoding="utf-8-sig"
@@ -13,41 +18,277 @@ An example of that within the function would be:
 
 """
 
-def top_hundred_songs(): 
+CHART_URL = "https://www.billboard.com/charts/hot-100/"
+
+# ETag, Last-Modified, content hash and parse result of every fetched chart page
+PAGE_CACHE = "billboard_cache.json"
+
+# Class names used by the chart markup, shared by every parser backend
+ROW_CLASS = 'o-chart-results-list-row-container'
+DETAILS_CLASS = 'lrv-a-unstyle-list lrv-u-flex lrv-u-height-100p lrv-u-flex-direction-column@mobile-max'
+LABEL_CLASS = 'c-label'
+TITLE_CLASS = 'c-title'
+TAGLINE_CLASS = 'c-tagline'
+
+# Splits "A FEATURING B, C & D" into its artists
+ARTIST_SPLIT = re.compile(r'\s*FEATURING\s*|,\s*|&\s*')
+
+# The chart week is printed as "Week of 2024-01-06" (or "Week of January 6, 2024")
+WEEK_OF = re.compile(r'Week of\s+(.+?)\s*$')
+WEEK_FORMATS = ('%Y-%m-%d', '%B %d, %Y', '%m/%d/%Y')
+
+# Only chart rows and taglines are turned into a tree, the rest of the page is skipped.
+# While parsing, the strainer sees the whole class attribute, so match one class in it
+ROW_STRAINER = SoupStrainer(['div', 'p'], class_=re.compile(rf'(^|\s)({ROW_CLASS}|{TAGLINE_CLASS})(\s|$)'))
+
+@metrics.timed('billboard.fetch')
+def fetch_chart_html(url=CHART_URL, session=None):
     """
-    INPUT: none
-    OUTPUT: a dictionary called songs, where each song has a dictionary with an integer ranking value and a list of their artists
+    INPUT: chart url (default: current Hot 100), optional requests session
+    OUTPUT: raw chart page html as bytes
     """
-    # make beautiful soup
-    url = f"https://www.billboard.com/charts/hot-100/"
-    r = requests.get(url)
-    soup = BeautifulSoup(r.content, 'html.parser')
+    r = (session or requests).get(url)
+    return r.content
+
+def save_snapshot(path, url=CHART_URL):
+    """
+    INPUT: file path, chart url
+    OUTPUT: writes the chart page html to path so it can be parsed offline later
+    """
+    html = fetch_chart_html(url)
+    with open(path, "wb") as f:
+        f.write(html)
+    return html
+
+def load_snapshot(path):
+    """
+    INPUT: path of a saved chart page
+    OUTPUT: the page html as bytes
+    """
+    with open(path, "rb") as f:
+        return f.read()
+
+def _song_entry(ranking_text, title_text, artist_text):
+    """
+    INPUT: raw text of a row's rank label, title and artist label (or None)
+    OUTPUT: tuple of (song name, {"ranking", "artists"})
+    """
+    ranking = int(ranking_text) if ranking_text else 0
+    songName = title_text.strip('\n\t') if title_text is not None else ""
+    artists = []
+    if artist_text is not None:
+        for artist in ARTIST_SPLIT.split(artist_text.strip('\n\t')):
+            artists.append(artist.rstrip())
+    return songName, {"ranking" : ranking, "artists" : artists}
+
+def _chart_week(taglines):
+    """
+    INPUT: text of the page's taglines
+    OUTPUT: the chart week as YYYY-MM-DD from the first "Week of ..." tagline, or None
+    """
+    for text in taglines:
+        match = WEEK_OF.match(text.strip())
+        if match is None:
+            continue
+        for fmt in WEEK_FORMATS:
+            try:
+                return datetime.strptime(match.group(1), fmt).date().isoformat()
+            except ValueError:
+                pass
+    return None
+
+def parse_chart_bs4(html, with_week=False):
+    """
+    INPUT: chart page html, whether to also return the chart week
+    OUTPUT: songs dictionary, parsed with BeautifulSoup's html.parser
+        (with_week: tuple of (songs dictionary, chart week or None))
+    """
+    soup = BeautifulSoup(html, 'html.parser', parse_only=ROW_STRAINER)
 
-    # retrieve songs
     songs = {}
-    tags = soup.find_all('div', class_='o-chart-results-list-row-container')
-    for tag in tags:
+    for tag in soup.find_all('div', class_=ROW_CLASS):
         # song ranking
-        data = tag.find('span', class_='c-label')
-        ranking = 0
-        if data:
-            ranking = int(data.text)
-
-        tag = tag.find('ul', class_='lrv-a-unstyle-list lrv-u-flex lrv-u-height-100p lrv-u-flex-direction-column@mobile-max')
-        # song name
-        data = tag.find('h3', class_='c-title')
-        songName = ""
-        if data:
-            songName = data.text.strip('\n\t')
-
-        # artists
-        data = tag.find('span', class_='c-label')
-        artists = []
-        if data:
-            result = re.split(r'\s*FEATURING\s*|,\s*|&\s*', data.text.strip('\n\t'))
-            for artist in result:
-                artists.append(artist.rstrip())
-        
-        songs[songName] = {"ranking" : ranking, "artists" : artists}
+        data = tag.find('span', class_=LABEL_CLASS)
+        ranking = data.text if data else None
 
+        details = tag.find('ul', class_=DETAILS_CLASS)
+        if details is None:
+            continue
+        # song name and artists
+        title = details.find('h3', class_=TITLE_CLASS)
+        label = details.find('span', class_=LABEL_CLASS)
+
+        name, info = _song_entry(ranking, title.text if title else None, label.text if label else None)
+        songs[name] = info
+
+    if with_week:
+        return songs, _chart_week(tag.text for tag in soup.find_all('p', class_=TAGLINE_CLASS))
     return songs
+
+def _class_xpath(tag, class_name):
+    """
+    INPUT: tag name, single class name
+    OUTPUT: xpath expression matching tags that carry that class
+    """
+    return f"{tag}[contains(concat(' ', normalize-space(@class), ' '), ' {class_name} ')]"
+
+_xpaths = None
+
+def _compiled_xpaths():
+    """
+    INPUT: none
+    OUTPUT: dictionary of precompiled lxml XPath selectors, built on first use
+    """
+    global _xpaths
+    if _xpaths is None:
+        from lxml import etree
+        _xpaths = {
+            'rows': etree.XPath('//' + _class_xpath('div', ROW_CLASS)),
+            'label': etree.XPath('(.//' + _class_xpath('span', LABEL_CLASS) + ')[1]'),
+            'details': etree.XPath(f"(.//ul[normalize-space(@class) = '{DETAILS_CLASS}'])[1]"),
+            'title': etree.XPath('(.//' + _class_xpath('h3', TITLE_CLASS) + ')[1]'),
+            'taglines': etree.XPath('//' + _class_xpath('p', TAGLINE_CLASS)),
+        }
+    return _xpaths
+
+def parse_chart_lxml(html, with_week=False):
+    """
+    INPUT: chart page html, whether to also return the chart week
+    OUTPUT: songs dictionary, parsed with lxml and precompiled XPath selectors
+        (with_week: tuple of (songs dictionary, chart week or None))
+    """
+    import lxml.html
+    xp = _compiled_xpaths()
+    root = lxml.html.fromstring(html)
+
+    songs = {}
+    for tag in xp['rows'](root):
+        label = xp['label'](tag)
+        ranking = label[0].text_content() if label else None
+
+        details = xp['details'](tag)
+        if not details:
+            continue
+        title = xp['title'](details[0])
+        label = xp['label'](details[0])
+
+        name, info = _song_entry(ranking,
+                                 title[0].text_content() if title else None,
+                                 label[0].text_content() if label else None)
+        songs[name] = info
+
+    if with_week:
+        return songs, _chart_week(tag.text_content() for tag in xp['taglines'](root))
+    return songs
+
+# Parser backends by name; register_parser() adds more
+PARSERS = {
+    'bs4': parse_chart_bs4,
+    'lxml': parse_chart_lxml,
+}
+
+def register_parser(name, parser):
+    """
+    INPUT: backend name, function taking html and with_week and returning a songs dictionary
+        (or a tuple of songs dictionary and chart week when with_week is true)
+    OUTPUT: none, makes the backend available to parse_chart
+    """
+    PARSERS[name] = parser
+
+def default_backend():
+    """
+    INPUT: none
+    OUTPUT: 'lxml' if lxml is installed, otherwise 'bs4'
+    """
+    # find_spec checks without importing, so picking a backend stays cheap
+    return 'lxml' if importlib.util.find_spec('lxml') is not None else 'bs4'
+
+@metrics.timed('billboard.parse')
+def parse_chart(html, backend=None, with_week=False):
+    """
+    INPUT: chart page html, parser backend name (default: fastest installed), whether to also return the chart week
+    OUTPUT: a dictionary called songs, where each song has a dictionary with an integer ranking value and a list of their artists
+        (with_week: tuple of (songs, the page's "Week of" date as YYYY-MM-DD or None))
+    """
+    return PARSERS[backend or default_backend()](html, with_week=with_week)
+
+def _load_page_cache(cache_path):
+    """
+    INPUT: path of the page cache file
+    OUTPUT: dictionary of cached pages by url (empty if the file is missing or unreadable)
+    """
+    try:
+        with open(cache_path, "r", encoding="utf-8-sig") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _save_page_cache(cache_path, cache):
+    """
+    INPUT: path of the page cache file, dictionary of cached pages by url
+    OUTPUT: none, writes the cache atomically so a crash never leaves half a file
+    """
+    tmp_path = cache_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(cache, f)
+    os.replace(tmp_path, cache_path)
+
+@metrics.timed('billboard.fetch_cached')
+def fetch_chart_cached(url=CHART_URL, cache_path=PAGE_CACHE, session=None, backend=None):
+    """
+    INPUT: chart url, page cache file, optional requests session, optional parser backend
+    OUTPUT: tuple of (songs dictionary, chart week or None, status) where status is
+        "not-modified" - the server answered 304, nothing was downloaded or parsed
+        "unchanged"    - the page was downloaded but its hash matched, nothing was parsed
+        "parsed"       - the page changed and was parsed
+
+    Sends the stored ETag / Last-Modified as If-None-Match / If-Modified-Since,
+    so a run against an unchanged chart costs one small request.
+    """
+    cache = _load_page_cache(cache_path)
+    entry = cache.get(url)
+
+    headers = {}
+    if entry:
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+    r = (session or requests).get(url, headers=headers)
+    if r.status_code == 304 and entry:
+        return entry["songs"], entry.get("chart_date"), "not-modified"
+    r.raise_for_status()
+
+    digest = hashlib.sha256(r.content).hexdigest()
+    if entry and entry.get("sha256") == digest and "chart_date" in entry:
+        songs, chart_date = entry["songs"], entry["chart_date"]
+        status = "unchanged"
+    else:
+        songs, chart_date = parse_chart(r.content, backend, with_week=True)
+        status = "parsed"
+
+    cache[url] = {
+        "etag": r.headers.get("ETag"),
+        "last_modified": r.headers.get("Last-Modified"),
+        "sha256": digest,
+        "songs": songs,
+        "chart_date": chart_date,
+    }
+    _save_page_cache(cache_path, cache)
+    return songs, chart_date, status
+
+def top_hundred_songs(html=None, backend=None, cache_path=None, with_week=False):
+    """
+    INPUT: optional saved chart page html (fetched live if not given), optional parser backend,
+        optional page cache file to revalidate against instead of downloading the full page,
+        whether to also return the chart week
+    OUTPUT: a dictionary called songs, where each song has a dictionary with an integer ranking value and a list of their artists
+        (with_week: tuple of (songs, the page's chart week as YYYY-MM-DD or None))
+    """
+    if html is None:
+        if cache_path:
+            songs, chart_date, _ = fetch_chart_cached(cache_path=cache_path, backend=backend)
+            return (songs, chart_date) if with_week else songs
+        html = fetch_chart_html()
+    return parse_chart(html, backend, with_week)
@@ -0,0 +1,103 @@
+"""
+cli.py
+
+One entry point for every task in the project:
+
+    python cli.py ingest [--throttled] [--workers N]     # main.py
+    python cli.py backfill 2024-01-06 2024-12-28         # backfill.py
+    python cli.py analyze [--history]                    # analyze.py
+    python cli.py render [--batch] [--format svg]        # visuals.py
+    python cli.py stats                                  # database.py stats
+    python cli.py search "lutehr"                        # search.py
+    python cli.py rolling --window 8                     # rolling.py
+    python cli.py synthetic big.sqlite --weeks 10000     # synthetic.py
+    python cli.py bench --scales 52 520                  # bench_suite.py
+
+Everything after the subcommand is passed to that script's own argument
+parser, so `python cli.py render --help` shows the render options.
+
+This module only imports the standard library. Each subcommand imports
+its script when it runs, so pandas, matplotlib, spotipy and bs4 are only
+loaded by the subcommands that use them and `stats` starts in
+milliseconds. Pass --timing (before the subcommand) to print how long
+startup, the subcommand's imports and the subcommand itself took, or
+--metrics DIR to instrument the run and write DIR/<subcommand>.json and
+DIR/<subcommand>.prom (see metrics.py).
+"""
+import time
+
+_STARTED = time.perf_counter()
+
+import argparse
+import importlib
+import sys
+
+# subcommand -> (module, arguments put in front of the user's, description)
+COMMANDS = {
+    'ingest': ('main', [], "scrape the live Hot 100 and enrich it from Spotify"),
+    'backfill': ('backfill', [], "load historical weekly charts"),
+    'analyze': ('analyze', [], "write the analysis summaries"),
+    'render': ('visuals', [], "draw the charts"),
+    'stats': ('database', ['stats'], "print what the database holds"),
+    'migrate': ('database', ['migrate'], "apply pending schema migrations"),
+    'search': ('search', [], "search songs, albums, artists and top tracks"),
+    'rolling': ('rolling', [], "rolling rank vs popularity statistics across weeks"),
+    'synthetic': ('synthetic', [], "fill a database with synthetic weekly charts"),
+    'bench': ('bench_suite', [], "benchmark inserts, analyses and renders at several data sizes"),
+}
+
+# Modules whose import cost --timing reports when a subcommand loaded them
+HEAVY_MODULES = ('pandas', 'numpy', 'matplotlib', 'spotipy', 'bs4', 'lxml', 'requests')
+
+def run(command, args, timing=False, metrics_dir=None):
+    """
+    Imports a subcommand's module and runs its main().
+
+    Args:
+        command (str): Subcommand name from COMMANDS
+        args (list of str): Arguments for the subcommand
+        timing (bool): Print startup, import and run times to stderr
+        metrics_dir (str): Instrument the run and write its report here (default: off)
+
+    Returns:
+        int: Exit status
+    """
+    module_name, prefix, _ = COMMANDS[command]
+    dispatched = time.perf_counter()
+    module = importlib.import_module(module_name)
+    imported = time.perf_counter()
+    imported_heavy = [name for name in HEAVY_MODULES if name in sys.modules]
+    try:
+        if metrics_dir:
+            import metrics
+            with metrics.session(metrics_dir, command, [command] + list(args)):
+                status = module.main(prefix + list(args))
+        else:
+            status = module.main(prefix + list(args))
+    finally:
+        if timing:
+            finished = time.perf_counter()
+            # Modules the subcommand only imported once it ran are part of the run time
+            run_heavy = [name for name in HEAVY_MODULES if name in sys.modules and name not in imported_heavy]
+            print(f"⏱  startup {(dispatched - _STARTED) * 1000:.1f} ms, "
+                  f"import {module_name} {(imported - dispatched) * 1000:.1f} ms "
+                  f"({', '.join(imported_heavy) or 'no heavy modules'}), "
+                  f"run {(finished - imported) * 1000:.1f} ms"
+                  + (f" (loaded {', '.join(run_heavy)})" if run_heavy else ""), file=sys.stderr)
+    return status or 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Billboard Hot 100 and Spotify music data tools.",
+        epilog="subcommands: " + "; ".join(f"{name}: {info[2]}" for name, info in COMMANDS.items()),
+    )
+    parser.add_argument('--timing', action='store_true', help="report startup, import and run times")
+    parser.add_argument('--metrics', metavar='DIR',
+                        help="write a JSON run report and a Prometheus textfile for the run to DIR")
+    parser.add_argument('command', choices=list(COMMANDS), help="what to do")
+    parser.add_argument('args', nargs=argparse.REMAINDER, help="options for the subcommand")
+    args = parser.parse_args(argv)
+    return run(args.command, args.args, args.timing, args.metrics)
+
+if __name__ == "__main__":
+    raise SystemExit(main())
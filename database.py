@@ -2,35 +2,142 @@
 database.py
 
 This module handles all database interactions for the music data project.
-It uses SQLite to create and manage four normalized tables:
-Songs, Albums, Artists, and ArtistTopTracks.
+It uses SQLite to create and manage normalized tables: Songs, Albums,
+Artists and ArtistTopTracks, a ChartEntries time series holding every
+weekly chart, and a small Checkpoints table used to resume interrupted
+ingest runs.
 
 Key Responsibilities:
-- Create database schema
+- Create database schema and apply versioned migrations (PRAGMA user_version)
 - Check for existing records
 - Insert new albums, artists, songs, and artist top tracks
+- Provide MusicStore, a single-connection, single-transaction storage object
+  with bulk insert paths for whole ingest runs
+- Open every connection through connect(), which puts the database in WAL
+  mode so read-only analytics connections can run during a long ingest
 
 Database file: music_data.sqlite
 """
+import os
 import sqlite3
+from datetime import date, timedelta
+from urllib.parse import quote
+
+import metrics
 
 DB_NAME = 'music_data.sqlite'
 
-def create_music_db():
+# Seconds a connection waits for a lock before raising "database is locked"
+BUSY_TIMEOUT = 30.0
+
+# Per-connection tuning applied by connect()
+PRAGMAS = {
+    # WAL only needs a sync at checkpoints; a crash can lose the last commits but never corrupts
+    'synchronous': 'NORMAL',
+    # Negative means KiB: 64 MiB of page cache
+    'cache_size': -65536,
+    # Read through a 256 MiB memory map instead of read() calls
+    'mmap_size': 268435456,
+    'temp_store': 'MEMORY',
+}
+
+# Billboard dates every chart by the Saturday of its week
+CHART_WEEKDAY = 5
+
+def chart_saturday(day):
     """
-    Initializes the SQLite database schema.
+    Returns the chart date (the Saturday on or after `day`) as YYYY-MM-DD.
 
-    Creates four tables:
-    - Albums: id, name, release_date
-    - Artists: id, name
-    - Songs: id, name, rank, popularity, album_id
-    - ArtistTopTracks: id, artist_id, track_name, rank
+    Args:
+        day (datetime.date): Any day of the chart week
+    """
+    return (day + timedelta(days=(CHART_WEEKDAY - day.weekday()) % 7)).isoformat()
+
+def current_chart_date(today=None):
+    """
+    Returns the date of the Hot 100 currently live on billboard.com.
+
+    A new chart goes up every Tuesday dated the following Saturday, so on
+    Sunday and Monday the live chart is still the one dated the day(s) before.
+
+    Args:
+        today (datetime.date): Day to evaluate (default: today)
+
+    Returns:
+        str: Chart date, YYYY-MM-DD
+    """
+    today = today or date.today()
+    if today.weekday() in (6, 0):
+        today -= timedelta(days=2)
+    return chart_saturday(today)
+
+class SchemaOutdated(sqlite3.OperationalError):
+    """
+    Raised when a read-only connection is opened on a database older than
+    SCHEMA_VERSION that cannot be migrated, e.g. a file on read-only storage.
+    """
+
+def _open_read_only(db_name, timeout, check_same_thread, factory):
+    uri = f"file:{quote(os.path.abspath(db_name))}?mode=ro"
+    return sqlite3.connect(uri, uri=True, timeout=timeout, check_same_thread=check_same_thread,
+                           factory=factory)
+
+def connect(db_name=DB_NAME, read_only=False, timeout=BUSY_TIMEOUT, check_same_thread=True):
+    """
+    Opens a tuned connection to the music database.
+
+    Writers switch the database to WAL mode (a setting stored in the file),
+    so readers never block the writer and the writer never blocks readers.
+    Read-only connections open the file with mode=ro and cannot write; a
+    database older than SCHEMA_VERSION is migrated first through a writable
+    connection, so readers never query tables and views it does not have yet.
+    While metrics.py instrumentation is enabled, every statement run on the
+    connection is counted and timed.
 
-    If the tables already exist, this function does nothing.
+    Args:
+        db_name (str): Database file (default: music_data.sqlite)
+        read_only (bool): Open with mode=ro, for analytics and dashboards
+        timeout (float): Seconds to wait on a lock before failing (default: 30)
+        check_same_thread (bool): Passed to sqlite3.connect
+
+    Returns:
+        sqlite3.Connection: In autocommit mode (isolation_level=None) for writers,
+        Python's default transaction handling for readers
+
+    Raises:
+        SchemaOutdated: For a read-only connection to an old database that
+        could not be migrated
     """
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
+    factory = metrics.connection_factory()
+    if read_only:
+        conn = _open_read_only(db_name, timeout, check_same_thread, factory)
+        version = conn.execute('PRAGMA user_version').fetchone()[0]
+        if version < SCHEMA_VERSION:
+            conn.close()
+            try:
+                writer = connect(db_name, timeout=timeout)
+                try:
+                    migrate(writer)
+                finally:
+                    writer.close()
+            except sqlite3.OperationalError as e:
+                raise SchemaOutdated(
+                    f"{db_name} is at schema version {version}, expected {SCHEMA_VERSION}, "
+                    f"and could not be migrated ({e}); run `python cli.py migrate --db {db_name}`") from e
+            conn = _open_read_only(db_name, timeout, check_same_thread, factory)
+    else:
+        conn = sqlite3.connect(db_name, timeout=timeout, isolation_level=None,
+                               check_same_thread=check_same_thread, factory=factory)
+        conn.execute('PRAGMA journal_mode = WAL')
+    for name, value in PRAGMAS.items():
+        conn.execute(f'PRAGMA {name} = {value}')
+    return conn
 
+def _migration_1(cur):
+    """
+    Baseline schema: the original four tables plus Checkpoints and the raw
+    ChartHistory table written by backfill.py.
+    """
     # Create Albums table
     cur.execute('''
         CREATE TABLE IF NOT EXISTS Albums (
@@ -71,25 +178,1036 @@ def create_music_db():
         )
     ''')
 
-    conn.commit()
+    # Create Checkpoints table
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS Checkpoints (
+            name TEXT PRIMARY KEY,
+            last_rank INTEGER
+        )
+    ''')
+
+    # Create ChartHistory table, one row per song per weekly chart
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS ChartHistory (
+            chart_date TEXT,
+            rank INTEGER,
+            song_name TEXT,
+            artists TEXT,
+            PRIMARY KEY (chart_date, rank)
+        )
+    ''')
+
+def _release_day(release_date):
+    """
+    Parses a Spotify release date, which may be YYYY, YYYY-MM or YYYY-MM-DD.
+
+    Returns:
+        datetime.date: First day of the release period, or None for
+        placeholders such as "0000" and anything else unparseable
+    """
+    try:
+        parts = [int(p) for p in release_date.split('-')] + [1, 1]
+        return date(parts[0], parts[1], parts[2])
+    except ValueError:
+        return None
+
+def _migration_2(cur):
+    """
+    Time-series schema: separates song identity (Songs) from weekly chart
+    entries (ChartEntries) so every week can be stored.
+
+    The rank/popularity columns of the old Songs table become the entries of
+    one undated snapshot. It is dated by the first chart Saturday on or after
+    the newest stored album release, since no chart can contain a song
+    released after its date. Rows of ChartHistory are folded in as entries
+    without popularity.
+    """
+    # Songs: one row per song, identified by its title and Billboard artist credit
+    cur.execute('''
+        CREATE TABLE Songs_v2 (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT,
+            artists TEXT NOT NULL DEFAULT '',
+            album_id INTEGER,
+            UNIQUE (name, artists),
+            FOREIGN KEY (album_id) REFERENCES Albums(id)
+        )
+    ''')
+
+    # ChartEntries: one row per chart week and rank, clustered by week
+    cur.execute('''
+        CREATE TABLE ChartEntries (
+            chart_date TEXT,
+            rank INTEGER,
+            song_id INTEGER,
+            popularity INTEGER,
+            PRIMARY KEY (chart_date, rank),
+            FOREIGN KEY (song_id) REFERENCES Songs(id)
+        ) WITHOUT ROWID
+    ''')
+
+    legacy_date = current_chart_date()
+    for (release_date,) in cur.execute(
+            'SELECT DISTINCT release_date FROM Albums WHERE release_date IS NOT NULL ORDER BY release_date DESC'
+    ).fetchall():
+        released = _release_day(release_date)
+        if released is not None:
+            legacy_date = chart_saturday(released)
+            break
+
+    cur.execute("INSERT INTO Songs_v2 (id, name, album_id) SELECT id, name, album_id FROM Songs")
+    cur.execute('''
+        INSERT INTO ChartEntries (chart_date, rank, song_id, popularity)
+        SELECT ?, rank, id, popularity FROM Songs WHERE rank IS NOT NULL
+    ''', (legacy_date,))
+    cur.execute('DROP TABLE Songs')
+    cur.execute('ALTER TABLE Songs_v2 RENAME TO Songs')
+
+    cur.execute("INSERT OR IGNORE INTO Songs (name, artists) SELECT song_name, artists FROM ChartHistory")
+    cur.execute('''
+        INSERT OR IGNORE INTO ChartEntries (chart_date, rank, song_id)
+        SELECT ChartHistory.chart_date, ChartHistory.rank, Songs.id
+        FROM ChartHistory
+        JOIN Songs ON Songs.name = ChartHistory.song_name AND Songs.artists = ChartHistory.artists
+    ''')
+    cur.execute('DROP TABLE ChartHistory')
+
+    # Per-song range queries (a song's run on the chart) are answered from this
+    # index alone; per-week queries use the primary key
+    cur.execute('CREATE INDEX idx_chart_entries_song ON ChartEntries (song_id, chart_date, rank, popularity)')
+    # Finds the newest week with Spotify data without scanning the table
+    cur.execute('CREATE INDEX idx_chart_entries_enriched ON ChartEntries (chart_date) WHERE popularity IS NOT NULL')
+
+    # LatestChart: the newest chart week that has Spotify data, shaped like the old Songs table
+    cur.execute('''
+        CREATE VIEW LatestChart AS
+        SELECT Songs.id, Songs.name, Songs.artists, Songs.album_id,
+               ChartEntries.chart_date, ChartEntries.rank, ChartEntries.popularity
+        FROM ChartEntries
+        JOIN Songs ON Songs.id = ChartEntries.song_id
+        WHERE ChartEntries.chart_date = (
+            SELECT MAX(chart_date) FROM ChartEntries WHERE popularity IS NOT NULL
+        )
+    ''')
+
+def _migration_3(cur):
+    """
+    SongArtists bridge table linking songs to artists by id.
+
+    Filled at ingest from the artist list Spotify returns for each song.
+    Songs stored earlier are linked through the old track-name join against
+    ArtistTopTracks, the only artist information they have; those links
+    have no position.
+    """
+    cur.execute('''
+        CREATE TABLE SongArtists (
+            song_id INTEGER,
+            artist_id INTEGER,
+            position INTEGER,
+            PRIMARY KEY (song_id, artist_id),
+            FOREIGN KEY (song_id) REFERENCES Songs(id),
+            FOREIGN KEY (artist_id) REFERENCES Artists(id)
+        ) WITHOUT ROWID
+    ''')
+    # Per-artist aggregates walk this index instead of the whole bridge
+    cur.execute('CREATE INDEX idx_song_artists_artist ON SongArtists (artist_id, song_id)')
+    cur.execute('''
+        INSERT OR IGNORE INTO SongArtists (song_id, artist_id)
+        SELECT Songs.id, ArtistTopTracks.artist_id
+        FROM Songs
+        JOIN ArtistTopTracks ON Songs.name = ArtistTopTracks.track_name
+    ''')
+
+# Recomputes ArtistWeekStats from scratch; used to fill it and to check it
+ARTIST_WEEK_STATS_QUERY = '''
+    SELECT ChartEntries.chart_date, SongArtists.artist_id,
+           COUNT(*) AS song_count, COALESCE(SUM(ChartEntries.popularity), 0) AS popularity_sum
+    FROM ChartEntries
+    JOIN SongArtists ON SongArtists.song_id = ChartEntries.song_id
+    GROUP BY ChartEntries.chart_date, SongArtists.artist_id
+'''
+
+def _migration_4(cur):
+    """
+    Materialized per-week artist aggregates (ArtistWeekStats), kept up to
+    date by triggers on ChartEntries and SongArtists, so every insert made
+    by the ingest path adjusts only the rows it affects.
+
+    LatestArtistStats reads the aggregates of the LatestChart week.
+    """
+    cur.execute('''
+        CREATE TABLE ArtistWeekStats (
+            chart_date TEXT,
+            artist_id INTEGER,
+            song_count INTEGER NOT NULL,
+            popularity_sum INTEGER NOT NULL,
+            PRIMARY KEY (chart_date, artist_id),
+            FOREIGN KEY (artist_id) REFERENCES Artists(id)
+        ) WITHOUT ROWID
+    ''')
+    cur.execute('INSERT INTO ArtistWeekStats ' + ARTIST_WEEK_STATS_QUERY)
+
+    # A new chart entry counts once for every artist of its song
+    cur.execute('''
+        CREATE TRIGGER artist_stats_entry_insert AFTER INSERT ON ChartEntries
+        BEGIN
+            INSERT INTO ArtistWeekStats (chart_date, artist_id, song_count, popularity_sum)
+            SELECT NEW.chart_date, artist_id, 1, COALESCE(NEW.popularity, 0)
+            FROM SongArtists WHERE song_id = NEW.song_id
+            ON CONFLICT (chart_date, artist_id) DO UPDATE SET
+                song_count = song_count + 1,
+                popularity_sum = popularity_sum + excluded.popularity_sum;
+        END
+    ''')
+    # An updated entry (new popularity or song) is taken out and put back in
+    cur.execute('''
+        CREATE TRIGGER artist_stats_entry_update AFTER UPDATE OF song_id, popularity ON ChartEntries
+        BEGIN
+            UPDATE ArtistWeekStats SET
+                song_count = song_count - 1,
+                popularity_sum = popularity_sum - COALESCE(OLD.popularity, 0)
+            WHERE chart_date = OLD.chart_date
+              AND artist_id IN (SELECT artist_id FROM SongArtists WHERE song_id = OLD.song_id);
+            INSERT INTO ArtistWeekStats (chart_date, artist_id, song_count, popularity_sum)
+            SELECT NEW.chart_date, artist_id, 1, COALESCE(NEW.popularity, 0)
+            FROM SongArtists WHERE song_id = NEW.song_id
+            ON CONFLICT (chart_date, artist_id) DO UPDATE SET
+                song_count = song_count + 1,
+                popularity_sum = popularity_sum + excluded.popularity_sum;
+            DELETE FROM ArtistWeekStats WHERE chart_date = OLD.chart_date AND song_count = 0;
+        END
+    ''')
+    cur.execute('''
+        CREATE TRIGGER artist_stats_entry_delete AFTER DELETE ON ChartEntries
+        BEGIN
+            UPDATE ArtistWeekStats SET
+                song_count = song_count - 1,
+                popularity_sum = popularity_sum - COALESCE(OLD.popularity, 0)
+            WHERE chart_date = OLD.chart_date
+              AND artist_id IN (SELECT artist_id FROM SongArtists WHERE song_id = OLD.song_id);
+            DELETE FROM ArtistWeekStats WHERE chart_date = OLD.chart_date AND song_count = 0;
+        END
+    ''')
+    # A new song-artist link counts every week the song has charted
+    cur.execute('''
+        CREATE TRIGGER artist_stats_link_insert AFTER INSERT ON SongArtists
+        BEGIN
+            INSERT INTO ArtistWeekStats (chart_date, artist_id, song_count, popularity_sum)
+            SELECT chart_date, NEW.artist_id, 1, COALESCE(popularity, 0)
+            FROM ChartEntries WHERE song_id = NEW.song_id
+            ON CONFLICT (chart_date, artist_id) DO UPDATE SET
+                song_count = song_count + 1,
+                popularity_sum = popularity_sum + excluded.popularity_sum;
+        END
+    ''')
+
+    cur.execute('''
+        CREATE VIEW LatestArtistStats AS
+        SELECT Artists.id AS artist_id, Artists.name AS artist,
+               ArtistWeekStats.song_count, ArtistWeekStats.popularity_sum AS total_popularity
+        FROM ArtistWeekStats
+        JOIN Artists ON Artists.id = ArtistWeekStats.artist_id
+        WHERE ArtistWeekStats.chart_date = (
+            SELECT MAX(chart_date) FROM ChartEntries WHERE popularity IS NOT NULL
+        )
+    ''')
+
+# Full-text search indexes: index table -> (content table, indexed column)
+SEARCH_INDEXES = {
+    'SongSearch': ('Songs', 'name'),
+    'AlbumSearch': ('Albums', 'name'),
+    'ArtistSearch': ('Artists', 'name'),
+    'TrackSearch': ('ArtistTopTracks', 'track_name'),
+}
+
+def _migration_5(cur):
+    """
+    FTS5 trigram indexes over song, album, artist and top track names
+    (see search.py), kept in sync with their tables by triggers.
+
+    The indexes use the tables as external content, so names are not
+    stored twice; each row is indexed under its table's id.
+    """
+    for index, (table, column) in SEARCH_INDEXES.items():
+        prefix = index.lower()
+        cur.execute(f'''
+            CREATE VIRTUAL TABLE {index} USING fts5(
+                {column}, content='{table}', content_rowid='id', tokenize='trigram'
+            )
+        ''')
+        cur.execute(f"INSERT INTO {index} ({index}) VALUES ('rebuild')")
+        cur.execute(f'''
+            CREATE TRIGGER {prefix}_insert AFTER INSERT ON {table}
+            BEGIN
+                INSERT INTO {index} (rowid, {column}) VALUES (NEW.id, NEW.{column});
+            END
+        ''')
+        cur.execute(f'''
+            CREATE TRIGGER {prefix}_delete AFTER DELETE ON {table}
+            BEGIN
+                INSERT INTO {index} ({index}, rowid, {column}) VALUES ('delete', OLD.id, OLD.{column});
+            END
+        ''')
+        # Upserts rewrite the name with itself, which must not touch the index
+        cur.execute(f'''
+            CREATE TRIGGER {prefix}_update AFTER UPDATE OF {column} ON {table}
+            WHEN OLD.{column} IS NOT NEW.{column}
+            BEGIN
+                INSERT INTO {index} ({index}, rowid, {column}) VALUES ('delete', OLD.id, OLD.{column});
+                INSERT INTO {index} (rowid, {column}) VALUES (NEW.id, NEW.{column});
+            END
+        ''')
+
+def _migration_6(cur):
+    """
+    Entity resolution: the Spotify track (and its artists) that each
+    Billboard (title, lead artist) pair resolved to, so later weeks can
+    fetch known songs by id instead of searching for them again.
+
+    Keys are search.normalize_title and search.normalize_artist forms, so
+    credit variants like "X Featuring Y" and "X & Y" share one row.
+    """
+    cur.execute('''
+        CREATE TABLE Resolutions (
+            title_key TEXT,
+            artist_key TEXT,
+            track_id TEXT NOT NULL,
+            artist_ids TEXT NOT NULL DEFAULT '',
+            resolved_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (title_key, artist_key)
+        ) WITHOUT ROWID
+    ''')
+
+def _migration_7(cur):
+    """
+    ArtistWeekStats triggers for removed and changed SongArtists links, so
+    relinking a song to different artists moves its weeks between them.
+    Aggregates that drifted through such edits before are rebuilt.
+    """
+    cur.execute('''
+        CREATE TRIGGER artist_stats_link_delete AFTER DELETE ON SongArtists
+        BEGIN
+            UPDATE ArtistWeekStats SET
+                song_count = song_count - ChartWeeks.entries,
+                popularity_sum = popularity_sum - ChartWeeks.popularity
+            FROM (SELECT chart_date, COUNT(*) AS entries, COALESCE(SUM(popularity), 0) AS popularity
+                  FROM ChartEntries WHERE song_id = OLD.song_id GROUP BY chart_date) AS ChartWeeks
+            WHERE ArtistWeekStats.chart_date = ChartWeeks.chart_date
+              AND ArtistWeekStats.artist_id = OLD.artist_id;
+            DELETE FROM ArtistWeekStats WHERE artist_id = OLD.artist_id AND song_count = 0;
+        END
+    ''')
+    # A changed link is taken out for the old song and artist and put back in for the new ones
+    cur.execute('''
+        CREATE TRIGGER artist_stats_link_update AFTER UPDATE OF song_id, artist_id ON SongArtists
+        BEGIN
+            UPDATE ArtistWeekStats SET
+                song_count = song_count - ChartWeeks.entries,
+                popularity_sum = popularity_sum - ChartWeeks.popularity
+            FROM (SELECT chart_date, COUNT(*) AS entries, COALESCE(SUM(popularity), 0) AS popularity
+                  FROM ChartEntries WHERE song_id = OLD.song_id GROUP BY chart_date) AS ChartWeeks
+            WHERE ArtistWeekStats.chart_date = ChartWeeks.chart_date
+              AND ArtistWeekStats.artist_id = OLD.artist_id;
+            INSERT INTO ArtistWeekStats (chart_date, artist_id, song_count, popularity_sum)
+            SELECT chart_date, NEW.artist_id, 1, COALESCE(popularity, 0)
+            FROM ChartEntries WHERE song_id = NEW.song_id
+            ON CONFLICT (chart_date, artist_id) DO UPDATE SET
+                song_count = song_count + 1,
+                popularity_sum = popularity_sum + excluded.popularity_sum;
+            DELETE FROM ArtistWeekStats WHERE artist_id = OLD.artist_id AND song_count = 0;
+        END
+    ''')
+    cur.execute('DELETE FROM ArtistWeekStats')
+    cur.execute('INSERT INTO ArtistWeekStats ' + ARTIST_WEEK_STATS_QUERY)
+
+def _migration_8(cur):
+    """
+    ChartWeekStamps: a random stamp per chart week, replaced by triggers
+    whenever one of the week's ChartEntries rows or a SongArtists link of
+    one of its songs changes. Readers that cache per-week results (see
+    rolling.py) compare stamps instead of rescanning the history; random
+    stamps never repeat, even in a database rebuilt at the same path.
+    """
+    cur.execute('''
+        CREATE TABLE ChartWeekStamps (
+            chart_date TEXT PRIMARY KEY,
+            stamp INTEGER NOT NULL
+        ) WITHOUT ROWID
+    ''')
+    cur.execute('''
+        INSERT INTO ChartWeekStamps (chart_date, stamp)
+        SELECT chart_date, random() FROM ChartEntries GROUP BY chart_date
+    ''')
+    stamp_week = '''
+        INSERT INTO ChartWeekStamps (chart_date, stamp) VALUES ({date}, random())
+        ON CONFLICT (chart_date) DO UPDATE SET stamp = excluded.stamp;
+    '''
+    stamp_song_weeks = '''
+        INSERT INTO ChartWeekStamps (chart_date, stamp)
+        SELECT chart_date, random() FROM ChartEntries WHERE song_id = {song} GROUP BY chart_date
+        ON CONFLICT (chart_date) DO UPDATE SET stamp = excluded.stamp;
+    '''
+    # A week whose last entry is gone has no stamp either
+    unstamp_empty = '''
+        DELETE FROM ChartWeekStamps
+        WHERE chart_date = OLD.chart_date
+          AND NOT EXISTS (SELECT 1 FROM ChartEntries WHERE chart_date = OLD.chart_date);
+    '''
+    cur.execute(f'''
+        CREATE TRIGGER week_stamp_entry_insert AFTER INSERT ON ChartEntries
+        BEGIN {stamp_week.format(date='NEW.chart_date')} END
+    ''')
+    cur.execute(f'''
+        CREATE TRIGGER week_stamp_entry_update AFTER UPDATE ON ChartEntries
+        BEGIN
+            {stamp_week.format(date='NEW.chart_date')}
+            {stamp_week.format(date='OLD.chart_date')}
+            {unstamp_empty}
+        END
+    ''')
+    cur.execute(f'''
+        CREATE TRIGGER week_stamp_entry_delete AFTER DELETE ON ChartEntries
+        BEGIN
+            {stamp_week.format(date='OLD.chart_date')}
+            {unstamp_empty}
+        END
+    ''')
+    cur.execute(f'''
+        CREATE TRIGGER week_stamp_link_insert AFTER INSERT ON SongArtists
+        BEGIN {stamp_song_weeks.format(song='NEW.song_id')} END
+    ''')
+    cur.execute(f'''
+        CREATE TRIGGER week_stamp_link_update AFTER UPDATE OF song_id, artist_id ON SongArtists
+        BEGIN
+            {stamp_song_weeks.format(song='OLD.song_id')}
+            {stamp_song_weeks.format(song='NEW.song_id')}
+        END
+    ''')
+    cur.execute(f'''
+        CREATE TRIGGER week_stamp_link_delete AFTER DELETE ON SongArtists
+        BEGIN {stamp_song_weeks.format(song='OLD.song_id')} END
+    ''')
+
+# Schema migrations in order; the database's PRAGMA user_version records how
+# many have been applied. Append new migrations, never edit applied ones.
+MIGRATIONS = [
+    _migration_1,
+    _migration_2,
+    _migration_3,
+    _migration_4,
+    _migration_5,
+    _migration_6,
+    _migration_7,
+    _migration_8,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+def migrate(conn):
+    """
+    Applies every pending migration, each in its own transaction.
+
+    Each step takes the write lock (BEGIN IMMEDIATE) before reading the
+    schema version, so when several processes open an outdated database at
+    once, every migration is applied by exactly one of them.
+
+    Args:
+        conn (sqlite3.Connection): Open database connection
+
+    Returns:
+        int: Schema version after migrating
+    """
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+    while version < SCHEMA_VERSION:
+        cur = conn.cursor()
+        cur.execute('BEGIN IMMEDIATE')
+        try:
+            # Another process may have migrated since the last read
+            version = cur.execute('PRAGMA user_version').fetchone()[0]
+            if version < SCHEMA_VERSION:
+                MIGRATIONS[version](cur)
+                version += 1
+                cur.execute(f'PRAGMA user_version = {version}')
+            cur.execute('COMMIT')
+        except Exception:
+            cur.execute('ROLLBACK')
+            raise
+    return version
+
+@metrics.timed('database.create')
+def create_music_db(db_name=DB_NAME):
+    """
+    Initializes the SQLite database schema, migrating older databases.
+
+    Tables:
+    - Albums: id, name, release_date
+    - Artists: id, name
+    - Songs: id, name, artists, album_id (one row per song)
+    - ChartEntries: chart_date, rank, song_id, popularity (one row per song per week)
+    - SongArtists: song_id, artist_id, position (which artists perform each song)
+    - ArtistWeekStats: chart_date, artist_id, song_count, popularity_sum
+      (maintained by triggers; see check_artist_stats)
+    - ArtistTopTracks: id, artist_id, track_name, rank
+    - Checkpoints: name, last_rank (resumable ingest runs)
+    - SongSearch, AlbumSearch, ArtistSearch, TrackSearch: FTS5 trigram
+      indexes over the names above (maintained by triggers; see search.py)
+    - Resolutions: title_key, artist_key, track_id, artist_ids, resolved_at
+      (Spotify ids already found for a Billboard title and lead artist)
+    - ChartWeekStamps: chart_date, stamp (changes with every edit to the
+      week; maintained by triggers)
+
+    The LatestChart and LatestArtistStats views show the newest week with Spotify data.
+    If the schema is already current, this function does nothing.
+
+    Args:
+        db_name (str): Database file (default: music_data.sqlite)
+    """
+    conn = connect(db_name)
+    migrate(conn)
     conn.close()
 
-def song_rank_exists(rank):
+def check_artist_stats(db_name=DB_NAME, rebuild=False):
+    """
+    Recomputes ArtistWeekStats from scratch and compares it with the stored,
+    incrementally maintained rows.
+
+    Args:
+        db_name (str): Database file (default: music_data.sqlite)
+        rebuild (bool): Replace the stored rows with the recomputed ones
+
+    Returns:
+        list of tuple: (chart_date, artist_id, stored (count, sum), expected (count, sum))
+        for every row that differs; empty when the aggregates are consistent
+    """
+    conn = connect(db_name)
+    try:
+        stored = {(row[0], row[1]): row[2:] for row in conn.execute(
+            'SELECT chart_date, artist_id, song_count, popularity_sum FROM ArtistWeekStats')}
+        expected = {(row[0], row[1]): row[2:] for row in conn.execute(ARTIST_WEEK_STATS_QUERY)}
+        mismatches = [
+            (key[0], key[1], stored.get(key), expected.get(key))
+            for key in sorted(set(stored) | set(expected))
+            if stored.get(key) != expected.get(key)
+        ]
+        if rebuild and mismatches:
+            conn.execute('BEGIN')
+            conn.execute('DELETE FROM ArtistWeekStats')
+            conn.execute('INSERT INTO ArtistWeekStats ' + ARTIST_WEEK_STATS_QUERY)
+            conn.execute('COMMIT')
+        return mismatches
+    finally:
+        conn.close()
+
+def database_stats(db_name=DB_NAME):
+    """
+    Summarizes what the database holds, over a read-only connection.
+
+    Args:
+        db_name (str): Database file (default: music_data.sqlite)
+
+    Returns:
+        dict: 'schema_version', row counts per table, 'chart_weeks', and the
+        'first_week', 'last_week' and 'last_enriched_week' chart dates
+    """
+    conn = connect(db_name, read_only=True)
+    try:
+        stats = {'schema_version': conn.execute('PRAGMA user_version').fetchone()[0]}
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        for table in ('Songs', 'Albums', 'Artists', 'ChartEntries', 'ArtistTopTracks', 'Resolutions'):
+            if table in tables:
+                stats[table] = conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+        if 'ChartEntries' in tables:
+            row = conn.execute('''
+                SELECT COUNT(DISTINCT chart_date), MIN(chart_date), MAX(chart_date),
+                       MAX(CASE WHEN popularity IS NOT NULL THEN chart_date END)
+                FROM ChartEntries
+            ''').fetchone()
+            stats.update(chart_weeks=row[0], first_week=row[1], last_week=row[2], last_enriched_week=row[3])
+        return stats
+    finally:
+        conn.close()
+
+class MusicStore:
+    """
+    Connection-owning storage object for a whole ingest run.
+
+    Opens a single SQLite connection, wraps everything written through it in
+    one transaction and caches album/artist ids so repeated lookups never go
+    back to the database. Use it as a context manager:
+
+        with MusicStore() as store:
+            album_ids = store.insert_albums([(name, release_date), ...])
+
+    The transaction is committed when the block exits normally and rolled
+    back if it raises.
+    """
+
+    # SQLite's default limit on host parameters per statement is 999
+    CHUNK_SIZE = 500
+
+    def __init__(self, db_name=DB_NAME):
+        self.db_name = db_name
+        self.conn = None
+        self._album_ids = {}
+        self._artist_ids = {}
+        self._song_ids = {}
+        # (name, artists) keys stored under another spelling's song id
+        self._matched_song_ids = {}
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.rollback()
+        self.close()
+        return False
+
+    def open(self):
+        """
+        Opens the connection and starts the run's transaction.
+        """
+        if self.conn is None:
+            # Autocommit mode so BEGIN/COMMIT are under our control
+            self.conn = connect(self.db_name)
+            self.conn.execute("BEGIN")
+
+    def commit(self):
+        """
+        Commits everything written so far and starts a new transaction.
+        """
+        if self.conn is not None and self.conn.in_transaction:
+            self.conn.execute("COMMIT")
+            self.conn.execute("BEGIN")
+
+    def rollback(self):
+        """
+        Discards everything written since the last commit.
+
+        Cached ids may point at rolled back rows, so the caches are cleared too.
+        """
+        if self.conn is not None and self.conn.in_transaction:
+            self.conn.execute("ROLLBACK")
+        self._album_ids.clear()
+        self._artist_ids.clear()
+        self._song_ids.clear()
+        self._matched_song_ids.clear()
+
+    def close(self):
+        """
+        Closes the connection. Anything not yet committed is discarded.
+        """
+        if self.conn is not None:
+            if self.conn.in_transaction:
+                self.conn.execute("ROLLBACK")
+            self.conn.close()
+            self.conn = None
+
+    def _lookup_ids(self, table, names, cache):
+        """
+        Fills `cache` with the ids of `names` that are not cached yet,
+        using one SELECT per chunk instead of one per row.
+        """
+        missing = [n for n in dict.fromkeys(names) if n not in cache]
+        for start in range(0, len(missing), self.CHUNK_SIZE):
+            chunk = missing[start:start + self.CHUNK_SIZE]
+            marks = ", ".join("?" * len(chunk))
+            cur = self.conn.execute(f"SELECT name, id FROM {table} WHERE name IN ({marks})", chunk)
+            cache.update(cur.fetchall())
+
+    def _lookup_song_ids(self, keys):
+        """
+        Fills the song id cache for (name, artists) keys that are not cached yet.
+        """
+        missing = [k for k in dict.fromkeys(keys) if k not in self._song_ids]
+        step = self.CHUNK_SIZE // 2
+        for start in range(0, len(missing), step):
+            chunk = missing[start:start + step]
+            marks = ", ".join(["(?, ?)"] * len(chunk))
+            params = [value for key in chunk for value in key]
+            cur = self.conn.execute(
+                f"SELECT name, artists, id FROM Songs WHERE (name, artists) IN (VALUES {marks})", params)
+            self._song_ids.update(((name, artists), song_id) for name, artists, song_id in cur)
+
+    def _match_songs(self, rows):
+        """
+        Finds stored songs for (name, artists, ...) rows whose exact key has
+        no Songs row, and caches them under that key.
+
+        A stored song is matched to at most one row per call, so two entries
+        on the same chart never share a song.
+
+        Returns:
+            dict: Maps the rows' (name, artists) keys that belong to a song
+            stored under another spelling to its id
+        """
+        from search import match_song
+
+        self._lookup_song_ids((row[0], row[1]) for row in rows)
+        taken = {self._song_ids[(row[0], row[1])] for row in rows if (row[0], row[1]) in self._song_ids}
+        for name, artists, *_ in rows:
+            key = (name, artists)
+            if key in self._song_ids:
+                continue
+            song_id = match_song(self.conn, name, artists.split(", ") if artists else [])
+            if song_id is not None and song_id not in taken:
+                taken.add(song_id)
+                self._song_ids[key] = self._matched_song_ids[key] = song_id
+        return {(row[0], row[1]): self._matched_song_ids[(row[0], row[1])]
+                for row in rows if (row[0], row[1]) in self._matched_song_ids}
+
+    def existing_ranks(self, chart_date):
+        """
+        Args:
+            chart_date (str): Chart week, YYYY-MM-DD
+
+        Returns:
+            set: Every rank of that week already stored with Spotify data.
+        """
+        cur = self.conn.execute(
+            "SELECT rank FROM ChartEntries WHERE chart_date = ? AND popularity IS NOT NULL", (chart_date,))
+        return {row[0] for row in cur}
+
+    def artists_with_top_tracks(self):
+        """
+        Returns:
+            set: Names of artists that already have rows in ArtistTopTracks,
+            so enrichment can skip their top-track lookups across runs.
+        """
+        cur = self.conn.execute('''
+            SELECT DISTINCT Artists.name
+            FROM Artists
+            JOIN ArtistTopTracks ON ArtistTopTracks.artist_id = Artists.id
+        ''')
+        return {row[0] for row in cur}
+
+    def get_checkpoint(self, name):
+        """
+        Args:
+            name (str): Checkpoint name, e.g. 'hot-100'
+
+        Returns:
+            int: Last rank committed by an interrupted run, or 0 if none
+        """
+        row = self.conn.execute("SELECT last_rank FROM Checkpoints WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else 0
+
+    def set_checkpoint(self, name, last_rank):
+        """
+        Records the last rank written; committed together with that rank's rows.
+
+        Args:
+            name (str): Checkpoint name
+            last_rank (int): Last Billboard rank written
+        """
+        self.conn.execute("INSERT OR REPLACE INTO Checkpoints (name, last_rank) VALUES (?, ?)", (name, last_rank))
+
+    def clear_checkpoint(self, name):
+        """
+        Removes a checkpoint once its run has finished.
+
+        Args:
+            name (str): Checkpoint name
+        """
+        self.conn.execute("DELETE FROM Checkpoints WHERE name = ?", (name,))
+
+    def stored_chart_dates(self):
+        """
+        Returns:
+            set: Every chart date (YYYY-MM-DD) with entries in ChartEntries
+        """
+        # DISTINCT walks the (chart_date, rank) primary key, not the rows
+        return {row[0] for row in self.conn.execute("SELECT DISTINCT chart_date FROM ChartEntries")}
+
+    def previous_chart(self, chart_date):
+        """
+        Reads the newest stored chart before a given week.
+
+        Args:
+            chart_date (str): Chart week, YYYY-MM-DD
+
+        Returns:
+            tuple: (chart date or None, list of (song_id, name, artists, rank, popularity) rows)
+        """
+        row = self.conn.execute(
+            "SELECT MAX(chart_date) FROM ChartEntries WHERE chart_date < ?", (chart_date,)).fetchone()
+        if row[0] is None:
+            return None, []
+        cur = self.conn.execute('''
+            SELECT Songs.id, Songs.name, Songs.artists, ChartEntries.rank, ChartEntries.popularity
+            FROM ChartEntries
+            JOIN Songs ON Songs.id = ChartEntries.song_id
+            WHERE ChartEntries.chart_date = ?
+            ORDER BY ChartEntries.rank
+        ''', (row[0],))
+        return row[0], cur.fetchall()
+
+    def insert_entries(self, chart_date, entries):
+        """
+        Bulk write chart entries for songs that are already stored.
+
+        Args:
+            chart_date (str): Chart week, YYYY-MM-DD
+            entries (iterable of tuple): (rank, song_id, popularity) rows
+
+        Returns:
+            int: Number of chart entries written
+        """
+        rows = [(chart_date, rank, song_id, popularity) for rank, song_id, popularity in entries]
+        self.conn.executemany('''
+            INSERT INTO ChartEntries (chart_date, rank, song_id, popularity) VALUES (?, ?, ?, ?)
+            ON CONFLICT(chart_date, rank) DO UPDATE SET
+                song_id = excluded.song_id,
+                popularity = COALESCE(excluded.popularity, ChartEntries.popularity)
+        ''', rows)
+        return len(rows)
+
+    def insert_chart(self, chart_date, songs):
+        """
+        Bulk insert one weekly Billboard chart without Spotify data.
+
+        Args:
+            chart_date (str): Chart week, YYYY-MM-DD
+            songs (dict): Parsed chart from billboard.parse_chart
+
+        Returns:
+            int: Number of chart entries written
+        """
+        return self.insert_songs(
+            ((name, info['artists'], info['ranking'], None, None) for name, info in songs.items()),
+            chart_date)
+
+    def song_rank_exists(self, rank, chart_date):
+        """
+        Check if a song with a given Billboard rank already exists in the database.
+
+        Args:
+            rank (int): Billboard song ranking.
+            chart_date (str): Chart week, YYYY-MM-DD
+
+        Returns:
+            bool: True if that week's rank is stored with Spotify data, False otherwise.
+        """
+        cur = self.conn.execute(
+            "SELECT 1 FROM ChartEntries WHERE chart_date = ? AND rank = ? AND popularity IS NOT NULL",
+            (chart_date, rank))
+        return cur.fetchone() is not None
+
+    def insert_album(self, name, release_date):
+        """
+        Insert a single album, returning its id straight from RETURNING.
+
+        Args:
+            name (str): Album name.
+            release_date (str): Album release date.
+
+        Returns:
+            int: ID of the inserted or existing album.
+        """
+        if name not in self._album_ids:
+            # The no-op update makes RETURNING yield the id of an existing row too
+            cur = self.conn.execute('''
+                INSERT INTO Albums (name, release_date) VALUES (?, ?)
+                ON CONFLICT(name) DO UPDATE SET name = excluded.name
+                RETURNING id
+            ''', (name, release_date))
+            self._album_ids[name] = cur.fetchone()[0]
+        return self._album_ids[name]
+
+    def insert_artist(self, name):
+        """
+        Insert a single artist, returning its id straight from RETURNING.
+
+        Args:
+            name (str): Artist name.
+
+        Returns:
+            int: ID of the inserted or existing artist.
+        """
+        if name not in self._artist_ids:
+            cur = self.conn.execute('''
+                INSERT INTO Artists (name) VALUES (?)
+                ON CONFLICT(name) DO UPDATE SET name = excluded.name
+                RETURNING id
+            ''', (name,))
+            self._artist_ids[name] = cur.fetchone()[0]
+        return self._artist_ids[name]
+
+    def insert_albums(self, albums):
+        """
+        Bulk insert albums.
+
+        Args:
+            albums (iterable of tuple): (name, release_date) pairs
+
+        Returns:
+            dict: Maps every given album name to its id
+        """
+        albums = [a for a in albums if a[0] not in self._album_ids]
+        self.conn.executemany(
+            'INSERT OR IGNORE INTO Albums (name, release_date) VALUES (?, ?)', albums)
+        self._lookup_ids('Albums', [a[0] for a in albums], self._album_ids)
+        return self._album_ids
+
+    def insert_artists(self, names):
+        """
+        Bulk insert artists.
+
+        Args:
+            names (iterable of str): Artist names
+
+        Returns:
+            dict: Maps every given artist name to its id
+        """
+        names = [n for n in names if n not in self._artist_ids]
+        self.conn.executemany(
+            'INSERT OR IGNORE INTO Artists (name) VALUES (?)', ((n,) for n in names))
+        self._lookup_ids('Artists', names, self._artist_ids)
+        return self._artist_ids
+
+    def insert_songs(self, songs, chart_date):
+        """
+        Bulk insert songs and their entries in one weekly chart.
+
+        A song is identified by its title and Billboard artist credit, so the
+        same song on later charts reuses its Songs row. A title or credit
+        that has no exact row but names the same song (search.match_song:
+        accents, "(feat. X)", a respelled artist) reuses that song too. An
+        entry already stored for that week and rank is updated, keeping its
+        popularity if the new row has none.
+
+        Args:
+            songs (iterable of tuple): (name, artists, rank, popularity, album_id) rows,
+                where artists is the Billboard artist list
+            chart_date (str): Chart week, YYYY-MM-DD
+
+        Returns:
+            int: Number of chart entries written
+        """
+        rows = [(name, ", ".join(artists), rank, popularity, album_id)
+                for name, artists, rank, popularity, album_id in songs]
+
+        # Songs stored before chart dates existed have no artist credit yet; claim them
+        self.conn.executemany(
+            "UPDATE OR IGNORE Songs SET artists = ? WHERE name = ? AND artists = ''",
+            ((row[1], row[0]) for row in rows if row[1]))
+        matched = self._match_songs(rows)
+        self.conn.executemany(
+            "UPDATE Songs SET album_id = COALESCE(?, album_id) WHERE id = ?",
+            ((row[4], matched[(row[0], row[1])]) for row in rows if (row[0], row[1]) in matched))
+        self.conn.executemany('''
+            INSERT INTO Songs (name, artists, album_id) VALUES (?, ?, ?)
+            ON CONFLICT(name, artists) DO UPDATE SET album_id = COALESCE(excluded.album_id, Songs.album_id)
+        ''', ((row[0], row[1], row[4]) for row in rows if (row[0], row[1]) not in matched))
+        self._lookup_song_ids((row[0], row[1]) for row in rows)
+
+        # Every row is either inserted or updated; total_changes would also count trigger writes
+        self.conn.executemany('''
+            INSERT INTO ChartEntries (chart_date, rank, song_id, popularity) VALUES (?, ?, ?, ?)
+            ON CONFLICT(chart_date, rank) DO UPDATE SET
+                song_id = excluded.song_id,
+                popularity = COALESCE(excluded.popularity, ChartEntries.popularity)
+        ''', ((chart_date, row[2], self._song_ids[(row[0], row[1])], row[3]) for row in rows))
+        return len(rows)
+
+    def insert_song_artists(self, song_artists):
+        """
+        Bulk link songs to their Spotify artists in the SongArtists bridge.
+
+        Args:
+            song_artists (iterable of tuple): (name, billboard artists, spotify artist names)
+                per song, where the song was already written with insert_songs
+
+        Returns:
+            int: Number of links inserted
+        """
+        song_artists = [(name, ", ".join(credit), names) for name, credit, names in song_artists]
+        self._lookup_song_ids((name, credit) for name, credit, _ in song_artists)
+        artist_ids = self.insert_artists([n for _, _, names in song_artists for n in names])
+        rows = [
+            (self._song_ids[(name, credit)], artist_ids[artist_name], position + 1)
+            for name, credit, names in song_artists
+            for position, artist_name in enumerate(names)
+        ]
+        # rowcount, unlike total_changes, leaves out the ArtistWeekStats trigger writes
+        cur = self.conn.executemany('''
+            INSERT OR IGNORE INTO SongArtists (song_id, artist_id, position) VALUES (?, ?, ?)
+        ''', rows)
+        return cur.rowcount
+
+    def insert_top_tracks(self, top_tracks):
+        """
+        Bulk insert artist top tracks.
+
+        Args:
+            top_tracks (dict): Maps artist id to a list of top track names
+
+        Returns:
+            int: Number of rows inserted
+        """
+        rows = [
+            (artist_id, track_name, idx + 1)
+            for artist_id, track_list in top_tracks.items()
+            for idx, track_name in enumerate(track_list)
+        ]
+        self.conn.executemany('''
+            INSERT OR IGNORE INTO ArtistTopTracks (artist_id, track_name, rank)
+            VALUES (?, ?, ?)
+        ''', rows)
+        return len(rows)
+
+    def resolved_tracks(self):
+        """
+        Returns:
+            dict: Maps (title_key, artist_key) to the Spotify track id it resolved to
+        """
+        cur = self.conn.execute('SELECT title_key, artist_key, track_id FROM Resolutions')
+        return {(row[0], row[1]): row[2] for row in cur}
+
+    def insert_resolutions(self, resolutions):
+        """
+        Records which Spotify track each Billboard song resolved to.
+
+        A key that now resolves to a different track is updated; unchanged
+        rows are left alone, so resolved_at keeps the first resolution time.
+
+        Args:
+            resolutions (iterable of tuple): (title_key, artist_key, track_id, artist_ids list)
+
+        Returns:
+            int: Rows inserted or changed
+        """
+        before = self.conn.total_changes
+        self.conn.executemany('''
+            INSERT INTO Resolutions (title_key, artist_key, track_id, artist_ids) VALUES (?, ?, ?, ?)
+            ON CONFLICT (title_key, artist_key) DO UPDATE SET
+                track_id = excluded.track_id,
+                artist_ids = excluded.artist_ids,
+                resolved_at = CURRENT_TIMESTAMP
+            WHERE track_id IS NOT excluded.track_id OR artist_ids IS NOT excluded.artist_ids
+        ''', ((title, artist, track_id, ",".join(artist_ids))
+              for title, artist, track_id, artist_ids in resolutions))
+        return self.conn.total_changes - before
+
+def song_rank_exists(rank, chart_date=None):
     """
     Check if a song with a given Billboard rank already exists in the database.
 
+    Opens a connection for this one check; ingest runs should use
+    MusicStore.song_rank_exists instead.
+
     Args:
         rank (int): Billboard song ranking.
+        chart_date (str): Chart week, YYYY-MM-DD (default: the live chart)
 
     Returns:
-        bool: True if the rank exists in the Songs table, False otherwise.
+        bool: True if the rank exists for that week, False otherwise.
     """
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
-    cur.execute("SELECT 1 FROM Songs WHERE rank = ?", (rank,))
-    exists = cur.fetchone() is not None
-    conn.close()
-    return exists
+    with MusicStore() as store:
+        return store.song_rank_exists(rank, chart_date or current_chart_date())
 
 def insert_album(name, release_date):
     """
@@ -102,14 +1220,8 @@ def insert_album(name, release_date):
     Returns:
         int: ID of the inserted or existing album.
     """
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
-    cur.execute('INSERT OR IGNORE INTO Albums (name, release_date) VALUES (?, ?)', (name, release_date))
-    conn.commit()
-    cur.execute('SELECT id FROM Albums WHERE name = ?', (name,))
-    album_id = cur.fetchone()[0]
-    conn.close()
-    return album_id
+    with MusicStore() as store:
+        return store.insert_album(name, release_date)
 
 def insert_artist(name):
     """
@@ -121,36 +1233,27 @@ def insert_artist(name):
     Returns:
         int: ID of the inserted or existing artist.
     """
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
-    cur.execute('INSERT OR IGNORE INTO Artists (name) VALUES (?)', (name,))
-    conn.commit()
-    cur.execute('SELECT id FROM Artists WHERE name = ?', (name,))
-    artist_id = cur.fetchone()[0]
-    conn.close()
-    return artist_id
+    with MusicStore() as store:
+        return store.insert_artist(name)
 
-def insert_song(name, rank, popularity, album_id):
+def insert_song(name, rank, popularity, album_id, artists=(), chart_date=None):
     """
-    Inserts a song into the Songs table if not already present.
+    Inserts a song into the Songs table if not already present, and its
+    entry in a weekly chart.
 
     Args:
         name (str): Song name
         rank (int): Billboard rank
         popularity (int): Spotify popularity score
         album_id (int): Foreign key referencing the Albums table
+        artists (list of str): Billboard artist credit
+        chart_date (str): Chart week, YYYY-MM-DD (default: the live chart)
 
     Returns:
         None
     """
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
-    cur.execute('''
-        INSERT OR IGNORE INTO Songs (name, rank, popularity, album_id)
-        VALUES (?, ?, ?, ?)
-    ''', (name, rank, popularity, album_id))
-    conn.commit()
-    conn.close()
+    with MusicStore() as store:
+        store.insert_songs([(name, artists, rank, popularity, album_id)], chart_date or current_chart_date())
 
 def insert_artist_top_tracks(artist_id, track_list):
     """
@@ -163,12 +1266,40 @@ def insert_artist_top_tracks(artist_id, track_list):
     Returns:
         None
     """
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
-    for idx, track_name in enumerate(track_list):
-        cur.execute('''
-            INSERT OR IGNORE INTO ArtistTopTracks (artist_id, track_name, rank)
-            VALUES (?, ?, ?)
-        ''', (artist_id, track_name, idx + 1))
-    conn.commit()
-    conn.close()
+    with MusicStore() as store:
+        store.insert_top_tracks({artist_id: track_list})
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Maintain music_data.sqlite.")
+    parser.add_argument('command', choices=['migrate', 'check-stats', 'stats'],
+                        help="migrate: apply pending schema migrations; "
+                             "check-stats: rebuild artist aggregates and compare with the stored ones; "
+                             "stats: print row counts and chart weeks (read-only)")
+    parser.add_argument('--db', default=DB_NAME, help="database file (default: music_data.sqlite)")
+    parser.add_argument('--rebuild', action='store_true', help="with check-stats, replace inconsistent aggregates")
+    args = parser.parse_args(argv)
+
+    if args.command == 'stats':
+        for name, value in database_stats(args.db).items():
+            print(f"{name:>20}: {value}")
+        return 0
+
+    create_music_db(args.db)
+    if args.command == 'migrate':
+        print(f"✅ {args.db} is at schema version {SCHEMA_VERSION}")
+        return 0
+
+    mismatches = check_artist_stats(args.db, rebuild=args.rebuild)
+    for chart_date, artist_id, stored, expected in mismatches:
+        print(f"❌ {chart_date} artist {artist_id}: stored {stored}, expected {expected}")
+    if not mismatches:
+        print("✅ Artist aggregates match a full rebuild")
+        return 0
+    if args.rebuild:
+        print(f"✅ Rebuilt artist aggregates ({len(mismatches)} rows were wrong)")
+        return 0
+    return 1
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,156 @@
+"""
+delta.py
+
+This module ingests a weekly chart as a delta against the last stored one.
+
+Week to week most of the Hot 100 is the same songs at new positions, so
+instead of enriching all 100 entries the fresh chart is diffed against the
+previous stored week:
+- new: songs not on the previous chart; these go through the Spotify
+  enrichment pipeline (pipeline.py)
+- moved: songs already on the previous chart (at the same or another
+  rank); they are written straight to ChartEntries with their known
+  song id and popularity, all in one batched transaction (a song with no
+  stored popularity has it read from Spotify by track id, in batches of 50)
+- dropped: songs on the previous chart but not on this one; nothing is
+  written for them, they are only reported
+
+Songs are matched by title and Billboard credit, falling back to the
+normalized (title, lead artist) key from search.py, so credit spelling
+changes between weeks do not turn a moved song into a new one.
+"""
+from pipeline import run_pipeline
+from search import normalize_title, resolution_key
+from spotify_data import fetch_tracks_batched, get_spotify_client
+import metrics
+
+@metrics.timed('delta.diff')
+def diff_chart(billboard_data, previous_rows):
+    """
+    Classifies the entries of a freshly parsed chart against the previous week.
+
+    Args:
+        billboard_data (dict): Billboard song names and info (ranking, artists)
+        previous_rows (list of tuple): (song_id, name, artists, rank, popularity)
+            rows of the previous stored week, from MusicStore.previous_chart
+
+    Returns:
+        dict:
+            'new' (dict): Billboard name -> info for songs not on the previous chart
+            'moved' (list of tuple): (name, info, song_id, previous rank, previous popularity)
+            'dropped' (list of tuple): (song_id, name, previous rank)
+    """
+    exact = {}
+    normalized = {}
+    by_title = {}
+    for row in previous_rows:
+        name, artists = row[1], row[2]
+        exact[(name, artists)] = row
+        normalized.setdefault(resolution_key(name, artists.split(", ") if artists else []), row)
+        # Songs stored before artist credits existed can only be matched on title
+        if not artists:
+            by_title.setdefault(normalize_title(name), row)
+
+    new = {}
+    moved = []
+    matched = set()
+    for name, info in sorted(billboard_data.items(), key=lambda item: item[1]['ranking']):
+        row = (exact.get((name, ", ".join(info['artists'])))
+               or normalized.get(resolution_key(name, info['artists']))
+               or by_title.get(normalize_title(name)))
+        if row is None or row[0] in matched:
+            new[name] = info
+        else:
+            matched.add(row[0])
+            moved.append((name, info, row[0], row[3], row[4]))
+
+    dropped = [(row[0], row[1], row[3]) for row in previous_rows if row[0] not in matched]
+    return {'new': new, 'moved': moved, 'dropped': dropped}
+
+def refreshed_popularity(store, moved, sp, limiter=None):
+    """
+    Re-reads the current Spotify popularity of moved songs that were
+    resolved to a track id, 50 tracks per request.
+
+    Args:
+        store (MusicStore): Open storage object
+        moved (list of tuple): 'moved' entries from diff_chart
+        sp (spotipy.Spotify): Spotify client
+        limiter (RateLimiter): Optional rate limiter for the calls
+
+    Returns:
+        dict: Maps song id to its current popularity
+    """
+    resolved = store.resolved_tracks()
+    track_ids = {}
+    for name, info, song_id, _, _ in moved:
+        track_id = resolved.get(resolution_key(name, info['artists']))
+        if track_id:
+            track_ids[song_id] = track_id
+    if not track_ids:
+        return {}
+    tracks = fetch_tracks_batched(sp, list(track_ids.values()), limiter)
+    return {song_id: tracks[track_id]['popularity']
+            for song_id, track_id in track_ids.items() if track_id in tracks}
+
+@metrics.timed('delta.run')
+def run_delta(store, billboard_data, chart_date, refresh=False, batch_size=10, max_workers=8,
+              cache=None, sp=None):
+    """
+    Ingests one weekly chart by enriching only the songs that are new to it.
+
+    Moved entries are committed first, in one transaction; new entries then
+    go through run_pipeline. Moved songs that have never had Spotify data
+    (no popularity and no resolved track, e.g. weeks loaded by backfill.py)
+    are enriched along with the new ones; moved songs with a resolved track
+    but no popularity always get theirs re-read by track id.
+
+    Args:
+        store (MusicStore): Open storage object
+        billboard_data (dict): Billboard song names and info (ranking, artists)
+        chart_date (str): Chart week, YYYY-MM-DD
+        refresh (bool): Re-read every moved song's popularity from Spotify by
+            track id instead of carrying last week's value forward
+        batch_size (int): Songs per enrichment batch (default: 10)
+        max_workers (int): Concurrent Spotify requests per batch (default: 8)
+        cache (ResponseCache): Optional persistent response cache
+        sp (spotipy.Spotify): Optional Spotify client
+
+    Returns:
+        dict: 'previous_week', and counts of 'new', 'moved', 'dropped' entries,
+        'entries_written' and 'top_tracks_added'
+    """
+    previous_week, previous_rows = store.previous_chart(chart_date)
+    diff = diff_chart(billboard_data, previous_rows)
+
+    resolved = store.resolved_tracks()
+    to_enrich = dict(diff['new'])
+    carried = []
+    for name, info, song_id, previous_rank, popularity in diff['moved']:
+        if popularity is None and resolution_key(name, info['artists']) not in resolved:
+            to_enrich[name] = info
+        else:
+            carried.append((name, info, song_id, previous_rank, popularity))
+
+    # Without refresh, only songs with no popularity to carry forward are re-read
+    stale = carried if refresh else [entry for entry in carried if entry[4] is None]
+    current = {}
+    if stale:
+        sp = sp or get_spotify_client()
+        current = refreshed_popularity(store, stale, sp)
+    written = store.insert_entries(chart_date, (
+        (info['ranking'], song_id, current.get(song_id, popularity))
+        for name, info, song_id, previous_rank, popularity in carried
+    ))
+    store.commit()
+
+    enriched, tracks_added = run_pipeline(store, to_enrich, chart_date, batch_size=batch_size,
+                                          max_workers=max_workers, cache=cache, sp=sp)
+    return {
+        'previous_week': previous_week,
+        'new': len(diff['new']),
+        'moved': len(diff['moved']),
+        'dropped': len(diff['dropped']),
+        'entries_written': written + enriched,
+        'top_tracks_added': tracks_added,
+    }
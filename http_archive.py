@@ -0,0 +1,275 @@
+"""
+http_archive.py
+
+This module records the Billboard and Spotify HTTP traffic of an ingest run
+to an archive file and serves it back later, so the ingest path can be
+benchmarked and regression-tested on machines without network access.
+
+billboard.py calls requests directly and spotipy sends every API call
+through a requests.Session, so both end up in requests' HTTPAdapter.send.
+Patching that one method covers all of their traffic:
+- recording(path): real requests go out and every response is appended to
+  the archive as it arrives
+- replaying(path, latency): responses are served from the archive after an
+  injected delay; a request that was never recorded raises ReplayMiss
+  instead of touching the network
+
+Repeated requests for the same URL are answered in the order they were
+recorded (a 429 followed by a 200 replays as a 429 followed by a 200), and
+the last recorded answer is repeated once they run out.
+
+Spotify's OAuth token exchange is never written to the archive, so no
+access token ends up on disk; replay runs authenticate with ReplayAuth.
+
+Archive format: gzip-compressed JSON lines, one request/response exchange
+per line. Archive file: http_archive.jsonl.gz
+
+Usage:
+    python main.py --record http_archive.jsonl.gz --db /tmp/bench.sqlite
+    python main.py --replay http_archive.jsonl.gz --latency 0.05 --db /tmp/bench.sqlite
+"""
+import base64
+import contextlib
+import gzip
+import hashlib
+import io
+import json
+import random
+import threading
+import time
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3 import HTTPResponse
+
+ARCHIVE_NAME = 'http_archive.jsonl.gz'
+
+# Spotify's client credentials exchange; its response holds a live access token
+TOKEN_URL = 'https://accounts.spotify.com/api/token'
+
+# Response headers worth keeping; the body is stored decoded, so length and
+# encoding headers would be wrong on replay
+KEPT_HEADERS = ('Content-Type', 'ETag', 'Last-Modified', 'Retry-After', 'Cache-Control', 'Location')
+
+class ReplayMiss(requests.exceptions.ConnectionError):
+    """
+    Raised in replay mode for a request the archive has no response for.
+
+    It is a ConnectionError, so callers handle it like the network being down.
+    """
+
+class ReplayAuth:
+    """
+    Stand-in for spotipy's SpotifyClientCredentials during replay: hands out
+    a placeholder token without reading spotify_credentials.txt, calling the
+    token endpoint or writing spotipy's .cache file.
+    """
+
+    def get_access_token(self, as_dict=False):
+        return {'access_token': 'replay', 'token_type': 'Bearer'} if as_dict else 'replay'
+
+def request_key(method, url, body=None):
+    """
+    Identifies a request independent of query parameter order.
+
+    Args:
+        method (str): HTTP method
+        url (str): Full request URL
+        body (bytes or str): Request body, if any
+
+    Returns:
+        str: "METHOD url", plus a hash of the body when there is one
+    """
+    parts = urlsplit(url)
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    key = f"{method.upper()} {urlunsplit((parts.scheme, parts.netloc, parts.path, query, ''))}"
+    if body:
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        key += " #" + hashlib.sha1(body).hexdigest()[:16]
+    return key
+
+def _encode_body(content):
+    """
+    Returns (body, encoding) for an exchange: text when it is UTF-8, else base64.
+    """
+    try:
+        return content.decode('utf-8'), 'utf-8'
+    except UnicodeDecodeError:
+        return base64.b64encode(content).decode('ascii'), 'base64'
+
+def _decode_body(exchange):
+    """
+    Returns the response body of an exchange as bytes.
+    """
+    if exchange.get('encoding') == 'base64':
+        return base64.b64decode(exchange['body'])
+    return exchange['body'].encode('utf-8')
+
+def load_archive(path=ARCHIVE_NAME):
+    """
+    Reads a recorded archive.
+
+    Args:
+        path (str): Archive file (default: http_archive.jsonl.gz)
+
+    Returns:
+        dict: Maps request_key to its recorded exchanges, in recording order
+    """
+    exchanges = {}
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                exchange = json.loads(line)
+                exchanges.setdefault(exchange['key'], []).append(exchange)
+    return exchanges
+
+class TrafficLog:
+    """
+    Counters for one recording or replay session, shared by every thread.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = {}
+        self.misses = 0
+
+    def count(self, url):
+        host = urlsplit(url).netloc
+        with self.lock:
+            self.requests[host] = self.requests.get(host, 0) + 1
+
+    def total(self):
+        return sum(self.requests.values())
+
+    def summary(self):
+        """
+        Returns:
+            str: Requests per host, e.g. "100 api.spotify.com, 1 www.billboard.com"
+        """
+        parts = [f"{n} {host}" for host, n in sorted(self.requests.items(), key=lambda item: -item[1])]
+        if self.misses:
+            parts.append(f"{self.misses} not in the archive")
+        return ", ".join(parts) or "no requests"
+
+@contextlib.contextmanager
+def _patched_send(send):
+    """
+    Routes every requests adapter call through `send` for the duration of the block.
+    """
+    original = HTTPAdapter.send
+    HTTPAdapter.send = send
+    try:
+        yield
+    finally:
+        HTTPAdapter.send = original
+
+@contextlib.contextmanager
+def recording(path=ARCHIVE_NAME, append=False):
+    """
+    Records every HTTP response received inside the block to an archive.
+
+    Args:
+        path (str): Archive file to write (default: http_archive.jsonl.gz)
+        append (bool): Add to an existing archive instead of replacing it
+
+    Yields:
+        TrafficLog: Requests recorded so far
+    """
+    log = TrafficLog()
+    original = HTTPAdapter.send
+    out = gzip.open(path, 'at' if append else 'wt', encoding='utf-8')
+
+    def send(adapter, request, **kwargs):
+        started = time.perf_counter()
+        response = original(adapter, request, **kwargs)
+        if request.url.split('?')[0] == TOKEN_URL:
+            return response
+        body, encoding = _encode_body(response.content)
+        exchange = {
+            'key': request_key(request.method, request.url, request.body),
+            'status': response.status_code,
+            'reason': response.reason,
+            'headers': {name: response.headers[name] for name in KEPT_HEADERS if name in response.headers},
+            'body': body,
+            'encoding': encoding,
+            'elapsed': round(time.perf_counter() - started, 4),
+        }
+        line = json.dumps(exchange, separators=(',', ':')) + '\n'
+        with log.lock:
+            out.write(line)
+            out.flush()
+        log.count(request.url)
+        return response
+
+    try:
+        with _patched_send(send):
+            yield log
+    finally:
+        out.close()
+
+def parse_latency(value):
+    """
+    Parses a --latency option.
+
+    Args:
+        value (str): Seconds per request, or "recorded" to replay each
+            response after the time it originally took
+
+    Returns:
+        float or str: Seconds, or 'recorded'
+    """
+    if value == 'recorded':
+        return value
+    seconds = float(value)
+    if seconds < 0:
+        raise ValueError("latency must not be negative")
+    return seconds
+
+@contextlib.contextmanager
+def replaying(path=ARCHIVE_NAME, latency=0.0, jitter=0.0, seed=0):
+    """
+    Serves every HTTP request made inside the block from a recorded archive.
+
+    Args:
+        path (str): Archive written by recording() (default: http_archive.jsonl.gz)
+        latency (float or str): Seconds to wait before each response, or
+            'recorded' for the time the original response took (default: 0)
+        jitter (float): Extra random delay of up to this many seconds per response
+        seed (int): Seed for the jitter, so runs are repeatable (default: 0)
+
+    Yields:
+        TrafficLog: Requests served so far
+    """
+    archive = load_archive(path)
+    cursors = {}
+    log = TrafficLog()
+    rng = random.Random(seed)
+
+    def send(adapter, request, **kwargs):
+        key = request_key(request.method, request.url, request.body)
+        with log.lock:
+            exchanges = archive.get(key)
+            if not exchanges:
+                log.misses += 1
+            else:
+                position = cursors.get(key, 0)
+                cursors[key] = position + 1
+                exchange = exchanges[min(position, len(exchanges) - 1)]
+                delay = exchange['elapsed'] if latency == 'recorded' else latency
+                if jitter:
+                    delay += rng.uniform(0, jitter)
+        if not exchanges:
+            raise ReplayMiss(f"No recorded response for {key}", request=request)
+
+        if delay:
+            time.sleep(delay)
+        raw = HTTPResponse(body=io.BytesIO(_decode_body(exchange)), headers=exchange['headers'],
+                           status=exchange['status'], reason=exchange.get('reason'),
+                           preload_content=False, decode_content=False)
+        log.count(request.url)
+        return adapter.build_response(request, raw)
+
+    with _patched_send(send):
+        yield log
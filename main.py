@@ -10,70 +10,182 @@ Steps:
 3. Filters out songs already present in the database.
 4. Fetches Spotify metadata for each new song.
 5. Adds new songs, albums, artists, and top tracks into the SQLite database.
-6. Limits the total number of new songs to 25 and top artist tracks to 25 per run.
 
-To populate the full Top 100, run this script multiple times.
-"""
+By default the whole chart is ingested in one run through the streaming
+pipeline in pipeline.py; an interrupted run resumes from its last committed
+rank. Pass --delta to enrich only songs that are new since the last stored
+chart (see delta.py), or --throttled for the original behaviour, which limits each run to
+25 new songs and 25 artist top tracks (run it multiple times to fill the Top 100).
+
+--record and --replay capture the run's Billboard and Spotify traffic to an
+archive and serve it back offline (see http_archive.py), so ingest
+throughput can be measured without the network. Both skip the Billboard page
+cache and the Spotify response cache so every request goes through the archive.
 
-from billboard import top_hundred_songs
-from spotify_data import fetch_spotify_data
-from database import (
-    create_music_db,
-    insert_album,
-    insert_artist,
-    insert_song,
-    insert_artist_top_tracks,
-    song_rank_exists
-)
-
-# Step 1: Initialize the database and create tables (non-destructive)
-create_music_db()
-
-
-# Step 2: Get Billboard Top 100 songs
-billboard_data = top_hundred_songs()
-
-# Step 3: Filter out songs already in the database
-unprocessed_data = {}
-for name, info in billboard_data.items():
-    if not song_rank_exists(info['ranking']):
-        unprocessed_data[name] = info
-    if len(unprocessed_data) == 25:
-        break
-
-if not unprocessed_data:
-    print("✅ All 100 songs have already been processed.")
-    exit()
-
-# Step 3: Get Spotify data for the next 25 unprocessed songs
-song_db, artist_db = fetch_spotify_data(unprocessed_data, limit=25)
-
-
-# Step 5: Insert song and artist data into the database
-new_songs_added = 0
-max_top_tracks = 25
-top_tracks_added = 0
-
-for rank, song in song_db.items():
-    # Only insert if this song rank isn't already in the database
-    if not song_rank_exists(rank):
-        album_id = insert_album(song['album'], song['album_release_date'])
-        insert_song(song['song_name'], rank, song['popularity'], album_id)
-        new_songs_added += 1
-
-        for artist_name in song['artists']:
-            artist_id = insert_artist(artist_name)
-
-            # Only insert top tracks if limit hasn't been reached
-            if artist_name in artist_db and top_tracks_added < max_top_tracks:
-                remaining = max_top_tracks - top_tracks_added
-                trimmed_tracks = artist_db[artist_name][:remaining]
-                insert_artist_top_tracks(artist_id, trimmed_tracks)
-                top_tracks_added += len(trimmed_tracks)
-
-            if top_tracks_added >= max_top_tracks:
-                break
-    if top_tracks_added >= max_top_tracks:
-        break
-
-print(f"\n✅ Successfully processed and inserted {new_songs_added} new songs and {top_tracks_added} artist top tracks into the database.\n")
+To see where a slow run spent its time (scraping, Spotify calls, rate
+limiting or SQLite), run it as `python cli.py --metrics DIR ingest`, which
+writes a JSON run report and a Prometheus textfile (see metrics.py).
+"""
+import argparse
+import contextlib
+import time
+
+from billboard import top_hundred_songs, PAGE_CACHE
+from spotify_data import fetch_spotify_data, get_spotify_client
+from spotify_cache import ResponseCache
+from database import create_music_db, current_chart_date, MusicStore, DB_NAME
+from pipeline import run_pipeline
+from delta import run_delta
+from search import resolution_key
+from http_archive import ARCHIVE_NAME, ReplayAuth, parse_latency, recording, replaying
+import metrics
+
+@metrics.timed('ingest.throttled')
+def run_throttled(store, billboard_data, chart_date, cache, sp=None):
+    """
+    Ingests at most 25 new songs and 25 artist top tracks.
+
+    Args:
+        store (MusicStore): Open storage object
+        billboard_data (dict): Billboard song names and info (ranking, artists)
+        chart_date (str): Chart week, YYYY-MM-DD
+        cache (ResponseCache): Persistent Spotify response cache
+        sp (spotipy.Spotify): Optional Spotify client
+
+    Returns:
+        tuple: (songs inserted, top tracks inserted), or None if every song is already stored
+    """
+    # Filter out songs already in the database
+    stored_ranks = store.existing_ranks(chart_date)
+    unprocessed_data = {}
+    for name, info in billboard_data.items():
+        if info['ranking'] not in stored_ranks:
+            unprocessed_data[name] = info
+        if len(unprocessed_data) == 25:
+            break
+
+    if not unprocessed_data:
+        return None
+
+    # Get Spotify data for the next 25 unprocessed songs, 8 requests at a time,
+    # reusing any response already cached by an earlier run and skipping artists
+    # whose top tracks an earlier run already stored; songs resolved in an
+    # earlier week are fetched by track id instead of searched
+    song_db, artist_db = fetch_spotify_data(unprocessed_data, limit=25, max_workers=8, sp=sp, cache=cache,
+                                            known_artists=store.artists_with_top_tracks(),
+                                            resolved=store.resolved_tracks())
+
+    # Decide what to insert, honouring the top track limit
+    max_top_tracks = 25
+    top_tracks_added = 0
+    new_songs = []
+    new_artists = []
+    artist_tracks = {}
+
+    for rank, song in song_db.items():
+        # Only insert if this song rank isn't already in the database
+        if rank not in stored_ranks:
+            new_songs.append((rank, song))
+
+            for artist_name in song['artists']:
+                new_artists.append(artist_name)
+
+                # Only insert top tracks if limit hasn't been reached
+                if artist_name in artist_db and top_tracks_added < max_top_tracks:
+                    remaining = max_top_tracks - top_tracks_added
+                    trimmed_tracks = artist_db[artist_name][:remaining]
+                    artist_tracks.setdefault(artist_name, []).extend(trimmed_tracks)
+                    top_tracks_added += len(trimmed_tracks)
+
+                if top_tracks_added >= max_top_tracks:
+                    break
+        if top_tracks_added >= max_top_tracks:
+            break
+
+    # Bulk insert albums, songs, artists and top tracks
+    album_ids = store.insert_albums((song['album'], song['album_release_date']) for _, song in new_songs)
+    credits = {info['ranking']: info['artists'] for info in unprocessed_data.values()}
+    new_songs_added = store.insert_songs(
+        ((song['song_name'], credits[rank], rank, song['popularity'], album_ids[song['album']])
+         for rank, song in new_songs),
+        chart_date
+    )
+    store.insert_song_artists((song['song_name'], credits[rank], song['artists']) for rank, song in new_songs)
+    store.insert_resolutions((*resolution_key(song['song_name'], credits[rank]), song['track_id'], song['artist_ids'])
+                             for rank, song in new_songs)
+    artist_ids = store.insert_artists(new_artists)
+    store.insert_top_tracks({artist_ids[name]: tracks for name, tracks in artist_tracks.items()})
+    return new_songs_added, top_tracks_added
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Populate music_data.sqlite from Billboard and Spotify.")
+    parser.add_argument('--throttled', action='store_true',
+                        help="only ingest 25 songs and 25 top tracks per run, like earlier versions")
+    parser.add_argument('--delta', action='store_true',
+                        help="diff against the last stored chart and only enrich new songs")
+    parser.add_argument('--refresh-popularity', action='store_true',
+                        help="with --delta, re-read moved songs' popularity from Spotify by track id")
+    parser.add_argument('--batch-size', type=int, default=10, help="songs per pipeline batch (default: 10)")
+    parser.add_argument('--workers', type=int, default=8, help="concurrent Spotify requests (default: 8)")
+    parser.add_argument('--db', default=DB_NAME, help="database file (default: music_data.sqlite)")
+    traffic = parser.add_mutually_exclusive_group()
+    traffic.add_argument('--record', nargs='?', const=ARCHIVE_NAME, metavar='ARCHIVE',
+                         help=f"save all HTTP responses to an archive (default: {ARCHIVE_NAME})")
+    traffic.add_argument('--replay', nargs='?', const=ARCHIVE_NAME, metavar='ARCHIVE',
+                         help="serve all HTTP requests from a recorded archive, offline")
+    parser.add_argument('--latency', type=parse_latency, default=0.0,
+                        help="with --replay, seconds to delay each response, or 'recorded' (default: 0)")
+    parser.add_argument('--jitter', type=float, default=0.0,
+                        help="with --replay, extra random delay of up to this many seconds")
+    args = parser.parse_args(argv)
+
+    sp = None
+    if args.record:
+        session = recording(args.record)
+    elif args.replay:
+        session = replaying(args.replay, args.latency, args.jitter)
+        sp = get_spotify_client(manage_retries=True, auth_manager=ReplayAuth())
+    else:
+        session = contextlib.nullcontext()
+    archived = args.record or args.replay
+    started = time.perf_counter()
+
+    # Step 1: Initialize the database and create tables (non-destructive)
+    create_music_db(args.db)
+
+    with session as log:
+        # Step 2: Get Billboard Top 100 songs, reusing the last parse if the chart hasn't changed
+        with metrics.span('ingest.scrape'):
+            billboard_data, page_week = top_hundred_songs(cache_path=None if archived else PAGE_CACHE,
+                                                          with_week=True)
+        # The page's own "Week of" date; the wall clock only if the page has none
+        chart_date = page_week or current_chart_date()
+
+        # Steps 3-5: Filter, enrich and insert, sharing one connection for the whole run
+        with MusicStore(args.db) as store, (contextlib.nullcontext() if archived else ResponseCache()) as cache:
+            if args.throttled:
+                result = run_throttled(store, billboard_data, chart_date, cache, sp=sp)
+            elif args.delta:
+                delta = run_delta(store, billboard_data, chart_date, refresh=args.refresh_popularity,
+                                  batch_size=args.batch_size, max_workers=args.workers, cache=cache, sp=sp)
+                print(f"✅ Compared with {delta['previous_week'] or 'no earlier chart'}: {delta['new']} new, "
+                      f"{delta['moved']} moved, {delta['dropped']} dropped")
+                result = (delta['entries_written'], delta['top_tracks_added'])
+            else:
+                result = run_pipeline(store, billboard_data, chart_date, batch_size=args.batch_size,
+                                      max_workers=args.workers, cache=cache, sp=sp)
+            if cache is not None:
+                print(f"⏱  Spotify cache: {cache.summary()}, {cache.purge_expired()} expired entries purged")
+
+    if archived:
+        verb = "Recorded" if args.record else "Replayed"
+        print(f"⏱  {verb} {log.summary()} in {time.perf_counter() - started:.2f}s ({archived})")
+
+    if not result or result == (0, 0):
+        print("✅ All 100 songs have already been processed.")
+        return
+    new_songs_added, top_tracks_added = result
+    print(f"\n✅ Successfully processed and inserted {new_songs_added} new songs and {top_tracks_added} artist top tracks into the database.\n")
+
+if __name__ == "__main__":
+    main()
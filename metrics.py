@@ -0,0 +1,494 @@
+"""
+metrics.py
+
+This module is the project's instrumentation layer: it records where a run
+spends its time and writes the result as a JSON run report and a
+Prometheus textfile.
+
+What is recorded while instrumentation is enabled:
+- spans: named, timed stages (billboard.fetch, spotify.rate_limit_wait,
+  pipeline.load_batch, visuals.render...), with call counts, total and
+  maximum seconds, and a timeline of individual spans with their parent
+- HTTP: every request sent through requests (billboard.py directly and
+  spotipy underneath), counted by method, host, endpoint and status, with
+  a latency histogram per endpoint
+- SQL: every statement run on a connection opened by database.connect(),
+  counted and timed by statement kind and table (e.g. "INSERT ChartEntries",
+  "COMMIT")
+- counters: notable events, e.g. Spotify 429 responses
+
+Instrumentation is off by default. Disabled, span() returns a shared no-op
+context manager, timed functions make one extra check per call, and no
+HTTP or SQL hook is installed at all.
+
+Usage:
+    python cli.py --metrics metrics ingest --delta
+    # -> metrics/ingest.json and metrics/ingest.prom (for node_exporter's textfile collector)
+
+    with metrics.session('metrics', 'nightly'):
+        ...
+"""
+import contextlib
+import functools
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from urllib.parse import urlsplit
+
+# Prefix of every exported Prometheus metric
+PREFIX = 'musicdata'
+
+# Upper bounds in seconds of the HTTP latency histogram buckets
+HTTP_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Individual spans kept for the report timeline; aggregates are always complete
+MAX_TIMELINE = 10000
+
+# Path segments that identify one resource (Spotify ids, numbers, chart dates)
+_ID_SEGMENT = re.compile(r'^(?:[A-Za-z0-9]{22}|\d+|\d{4}-\d{2}-\d{2})$')
+
+# The table a statement reads or writes
+_TABLE = re.compile(r'\b(?:INTO|FROM|UPDATE(?:\s+OR\s+\w+)?|TABLE(?:\s+IF\s+(?:NOT\s+)?EXISTS)?)\s+([A-Za-z_]\w*)',
+                    re.IGNORECASE)
+
+_recorder = None
+_NOOP = contextlib.nullcontext()
+
+class Recorder:
+    """
+    Collects spans, HTTP requests, SQL statements and counters for one run.
+
+    Shared by every thread of the run.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.started = datetime.now()
+        self.origin = time.perf_counter()
+        self.spans = {}
+        self.timeline = []
+        self.http = {}
+        self.http_latency = {}
+        self.sql = {}
+        self.counters = {}
+
+    def add_span(self, name, seconds, start=None, parent=None):
+        with self.lock:
+            stats = self.spans.setdefault(name, [0, 0.0, 0.0])
+            stats[0] += 1
+            stats[1] += seconds
+            stats[2] = max(stats[2], seconds)
+            if start is not None and len(self.timeline) < MAX_TIMELINE:
+                self.timeline.append({
+                    'span': name,
+                    'parent': parent,
+                    'thread': threading.current_thread().name,
+                    'start': round(start - self.origin, 6),
+                    'seconds': round(seconds, 6),
+                })
+
+    def add_http(self, method, url, status, seconds):
+        host, path = endpoint(url)
+        with self.lock:
+            key = (method, host, path, status)
+            self.http[key] = self.http.get(key, 0) + 1
+            histogram = self.http_latency.setdefault((host, path), [0] * (len(HTTP_BUCKETS) + 1) + [0.0])
+            bucket = 0
+            while bucket < len(HTTP_BUCKETS) and seconds > HTTP_BUCKETS[bucket]:
+                bucket += 1
+            histogram[bucket] += 1
+            histogram[-1] += seconds
+
+    def add_sql(self, sql, seconds, rows):
+        label = statement_label(sql)
+        with self.lock:
+            stats = self.sql.setdefault(label, [0, 0, 0.0, 0.0])
+            stats[0] += 1
+            stats[1] += max(rows, 0)
+            stats[2] += seconds
+            stats[3] = max(stats[3], seconds)
+
+    def increment(self, name, amount=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+class _Span:
+    """
+    Times the block it wraps and records it under `name`, nested under the
+    span open on the same thread.
+    """
+    __slots__ = ('recorder', 'name', 'start', 'parent')
+
+    def __init__(self, recorder, name):
+        self.recorder = recorder
+        self.name = name
+
+    def __enter__(self):
+        stack = self.recorder.local.__dict__.setdefault('stack', [])
+        self.parent = stack[-1] if stack else None
+        stack.append(self.name)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self.start
+        self.recorder.local.stack.pop()
+        self.recorder.add_span(self.name, seconds, self.start, self.parent)
+        return False
+
+def enabled():
+    """
+    Returns:
+        bool: Whether a run is being instrumented
+    """
+    return _recorder is not None
+
+def span(name):
+    """
+    Times a block as one stage of the run:
+
+        with metrics.span('billboard.parse'):
+            ...
+
+    Args:
+        name (str): Stage name, dotted by module
+
+    Returns:
+        A context manager; a shared no-op one while instrumentation is disabled
+    """
+    if _recorder is None:
+        return _NOOP
+    return _Span(_recorder, name)
+
+def timed(name):
+    """
+    Decorator that records every call of a function as a span.
+
+    Args:
+        name (str): Stage name, dotted by module
+    """
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _recorder is None:
+                return func(*args, **kwargs)
+            with _Span(_recorder, name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def observe(name, seconds):
+    """
+    Records a stage timed somewhere else, e.g. in a worker process.
+
+    Args:
+        name (str): Stage name
+        seconds (float): Time it took
+    """
+    if _recorder is not None:
+        _recorder.add_span(name, seconds)
+
+def increment(name, amount=1):
+    """
+    Adds to an event counter, e.g. metrics.increment('spotify.throttled').
+    """
+    if _recorder is not None:
+        _recorder.increment(name, amount)
+
+def endpoint(url):
+    """
+    Groups request URLs by endpoint.
+
+    Args:
+        url (str): Full request URL
+
+    Returns:
+        tuple: (host, path with ids, numbers and dates replaced by {id})
+    """
+    parts = urlsplit(url)
+    path = "/".join("{id}" if _ID_SEGMENT.match(segment) else segment for segment in parts.path.split("/"))
+    return parts.netloc, path or "/"
+
+@functools.lru_cache(maxsize=1024)
+def statement_label(sql):
+    """
+    Groups SQL statements by kind and table.
+
+    Args:
+        sql (str): Statement text
+
+    Returns:
+        str: e.g. "INSERT ChartEntries", "SELECT Songs", "PRAGMA journal_mode", "COMMIT"
+    """
+    words = sql.split(None, 2)
+    if not words:
+        return "EMPTY"
+    verb = words[0].upper()
+    if verb == 'PRAGMA' and len(words) > 1:
+        return "PRAGMA " + re.split(r'[\s=(]', words[1], maxsplit=1)[0].lower()
+    if verb in ('SELECT', 'INSERT', 'REPLACE', 'UPDATE', 'DELETE', 'WITH', 'CREATE', 'DROP', 'ALTER'):
+        match = _TABLE.search(sql)
+        if match:
+            return f"{verb} {match.group(1)}"
+    return verb
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """
+    Cursor that times every statement it runs. For queries this is the time
+    to the first row; fetching the rest is not included.
+    """
+
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            if _recorder is not None:
+                _recorder.add_sql(sql, time.perf_counter() - start, self.rowcount)
+
+    def executemany(self, sql, seq_of_parameters):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            if _recorder is not None:
+                _recorder.add_sql(sql, time.perf_counter() - start, self.rowcount)
+
+    def executescript(self, sql_script):
+        start = time.perf_counter()
+        try:
+            return super().executescript(sql_script)
+        finally:
+            if _recorder is not None:
+                _recorder.add_sql("SCRIPT", time.perf_counter() - start, 0)
+
+class InstrumentedConnection(sqlite3.Connection):
+    """
+    Connection whose cursors, including the ones behind the execute()
+    shortcuts and pandas.read_sql_query, are InstrumentedCursors.
+    """
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self.cursor().executescript(sql_script)
+
+def connection_factory():
+    """
+    Returns:
+        type: The sqlite3 connection class database.connect() should use
+    """
+    return InstrumentedConnection if _recorder is not None else sqlite3.Connection
+
+def _install_http_hook(recorder):
+    """
+    Wraps requests.Session.send so every request, redirect hops included, is
+    counted and timed. Wrapping the session (not the adapter) also sees
+    responses served by http_archive's replay.
+
+    Returns:
+        function: The original Session.send, to put back afterwards
+    """
+    import requests
+    original = requests.Session.send
+
+    def send(session, request, **kwargs):
+        start = time.perf_counter()
+        status = 'error'
+        try:
+            response = original(session, request, **kwargs)
+            status = str(response.status_code)
+            return response
+        finally:
+            recorder.add_http(request.method, request.url, status, time.perf_counter() - start)
+
+    requests.Session.send = send
+    return original
+
+def enable():
+    """
+    Starts instrumenting with a fresh recorder and installs the HTTP hook.
+
+    Returns:
+        Recorder: The new recorder
+    """
+    global _recorder
+    if _recorder is not None:
+        raise RuntimeError("instrumentation is already enabled")
+    recorder = Recorder()
+    recorder.http_send = _install_http_hook(recorder)
+    _recorder = recorder
+    return recorder
+
+def disable():
+    """
+    Stops instrumenting and removes the HTTP hook.
+
+    Returns:
+        Recorder: What was recorded, or None if instrumentation was off
+    """
+    global _recorder
+    recorder, _recorder = _recorder, None
+    if recorder is not None:
+        import requests
+        requests.Session.send = recorder.http_send
+    return recorder
+
+def report(recorder, run=None, argv=None):
+    """
+    Builds the JSON run report.
+
+    Args:
+        recorder (Recorder): What was recorded
+        run (str): Name of the run, e.g. the cli.py subcommand
+        argv (list of str): Command line of the run
+
+    Returns:
+        dict: Run metadata, then 'spans', 'timeline', 'http', 'http_latency',
+        'sql' and 'counters', each ordered by time spent or count
+    """
+    with recorder.lock:
+        spans = sorted(recorder.spans.items(), key=lambda item: -item[1][1])
+        sql = sorted(recorder.sql.items(), key=lambda item: -item[1][2])
+        http = sorted(recorder.http.items(), key=lambda item: -item[1])
+        latency = sorted(recorder.http_latency.items(), key=lambda item: -item[1][-1])
+        return {
+            'run': run,
+            'argv': argv,
+            'started': recorder.started.isoformat(timespec='seconds'),
+            'duration_seconds': round(time.perf_counter() - recorder.origin, 6),
+            'spans': {name: {'count': s[0], 'total_seconds': round(s[1], 6), 'max_seconds': round(s[2], 6)}
+                      for name, s in spans},
+            'timeline': list(recorder.timeline),
+            'http': [{'method': k[0], 'host': k[1], 'endpoint': k[2], 'status': k[3], 'count': n}
+                     for k, n in http],
+            'http_latency': [{
+                'host': host,
+                'endpoint': path,
+                'count': sum(h[:-1]),
+                'sum_seconds': round(h[-1], 6),
+                'buckets': dict(zip([str(b) for b in HTTP_BUCKETS] + ['+Inf'], _cumulative(h[:-1]))),
+            } for (host, path), h in latency],
+            'sql': [{'statement': label, 'count': s[0], 'rows': s[1], 'total_seconds': round(s[2], 6),
+                     'max_seconds': round(s[3], 6)} for label, s in sql],
+            'counters': dict(sorted(recorder.counters.items())),
+        }
+
+def _cumulative(counts):
+    total = 0
+    out = []
+    for count in counts:
+        total += count
+        out.append(total)
+    return out
+
+def _labels(**labels):
+    """
+    Formats Prometheus labels, escaping backslashes, quotes and newlines.
+    """
+    escaped = (f'{k}="' + str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+               for k, v in labels.items())
+    return "{" + ",".join(escaped) + "}"
+
+def prometheus_text(run_report):
+    """
+    Renders a run report in the Prometheus text exposition format.
+
+    Args:
+        run_report (dict): Output of report()
+
+    Returns:
+        str: Metrics text, as read by node_exporter's textfile collector
+    """
+    run = run_report['run'] or 'run'
+    lines = []
+
+    def metric(name, kind, help_text, samples):
+        lines.append(f"# HELP {PREFIX}_{name} {help_text}")
+        lines.append(f"# TYPE {PREFIX}_{name} {kind}")
+        for suffix, labels, value in samples:
+            lines.append(f"{PREFIX}_{name}{suffix}{_labels(run=run, **labels)} {value}")
+
+    metric('run_duration_seconds', 'gauge', "Wall time of the last run.",
+           [('', {}, run_report['duration_seconds'])])
+    metric('run_start_time_seconds', 'gauge', "Unix time the last run started.",
+           [('', {}, round(datetime.fromisoformat(run_report['started']).timestamp()))])
+    metric('span_seconds', 'summary', "Time spent in each instrumented stage.",
+           [s for name, stats in run_report['spans'].items()
+            for s in (('_sum', {'span': name}, stats['total_seconds']), ('_count', {'span': name}, stats['count']))])
+    metric('http_requests_total', 'counter', "HTTP requests by endpoint and status.",
+           [('', {'method': r['method'], 'host': r['host'], 'endpoint': r['endpoint'], 'status': r['status']},
+             r['count']) for r in run_report['http']])
+    metric('http_request_duration_seconds', 'histogram', "HTTP request latency by endpoint.",
+           [s for h in run_report['http_latency']
+            for s in ([('_bucket', {'host': h['host'], 'endpoint': h['endpoint'], 'le': le}, n)
+                       for le, n in h['buckets'].items()]
+                      + [('_sum', {'host': h['host'], 'endpoint': h['endpoint']}, h['sum_seconds']),
+                         ('_count', {'host': h['host'], 'endpoint': h['endpoint']}, h['count'])])])
+    metric('sql_statements_total', 'counter', "SQL statements by kind and table.",
+           [('', {'statement': s['statement']}, s['count']) for s in run_report['sql']])
+    metric('sql_statement_seconds_total', 'counter', "Time spent running SQL statements by kind and table.",
+           [('', {'statement': s['statement']}, s['total_seconds']) for s in run_report['sql']])
+    metric('sql_rows_total', 'counter', "Rows changed by SQL statements by kind and table.",
+           [('', {'statement': s['statement']}, s['rows']) for s in run_report['sql']])
+    metric('events_total', 'counter', "Notable events, e.g. Spotify 429 responses.",
+           [('', {'event': name}, n) for name, n in run_report['counters'].items()])
+    return "\n".join(lines) + "\n"
+
+def _write_atomic(path, text):
+    """
+    Writes a file through a temporary name, so collectors never read half of it.
+    """
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+def write_outputs(run_report, out_dir, name):
+    """
+    Writes <out_dir>/<name>.json and <out_dir>/<name>.prom.
+
+    Returns:
+        tuple: (report path, textfile path)
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    json_path = os.path.join(out_dir, f"{name}.json")
+    prom_path = os.path.join(out_dir, f"{name}.prom")
+    _write_atomic(json_path, json.dumps(run_report, indent=2) + "\n")
+    _write_atomic(prom_path, prometheus_text(run_report))
+    return json_path, prom_path
+
+@contextlib.contextmanager
+def session(out_dir, name='run', argv=None):
+    """
+    Instruments the block and writes its report and textfile when it ends,
+    also when it raises.
+
+    Args:
+        out_dir (str): Directory for <name>.json and <name>.prom
+        name (str): Name of the run
+        argv (list of str): Command line, stored in the report
+
+    Yields:
+        Recorder: The live recorder
+    """
+    recorder = enable()
+    try:
+        with span(name):
+            yield recorder
+    finally:
+        disable()
+        paths = write_outputs(report(recorder, name, argv), out_dir, name)
+        print(f"✅ Run report written to {paths[0]} and {paths[1]}")
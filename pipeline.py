@@ -0,0 +1,201 @@
+"""
+pipeline.py
+
+This module ingests the whole Billboard Hot 100 in a single run as a
+streaming scrape -> enrich -> load pipeline.
+
+Stages:
+1. Scrape: yields unprocessed chart entries in rank order, skipping ranks
+   already stored or already covered by a checkpoint.
+2. Enrich: a background thread groups entries into small batches, looks them
+   up on Spotify and puts the results on a bounded queue.
+3. Load: the calling thread drains the queue and writes each batch through
+   one MusicStore, committing the batch together with a checkpoint.
+
+Because the queue is bounded, enrichment never runs more than a few batches
+ahead of the database, and writes overlap with the next batch's network
+calls. If a run crashes, the next run resumes after the last committed rank.
+"""
+import queue
+import threading
+
+from spotify_data import fetch_spotify_data
+from database import current_chart_date
+from search import resolution_key
+import metrics
+
+CHECKPOINT_PREFIX = 'hot-100/'
+
+# Marks the end of the enrich stage's output
+_DONE = object()
+
+def scrape_stage(billboard_data, stored_ranks, resume_after=0):
+    """
+    Yields chart entries that still need to be ingested, in rank order.
+
+    Args:
+        billboard_data (dict): Billboard song names and info (ranking, artists)
+        stored_ranks (set of int): Ranks of this week already stored with Spotify data
+        resume_after (int): Last rank committed by an interrupted run
+
+    Yields:
+        tuple: (song name, info dict)
+    """
+    for name, info in sorted(billboard_data.items(), key=lambda item: item[1]['ranking']):
+        if info['ranking'] > resume_after and info['ranking'] not in stored_ranks:
+            yield name, info
+
+def batched(entries, batch_size):
+    """
+    Groups an iterable of (name, info) entries into dicts of up to batch_size songs.
+
+    Yields:
+        dict: Billboard song names mapped to their info
+    """
+    batch = {}
+    for name, info in entries:
+        batch[name] = info
+        if len(batch) == batch_size:
+            yield batch
+            batch = {}
+    if batch:
+        yield batch
+
+def enrich_stage(batches, out_queue, known_artists, max_workers=8, cache=None, sp=None, stop=None,
+                 resolved=None):
+    """
+    Looks up every batch on Spotify and puts the results on a bounded queue.
+
+    Runs in its own thread. Always finishes by putting _DONE, or the
+    exception that stopped it, on the queue.
+
+    Args:
+        batches (iterable of dict): Output of batched()
+        out_queue (queue.Queue): Bounded queue read by the load stage
+        known_artists (set of str): Artists whose top tracks are already
+            stored; newly fetched artists are added as the run goes
+        max_workers (int): Concurrent Spotify requests per batch
+        cache (ResponseCache): Optional persistent response cache
+        sp (spotipy.Spotify): Optional Spotify client
+        stop (threading.Event): Set by the load stage to abandon the run
+        resolved (dict): Known Spotify track ids by search.resolution_key;
+            those songs are fetched by id instead of searched
+    """
+    try:
+        for batch in batches:
+            if stop is not None and stop.is_set():
+                break
+            with metrics.span('pipeline.enrich_batch'):
+                song_db, artist_db = fetch_spotify_data(batch, limit=len(batch), max_workers=max_workers,
+                                                        sp=sp, cache=cache, known_artists=known_artists,
+                                                        resolved=resolved)
+            known_artists.update(artist_db)
+            out_queue.put((batch, song_db, artist_db))
+        out_queue.put(_DONE)
+    except Exception as e:
+        out_queue.put(e)
+
+@metrics.timed('pipeline.load_batch')
+def load_batch(store, chart_date, batch, song_db, artist_db):
+    """
+    Writes one enriched batch through the store (without committing).
+
+    Every chart entry of the batch is written; songs Spotify did not find
+    are stored without popularity or album. The Spotify track each found
+    song resolved to is recorded, so later weeks skip its search.
+
+    Returns:
+        tuple: (chart entries written, top tracks inserted)
+    """
+    album_ids = store.insert_albums((song['album'], song['album_release_date']) for song in song_db.values())
+    rows = []
+    for name, info in batch.items():
+        song = song_db.get(info['ranking'])
+        if song:
+            rows.append((name, info['artists'], info['ranking'], song['popularity'], album_ids[song['album']]))
+        else:
+            rows.append((name, info['artists'], info['ranking'], None, None))
+    songs_added = store.insert_songs(rows, chart_date)
+    store.insert_song_artists(
+        (name, info['artists'], song_db[info['ranking']]['artists'])
+        for name, info in batch.items() if info['ranking'] in song_db
+    )
+    store.insert_resolutions(
+        (*resolution_key(name, info['artists']), song_db[info['ranking']]['track_id'],
+         song_db[info['ranking']]['artist_ids'])
+        for name, info in batch.items() if info['ranking'] in song_db
+    )
+    artist_ids = store.insert_artists([name for song in song_db.values() for name in song['artists']]
+                                      + list(artist_db))
+    tracks_added = store.insert_top_tracks({artist_ids[name]: tracks for name, tracks in artist_db.items()})
+    return songs_added, tracks_added
+
+@metrics.timed('pipeline.run')
+def run_pipeline(store, billboard_data, chart_date=None, batch_size=10, buffer_size=2, max_workers=8,
+                 cache=None, sp=None):
+    """
+    Ingests every unprocessed entry of one weekly chart in one run.
+
+    Each batch is committed together with its checkpoint, so a crash loses
+    at most the batch in flight. The checkpoint is cleared once the whole
+    chart has been loaded.
+
+    Args:
+        store (MusicStore): Open storage object
+        billboard_data (dict): Billboard song names and info (ranking, artists)
+        chart_date (str): Chart week, YYYY-MM-DD (default: the live chart)
+        batch_size (int): Songs per enrichment batch (default: 10)
+        buffer_size (int): Enriched batches allowed to wait for the database (default: 2)
+        max_workers (int): Concurrent Spotify requests per batch (default: 8)
+        cache (ResponseCache): Optional persistent response cache
+        sp (spotipy.Spotify): Optional Spotify client
+
+    Returns:
+        tuple: (chart entries written, top tracks inserted)
+    """
+    chart_date = chart_date or current_chart_date()
+    checkpoint = CHECKPOINT_PREFIX + chart_date
+    resume_after = store.get_checkpoint(checkpoint)
+    entries = scrape_stage(billboard_data, store.existing_ranks(chart_date), resume_after)
+    known_artists = store.artists_with_top_tracks()
+    resolved = store.resolved_tracks()
+
+    results = queue.Queue(maxsize=buffer_size)
+    stop = threading.Event()
+    worker = threading.Thread(
+        target=enrich_stage,
+        args=(batched(entries, batch_size), results, known_artists, max_workers, cache, sp, stop, resolved),
+        daemon=True,
+    )
+    worker.start()
+
+    songs_added = 0
+    tracks_added = 0
+    try:
+        while True:
+            # Time the database stage spends waiting on Spotify
+            with metrics.span('pipeline.wait_for_enrich'):
+                item = results.get()
+            if item is _DONE:
+                break
+            if isinstance(item, Exception):
+                raise item
+            batch, song_db, artist_db = item
+            added = load_batch(store, chart_date, batch, song_db, artist_db)
+            songs_added += added[0]
+            tracks_added += added[1]
+            store.set_checkpoint(checkpoint, max(info['ranking'] for info in batch.values()))
+            with metrics.span('pipeline.commit'):
+                store.commit()
+    finally:
+        stop.set()
+        # Unblock the enrich thread if it is waiting on a full queue
+        while worker.is_alive():
+            try:
+                results.get(timeout=0.1)
+            except queue.Empty:
+                pass
+
+    store.clear_checkpoint(checkpoint)
+    store.commit()
+    return songs_added, tracks_added
@@ -0,0 +1,309 @@
+"""
+rolling.py
+
+This module tracks how the rank vs popularity relationship, individual
+artists and individual songs move across every stored chart week:
+- Rolling correlation of Billboard rank and Spotify popularity
+- Per-artist trajectories (best rank, entries and mean popularity per week)
+- Week-over-week rank deltas per song
+
+How it works:
+- The history is split into fixed partitions of consecutive weeks, aligned
+  to the first Hot 100 (1958-08-09), so a new week only ever lands in the
+  last partition.
+- Each partition is computed in its own worker process, which returns
+  per-week correlation sums, per-artist rows and per-song deltas. The
+  parent concatenates them; rolling correlations are then just rolling
+  sums over the per-week totals.
+- Every partition is fingerprinted with the ChartWeekStamps of its weeks
+  (database.py), random stamps that triggers replace on any edit to a
+  week's chart entries or its songs' artist links. Reading them is one
+  small table scan; update() recomputes only partitions whose fingerprint
+  changed, and the partial results can be saved to disk so the next run
+  starts from them.
+
+Usage:
+    python rolling.py --window 8
+    python rolling.py --artist "Sabrina Carpenter"
+"""
+import argparse
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from database import connect
+
+DB_NAME = "music_data.sqlite"
+CACHE_NAME = "rolling_stats.pkl"
+
+# Date of the first Hot 100; partitions are counted from here
+EPOCH = date(1958, 8, 9)
+
+def partition_bounds(key, partition_weeks):
+    """
+    Args:
+        key (int): Partition number counted from EPOCH
+        partition_weeks (int): Weeks per partition
+
+    Returns:
+        tuple: (first chart date, last chart date) of the partition, as YYYY-MM-DD
+    """
+    start = EPOCH + timedelta(weeks=key * partition_weeks)
+    end = start + timedelta(weeks=partition_weeks) - timedelta(days=1)
+    return start.isoformat(), end.isoformat()
+
+def partition_key(chart_date, partition_weeks):
+    """
+    Returns:
+        int: Number of the partition a chart date (YYYY-MM-DD) falls in
+    """
+    return (date.fromisoformat(chart_date) - EPOCH).days // (7 * partition_weeks)
+
+def compute_partition(db_name, start, end):
+    """
+    Computes the per-week statistics of one partition.
+
+    Runs in a worker process with its own connection. The last stored week
+    before `start` is read too, so the first week of the partition gets its
+    deltas even when there are gaps in the history.
+
+    Args:
+        db_name (str): Database file
+        start (str): First chart date of the partition, YYYY-MM-DD
+        end (str): Last chart date of the partition, YYYY-MM-DD
+
+    Returns:
+        dict: 'weeks', 'artists' and 'deltas' DataFrames
+    """
+    conn = connect(db_name, read_only=True)
+    try:
+        lookback = conn.execute("SELECT max(chart_date) FROM ChartEntries WHERE chart_date < ?",
+                                (start,)).fetchone()[0] or start
+        entries = pd.read_sql_query("""
+            SELECT chart_date, rank, song_id, popularity
+            FROM ChartEntries
+            WHERE chart_date BETWEEN ? AND ?
+            ORDER BY chart_date, rank
+        """, conn, params=(lookback, end), dtype={'rank': 'int16', 'song_id': 'int32'})
+        links = pd.read_sql_query("""
+            SELECT ChartEntries.chart_date, SongArtists.artist_id, ChartEntries.rank, ChartEntries.popularity
+            FROM ChartEntries
+            JOIN SongArtists ON SongArtists.song_id = ChartEntries.song_id
+            WHERE ChartEntries.chart_date BETWEEN ? AND ?
+        """, conn, params=(start, end), dtype={'artist_id': 'int32', 'rank': 'int16'})
+    finally:
+        conn.close()
+
+    # Week-over-week deltas: each song's rank in the previous stored week
+    weeks = np.sort(entries['chart_date'].unique())
+    previous_week = dict(zip(weeks[1:], weeks[:-1]))
+    entries['previous_date'] = entries['chart_date'].map(previous_week)
+    previous = entries[['chart_date', 'song_id', 'rank']].rename(
+        columns={'chart_date': 'previous_date', 'rank': 'previous_rank'})
+    deltas = entries.merge(previous, on=['previous_date', 'song_id'], how='left')
+    deltas = deltas[deltas['chart_date'] >= start]
+    # Positive means the song climbed
+    deltas['delta'] = (deltas['previous_rank'] - deltas['rank']).astype('Int16')
+    deltas = deltas[['chart_date', 'song_id', 'rank', 'previous_rank', 'delta', 'popularity']]
+
+    # Per-week sums for the rank/popularity Pearson correlation
+    rated = entries[(entries['chart_date'] >= start) & entries['popularity'].notna()]
+    x = rated['rank'].astype('float64')
+    y = rated['popularity'].astype('float64')
+    week_sums = pd.DataFrame({
+        'chart_date': rated['chart_date'], 'n': 1, 'sx': x, 'sy': y,
+        'sxx': x * x, 'syy': y * y, 'sxy': x * y,
+    }).groupby('chart_date', sort=True).sum().reset_index()
+
+    artists = links.groupby(['chart_date', 'artist_id'], sort=True).agg(
+        best_rank=('rank', 'min'), entries=('rank', 'size'), mean_popularity=('popularity', 'mean'),
+    ).reset_index()
+
+    return {'weeks': week_sums, 'artists': artists, 'deltas': deltas.reset_index(drop=True)}
+
+class RollingStats:
+    """
+    Partitioned, incrementally updated history statistics.
+    """
+
+    def __init__(self, db_name=DB_NAME, partition_weeks=26, max_workers=None):
+        self.db_name = db_name
+        self.partition_weeks = partition_weeks
+        self.max_workers = max_workers
+        # Partition number -> (fingerprint, partial results)
+        self.partitions = {}
+        self._merged = None
+
+    def _fingerprints(self):
+        """
+        Fingerprints every partition with the ChartWeekStamps of its weeks,
+        which triggers replace on every edit to a week's chart entries or
+        to the artist links of its songs, so only that one small table is read.
+
+        Returns:
+            dict: Partition number -> fingerprint tuple of (chart_date, stamp)
+        """
+        conn = connect(self.db_name, read_only=True)
+        try:
+            weeks = conn.execute("SELECT chart_date, stamp FROM ChartWeekStamps ORDER BY chart_date").fetchall()
+        finally:
+            conn.close()
+
+        fingerprints = {}
+        for i, week in enumerate(weeks):
+            key = partition_key(week[0], self.partition_weeks)
+            fingerprints.setdefault(key, [])
+            # The first week of a partition also depends on the week before it
+            if not fingerprints[key] and i > 0:
+                fingerprints[key].append(weeks[i - 1])
+            fingerprints[key].append(week)
+        return {key: tuple(weeks) for key, weeks in fingerprints.items()}
+
+    def update(self):
+        """
+        Recomputes the partitions whose data changed since the last update
+        and drops partitions that no longer have any weeks.
+
+        Returns:
+            list of int: Partition numbers that were recomputed
+        """
+        fingerprints = self._fingerprints()
+        stale = [key for key, fp in fingerprints.items()
+                 if key not in self.partitions or self.partitions[key][0] != fp]
+        removed = [key for key in self.partitions if key not in fingerprints]
+        for key in removed:
+            del self.partitions[key]
+
+        jobs = [(self.db_name, *partition_bounds(key, self.partition_weeks)) for key in stale]
+        if len(jobs) == 1:
+            results = [compute_partition(*jobs[0])]
+        elif jobs:
+            with ProcessPoolExecutor(max_workers=self.max_workers) as pool:
+                results = list(pool.map(compute_partition, *zip(*jobs)))
+        else:
+            results = []
+
+        for key, result in zip(stale, results):
+            self.partitions[key] = (fingerprints[key], result)
+        if stale or removed:
+            self._merged = None
+        return stale
+
+    def _merge(self, name):
+        """
+        Returns:
+            pd.DataFrame: The `name` partial results of every partition, in date order
+        """
+        if self._merged is None:
+            self._merged = {}
+        if name not in self._merged:
+            parts = [self.partitions[key][1][name] for key in sorted(self.partitions)]
+            self._merged[name] = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame()
+        return self._merged[name]
+
+    def rolling_correlation(self, window=8):
+        """
+        Args:
+            window (int): Number of stored weeks in each rolling window (default: 8)
+
+        Returns:
+            pd.DataFrame: 'chart_date', 'entries' and 'correlation' of rank and
+            popularity over the `window` weeks ending at each chart date
+        """
+        weeks = self._merge('weeks')
+        if weeks.empty:
+            return pd.DataFrame(columns=['chart_date', 'entries', 'correlation'])
+        sums = weeks[['n', 'sx', 'sy', 'sxx', 'syy', 'sxy']].rolling(window, min_periods=1).sum()
+        n = sums['n']
+        cov = sums['sxy'] - sums['sx'] * sums['sy'] / n
+        var_x = sums['sxx'] - sums['sx'] ** 2 / n
+        var_y = sums['syy'] - sums['sy'] ** 2 / n
+        corr = cov / np.sqrt(var_x * var_y)
+        return pd.DataFrame({
+            'chart_date': weeks['chart_date'],
+            'entries': n.astype('int64'),
+            'correlation': corr.where((var_x > 0) & (var_y > 0)),
+        })
+
+    def artist_trajectory(self, artist):
+        """
+        Args:
+            artist (str): Artist name as stored in Artists
+
+        Returns:
+            pd.DataFrame: 'chart_date', 'best_rank', 'entries' and 'mean_popularity'
+            for every week the artist charted
+        """
+        conn = connect(self.db_name, read_only=True)
+        try:
+            row = conn.execute("SELECT id FROM Artists WHERE name = ?", (artist,)).fetchone()
+        finally:
+            conn.close()
+        artists = self._merge('artists')
+        if row is None or artists.empty:
+            return pd.DataFrame(columns=['chart_date', 'best_rank', 'entries', 'mean_popularity'])
+        rows = artists[artists['artist_id'] == row[0]]
+        return rows.drop(columns='artist_id').reset_index(drop=True)
+
+    def rank_deltas(self, chart_date=None):
+        """
+        Args:
+            chart_date (str): Chart week, YYYY-MM-DD (default: every week)
+
+        Returns:
+            pd.DataFrame: 'chart_date', 'song_id', 'rank', 'previous_rank',
+            'delta' (positive = climbed, missing = new entry) and 'popularity'
+        """
+        deltas = self._merge('deltas')
+        if chart_date is not None and not deltas.empty:
+            deltas = deltas[deltas['chart_date'] == chart_date].reset_index(drop=True)
+        return deltas
+
+    def save(self, path=CACHE_NAME):
+        """
+        Saves the partial results, so the next run only recomputes what changed.
+        """
+        with open(path, 'wb') as f:
+            pickle.dump({'db_name': self.db_name, 'partition_weeks': self.partition_weeks,
+                         'partitions': self.partitions}, f)
+
+    @classmethod
+    def load(cls, db_name=DB_NAME, path=CACHE_NAME, partition_weeks=26, max_workers=None):
+        """
+        Returns a RollingStats seeded from a saved cache, if one exists for the
+        same database and partition size, otherwise an empty one.
+        """
+        stats = cls(db_name, partition_weeks, max_workers)
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                saved = pickle.load(f)
+            if saved['db_name'] == db_name and saved['partition_weeks'] == partition_weeks:
+                stats.partitions = saved['partitions']
+        return stats
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rolling rank vs popularity statistics across chart weeks.")
+    parser.add_argument('--window', type=int, default=8, help="weeks per rolling window (default: 8)")
+    parser.add_argument('--artist', help="also print this artist's weekly trajectory")
+    parser.add_argument('--partition-weeks', type=int, default=26, help="weeks per worker partition (default: 26)")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: one per CPU)")
+    parser.add_argument('--cache', default=CACHE_NAME, help="partial results file (default: rolling_stats.pkl)")
+    parser.add_argument('--db', default=DB_NAME, help="database file (default: music_data.sqlite)")
+    args = parser.parse_args(argv)
+
+    stats = RollingStats.load(args.db, args.cache, args.partition_weeks, args.workers)
+    recomputed = stats.update()
+    stats.save(args.cache)
+    print(f"✅ Recomputed {len(recomputed)} of {len(stats.partitions)} partitions")
+
+    print(stats.rolling_correlation(args.window).tail(10).to_string(index=False))
+    if args.artist:
+        print(f"\n{args.artist}:")
+        print(stats.artist_trajectory(args.artist).to_string(index=False))
+
+if __name__ == "__main__":
+    main()
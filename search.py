@@ -0,0 +1,234 @@
+"""
+search.py
+
+This module looks up songs, albums, artists and Spotify top tracks by
+partial or misspelled names, using the FTS5 trigram indexes that
+database.py keeps in sync with those tables.
+
+It also provides the title and artist normalization used to match the
+same song across sources, e.g. Billboard's "Luther" and Spotify's
+"luther (with sza)":
+- normalize_title / normalize_artist: canonical forms for comparing names
+- resolution_key: the key a Billboard song is resolved to Spotify ids under
+- search: ranked prefix/substring/fuzzy search over the indexes
+- match_song: an existing song with the same normalized title and a shared
+  artist (the ingest dedupe fallback in MusicStore.insert_songs)
+
+Usage:
+    python search.py "lutehr"
+    python search.py "sabrina" --kinds artist
+"""
+import argparse
+import functools
+import re
+import unicodedata
+from difflib import SequenceMatcher
+
+from database import DB_NAME, SEARCH_INDEXES, connect
+
+# Search kind -> FTS5 index table
+KINDS = {
+    'song': 'SongSearch',
+    'album': 'AlbumSearch',
+    'artist': 'ArtistSearch',
+    'track': 'TrackSearch',
+}
+
+# "(feat. X)", "[with X]", "- Remastered 2011" and similar decorations
+_FEATURE = re.compile(r"[\(\[][^\)\]]*\b(feat|ft|featuring|with|prod|remaster(ed)?|remix|version|edit|live)\b[^\)\]]*[\)\]]")
+_SUFFIX = re.compile(r"\s+-\s+.*\b(remaster(ed)?|remix|version|edit|live|mono|stereo|from)\b.*$")
+_TRAILING_FEATURE = re.compile(r"\s+(feat\.?|ft\.?|featuring)\s+.*$")
+_NON_WORD = re.compile(r"[^\w\s]")
+
+def _fold(text):
+    """
+    Lower-cases text and strips accents (Beyoncé -> beyonce).
+    """
+    text = unicodedata.normalize('NFKD', text.lower())
+    return "".join(c for c in text if not unicodedata.combining(c))
+
+@functools.lru_cache(maxsize=65536)
+def normalize_title(title):
+    """
+    Reduces a song or track title to a canonical form for matching.
+
+    Args:
+        title (str): Title as printed by Billboard or returned by Spotify
+
+    Returns:
+        str: Lower-case title without accents, featured-artist or remaster
+        decorations, punctuation or repeated whitespace
+    """
+    text = _fold(title or "")
+    text = _FEATURE.sub(" ", text)
+    text = _SUFFIX.sub("", text)
+    text = _TRAILING_FEATURE.sub("", text)
+    text = text.replace("&", " and ")
+    text = _NON_WORD.sub("", text)
+    return " ".join(text.split())
+
+def normalize_artist(name):
+    """
+    Reduces an artist name to a canonical form for matching.
+
+    Args:
+        name (str): Artist name, e.g. "Tyler, The Creator"
+
+    Returns:
+        str: Lower-case name without accents, a leading "the", punctuation or
+        repeated whitespace
+    """
+    text = _fold(name or "").replace("&", " and ")
+    text = " ".join(_NON_WORD.sub("", text).split())
+    return text[4:] if text.startswith("the ") else text
+
+def resolution_key(title, artists):
+    """
+    Args:
+        title (str): Billboard song title
+        artists (list of str): Billboard artist names, lead artist first
+
+    Returns:
+        tuple: (normalized title, normalized lead artist), the Resolutions key
+    """
+    return normalize_title(title), normalize_artist(artists[0] if artists else "")
+
+def _trigram_query(text, match_all=False):
+    """
+    Builds an FTS5 query matching any of the trigrams of `text`, so rows
+    that share most of them rank first even when the text is misspelled.
+    With match_all, rows must contain every trigram.
+    """
+    grams = dict.fromkeys(text[i:i + 3] for i in range(len(text) - 2))
+    return (" AND " if match_all else " OR ").join('"' + gram.replace('"', '""') + '"' for gram in grams)
+
+def _candidates(conn, kind, text, limit, match_all=False):
+    """
+    Returns (id, name) rows of one index whose names share trigrams with `text`, best first.
+    """
+    index = KINDS[kind]
+    table, column = SEARCH_INDEXES[index]
+    if len(text) < 3:
+        # Too short for trigrams: plain prefix scan on the table
+        return conn.execute(
+            f"SELECT id, {column} FROM {table} WHERE {column} LIKE ? ESCAPE '\\' LIMIT ?",
+            (text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%', limit),
+        ).fetchall()
+    return conn.execute(f"""
+        SELECT rowid, {column} FROM {index}
+        WHERE {index} MATCH ?
+        ORDER BY rank
+        LIMIT ?
+    """, (_trigram_query(text, match_all), limit)).fetchall()
+
+def similarity(query, name):
+    """
+    Scores how well a stored name matches a query, from 0 to 1.
+
+    Exact normalized matches score 1, prefixes and substrings score at
+    least 0.9 and 0.8, and anything else gets its difflib similarity ratio.
+
+    Args:
+        query (str): Normalized query
+        name (str): Stored name (normalized here)
+
+    Returns:
+        float: Match score
+    """
+    target = normalize_title(name)
+    if target == query:
+        return 1.0
+    ratio = SequenceMatcher(None, query, target).ratio()
+    if target.startswith(query):
+        return max(0.9, ratio)
+    if query in target:
+        return max(0.8, ratio)
+    return ratio
+
+def search(conn, text, kinds=None, limit=10, min_score=0.5):
+    """
+    Finds songs, albums, artists or top tracks by partial or misspelled name.
+
+    Args:
+        conn (sqlite3.Connection): Connection to the music database
+        text (str): What to look for
+        kinds (iterable of str): Any of 'song', 'album', 'artist', 'track' (default: all)
+        limit (int): Maximum results (default: 10)
+        min_score (float): Drop matches scoring below this (default: 0.5)
+
+    Returns:
+        list of tuple: (score, kind, id, name), best match first
+    """
+    query = normalize_title(text)
+    if not query:
+        return []
+    results = []
+    for kind in kinds or KINDS:
+        # Over-fetch so re-scoring can promote candidates bm25 ranked lower
+        for row_id, name in _candidates(conn, kind, query, limit * 10):
+            score = similarity(query, name)
+            if score >= min_score:
+                results.append((score, kind, row_id, name))
+    results.sort(key=lambda r: (-r[0], r[1], r[3] or ""))
+    return results[:limit]
+
+def match_song(conn, title, artists):
+    """
+    Finds an already stored song that is the same as a new chart entry,
+    even if the title or artist credit is written differently.
+
+    Args:
+        conn (sqlite3.Connection): Connection to the music database
+        title (str): Billboard song title
+        artists (list of str): Billboard artist names
+
+    Returns:
+        int: Songs.id of the match, or None
+    """
+    query = normalize_title(title)
+    wanted = {normalize_artist(a) for a in artists}
+    if not query:
+        return None
+    # A name that normalizes to the title has all of its trigrams unless an
+    # accent or apostrophe sits inside a word; ranking every song that shares
+    # any one trigram would make this the slowest step of ingest
+    for row_id, name in _candidates(conn, 'song', query, 200, match_all=True):
+        if normalize_title(name) != query:
+            continue
+        credits = conn.execute("""
+            SELECT Artists.name FROM SongArtists
+            JOIN Artists ON Artists.id = SongArtists.artist_id
+            WHERE SongArtists.song_id = ?
+        """, (row_id,)).fetchall()
+        # Songs not yet linked to artists fall back to their Billboard credit string
+        if not credits:
+            credits = conn.execute("SELECT artists FROM Songs WHERE id = ?", (row_id,)).fetchall()
+            names = {normalize_artist(a) for a in (credits[0][0] or "").split(", ")} if credits else set()
+        else:
+            names = {normalize_artist(row[0]) for row in credits}
+        names.discard("")
+        # Legacy songs stored without any credit match on title alone, as in MusicStore.insert_songs
+        if not wanted or not names or wanted & names:
+            return row_id
+    return None
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Search songs, albums, artists and top tracks by name.")
+    parser.add_argument('text', help="name or part of a name, misspellings allowed")
+    parser.add_argument('--kinds', nargs='+', choices=list(KINDS), help="what to search (default: everything)")
+    parser.add_argument('--limit', type=int, default=10, help="maximum results (default: 10)")
+    parser.add_argument('--db', default=DB_NAME, help="database file (default: music_data.sqlite)")
+    args = parser.parse_args(argv)
+
+    conn = connect(args.db, read_only=True)
+    try:
+        results = search(conn, args.text, args.kinds, args.limit)
+    finally:
+        conn.close()
+    if not results:
+        print(f"⚠️  Nothing matches {args.text!r}")
+    for score, kind, row_id, name in results:
+        print(f"{score:5.2f}  {kind:<6}  {row_id:>5}  {name}")
+
+if __name__ == "__main__":
+    main()
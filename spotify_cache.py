@@ -0,0 +1,180 @@
+"""
+spotify_cache.py
+
+This module keeps a persistent on-disk cache of Spotify API responses so
+repeated and backfill runs can skip the network for songs and artists that
+were already resolved.
+
+Key Features:
+- SQLite-backed store keyed by endpoint and normalized query or artist id
+- Per-endpoint time-to-live (TTL)
+- Least-recently-used eviction once the cache grows past a size bound
+- Hit and miss counters per endpoint, also recorded as metrics events
+
+Cache file: spotify_cache.sqlite
+"""
+import json
+import sqlite3
+import threading
+import time
+
+import metrics
+
+CACHE_NAME = 'spotify_cache.sqlite'
+
+# Seconds a response stays fresh, per endpoint. Search hits and top tracks
+# drift slowly, so a day is plenty; None means "never expires".
+DEFAULT_TTLS = {
+    'search': 24 * 60 * 60,
+    'artist_top_tracks': 24 * 60 * 60,
+}
+
+def normalize_query(query):
+    """
+    Normalizes a free-text search query so trivial variations share a cache entry.
+
+    Args:
+        query (str): Search query, e.g. "Luther  Kendrick Lamar"
+
+    Returns:
+        str: Lower-cased query with whitespace collapsed
+    """
+    return " ".join(query.lower().split())
+
+class ResponseCache:
+    """
+    Persistent, size-bounded LRU cache for Spotify API responses.
+
+    Safe to share between the threads of a concurrent enrichment run. The
+    entry count is read once on open and then tracked by this instance, so
+    another process writing the same file only shifts when eviction starts.
+    """
+
+    def __init__(self, path=CACHE_NAME, ttls=None, max_entries=50000):
+        self.path = path
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self.max_entries = max_entries
+        self.hits = {}
+        self.misses = {}
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS Responses (
+                endpoint TEXT,
+                key TEXT,
+                value TEXT,
+                created_at REAL,
+                last_used REAL,
+                PRIMARY KEY (endpoint, key)
+            )
+        ''')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS idx_responses_last_used ON Responses (last_used)')
+        self.conn.commit()
+        self.size = self.conn.execute('SELECT COUNT(*) FROM Responses').fetchone()[0]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def get(self, endpoint, key):
+        """
+        Looks up a cached response.
+
+        Args:
+            endpoint (str): API endpoint name, e.g. 'search'
+            key (str): Normalized query or artist id
+
+        Returns:
+            The cached response, or None on a miss or an expired entry
+        """
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute(
+                'SELECT value, created_at FROM Responses WHERE endpoint = ? AND key = ?',
+                (endpoint, key)).fetchone()
+            ttl = self.ttls.get(endpoint)
+            if row is None or (ttl is not None and now - row[1] > ttl):
+                self.misses[endpoint] = self.misses.get(endpoint, 0) + 1
+                metrics.increment(f'spotify_cache.{endpoint}.miss')
+                return None
+            self.conn.execute(
+                'UPDATE Responses SET last_used = ? WHERE endpoint = ? AND key = ?',
+                (now, endpoint, key))
+            self.conn.commit()
+            self.hits[endpoint] = self.hits.get(endpoint, 0) + 1
+            metrics.increment(f'spotify_cache.{endpoint}.hit')
+            return json.loads(row[0])
+
+    def set(self, endpoint, key, value):
+        """
+        Stores a response. Once the cache is over its size bound, the least
+        recently used tenth is evicted in one DELETE, so a full cache does not
+        delete on every insert.
+
+        Args:
+            endpoint (str): API endpoint name, e.g. 'search'
+            key (str): Normalized query or artist id
+            value: JSON-serializable response
+        """
+        now = time.time()
+        with self.lock:
+            replaced = self.conn.execute(
+                'SELECT 1 FROM Responses WHERE endpoint = ? AND key = ?', (endpoint, key)).fetchone()
+            self.conn.execute(
+                'INSERT OR REPLACE INTO Responses VALUES (?, ?, ?, ?, ?)',
+                (endpoint, key, json.dumps(value), now, now))
+            if replaced is None:
+                self.size += 1
+            if self.size > self.max_entries:
+                cur = self.conn.execute('''
+                    DELETE FROM Responses WHERE rowid IN (
+                        SELECT rowid FROM Responses ORDER BY last_used LIMIT ?
+                    )
+                ''', (self.size - self.max_entries + self.max_entries // 10,))
+                self.size -= cur.rowcount
+            self.conn.commit()
+
+    def purge_expired(self):
+        """
+        Deletes every expired entry.
+
+        Returns:
+            int: Number of entries removed
+        """
+        now = time.time()
+        removed = 0
+        with self.lock:
+            for endpoint, ttl in self.ttls.items():
+                if ttl is not None:
+                    cur = self.conn.execute(
+                        'DELETE FROM Responses WHERE endpoint = ? AND created_at < ?',
+                        (endpoint, now - ttl))
+                    removed += cur.rowcount
+            self.size -= removed
+            self.conn.commit()
+        return removed
+
+    def stats(self):
+        """
+        Returns:
+            dict: Maps endpoint to its {'hits', 'misses'} counters
+        """
+        endpoints = set(self.hits) | set(self.misses)
+        return {e: {'hits': self.hits.get(e, 0), 'misses': self.misses.get(e, 0)} for e in endpoints}
+
+    def summary(self):
+        """
+        Returns:
+            str: Hits and misses per endpoint, e.g. "search 12 hits / 3 misses"
+        """
+        parts = [f"{endpoint} {n['hits']} hits / {n['misses']} misses" for endpoint, n in sorted(self.stats().items())]
+        return ", ".join(parts) or "no lookups"
+
+    def close(self):
+        """
+        Closes the cache file.
+        """
+        self.conn.close()
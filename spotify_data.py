@@ -9,10 +9,22 @@ Key Functions:
 - Authenticate with Spotify using Client Credentials Flow
 - Fetch metadata for Billboard songs (album info, popularity)
 - Fetch top 5 tracks for each unique artist
+- Optionally run those lookups concurrently behind a token-bucket rate limiter
+  that backs off when Spotify answers 429 Too Many Requests
+- Optionally serve repeated lookups from a persistent ResponseCache
+- Skip artists whose top tracks are already stored and refresh cached tracks
+  through the batched multi-id /tracks endpoint
+- Fetch songs already resolved to a Spotify track (database Resolutions
+  table) by id, 50 per request, so only new chart entrants are searched
 """
 
 import spotipy
 from spotipy.oauth2 import SpotifyClientCredentials
+from concurrent.futures import ThreadPoolExecutor
+from spotify_cache import normalize_query
+from search import resolution_key
+import metrics
+import threading
 import time
 
 # Load Spotify credentials
@@ -34,58 +46,276 @@ def load_spotify_credentials(filepath='spotify_credentials.txt'):
                 credentials[key.strip()] = value.strip()
     return credentials
 
-def get_spotify_client():
+def get_spotify_client(api_prefix=None, manage_retries=False, auth_manager=None):
     """
      Authenticates with the Spotify API and returns a Spotipy client.
 
     Uses Client Credentials Flow.
 
+    Args:
+        api_prefix (str): Base URL for API calls, e.g. a local stub server
+            (default: Spotify's own API)
+        manage_retries (bool): Turn off Spotipy's built-in retries so 429
+            responses reach our RateLimiter with their Retry-After header
+        auth_manager: Authentication to use instead of the credentials in
+            spotify_credentials.txt, e.g. http_archive.ReplayAuth
+
     Returns:
         spotipy.Spotify: Authenticated Spotify API client
     """
-    creds = load_spotify_credentials()
-    return spotipy.Spotify(auth_manager=SpotifyClientCredentials(
-        client_id=creds.get('client_id'),
-        client_secret=creds.get('client_secret')
-    ))
+    if auth_manager is None:
+        creds = load_spotify_credentials()
+        auth_manager = SpotifyClientCredentials(
+            client_id=creds.get('client_id'),
+            client_secret=creds.get('client_secret')
+        )
+    options = {}
+    if manage_retries:
+        # 429 is left out of the forcelist so it is raised, headers included
+        options = {'retries': 0, 'status_retries': 0, 'status_forcelist': (500, 502, 503, 504)}
+    sp = spotipy.Spotify(auth_manager=auth_manager, **options)
+    if api_prefix:
+        sp.prefix = api_prefix
+    return sp
+
+class RateLimiter:
+    """
+    Thread-safe token bucket shared by every worker of a concurrent run.
+
+    Tokens refill at `rate` per second up to `burst`. When Spotify answers
+    429, `throttle` blocks all workers for the Retry-After period and halves
+    the rate; every successful call then nudges the rate back up towards its
+    original value.
+    """
+
+    def __init__(self, rate=10.0, burst=None, min_rate=0.5):
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = min_rate
+        self.capacity = burst or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Blocks until a request may be sent.
+        """
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    wait = self.blocked_until - now
+                else:
+                    self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                    self.updated = now
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    wait = (1 - self.tokens) / self.rate
+            with metrics.span('spotify.rate_limit_wait'):
+                time.sleep(wait)
+
+    def throttle(self, retry_after):
+        """
+        Pauses every worker for `retry_after` seconds and halves the rate.
+
+        Args:
+            retry_after (float): Seconds to wait, from the Retry-After header
+        """
+        with self.lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+            self.updated = self.blocked_until
+            self.tokens = 0
+            self.rate = max(self.min_rate, self.rate / 2)
+
+    def recover(self):
+        """
+        Raises the rate a step back towards its configured maximum.
+        """
+        with self.lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 10)
+
+def call_with_limiter(limiter, func, *args, max_retries=5, **kwargs):
+    """
+    Calls a Spotipy method once the limiter allows it, retrying on 429.
 
-def fetch_spotify_data(billboard_data, limit=25):
+    Args:
+        limiter (RateLimiter): Shared rate limiter
+        func (callable): Spotipy client method, e.g. sp.search
+        max_retries (int): How many 429 responses to absorb before giving up
+
+    Returns:
+        The Spotipy method's result
+    """
+    for attempt in range(max_retries + 1):
+        limiter.acquire()
+        try:
+            result = func(*args, **kwargs)
+        except spotipy.SpotifyException as e:
+            if e.http_status != 429 or attempt == max_retries:
+                raise
+            metrics.increment('spotify.throttled')
+            headers = e.headers or {}
+            limiter.throttle(float(headers.get('Retry-After', 1)))
+            continue
+        limiter.recover()
+        return result
+
+# Spotify's multi-id endpoints (/tracks, /artists) accept at most 50 ids
+MAX_IDS_PER_REQUEST = 50
+
+def fetch_tracks_batched(sp, track_ids, limiter=None):
+    """
+    Looks up many tracks with as few requests as possible.
+
+    Args:
+        sp (spotipy.Spotify): Spotify client
+        track_ids (list of str): Spotify track ids
+        limiter (RateLimiter): Optional rate limiter for the calls
+
+    Returns:
+        dict: Maps track id to its full Spotify track object
+    """
+    tracks = {}
+    track_ids = list(dict.fromkeys(track_ids))
+    for start in range(0, len(track_ids), MAX_IDS_PER_REQUEST):
+        chunk = track_ids[start:start + MAX_IDS_PER_REQUEST]
+        if limiter is not None:
+            result = call_with_limiter(limiter, sp.tracks, chunk)
+        else:
+            result = sp.tracks(chunk)
+        for track in result['tracks']:
+            if track:
+                tracks[track['id']] = track
+    return tracks
+
+@metrics.timed('spotify.refresh_popularity')
+def refresh_popularity(sp, song_db, cached_track_ids, limiter=None):
+    """
+    Updates the popularity of songs whose search result came from the cache.
+
+    A cached search still identifies the right track, but popularity changes
+    daily. Re-reading those tracks 50 at a time costs two requests for a
+    full Hot 100 instead of one search per song.
+
+    Args:
+        sp (spotipy.Spotify): Spotify client
+        song_db (dict): Maps rank to song metadata, updated in place
+        cached_track_ids (dict): Maps rank to the Spotify track id of each cached hit
+        limiter (RateLimiter): Optional rate limiter for the calls
+    """
+    if not cached_track_ids:
+        return
+    tracks = fetch_tracks_batched(sp, list(cached_track_ids.values()), limiter)
+    for ranking, track_id in cached_track_ids.items():
+        if track_id in tracks:
+            song_db[ranking]['popularity'] = tracks[track_id]['popularity']
+
+@metrics.timed('spotify.fetch_resolved')
+def fetch_resolved_tracks(sp, songs, resolved, limiter=None):
+    """
+    Looks up songs whose Spotify track is already known by id instead of searching.
+
+    Args:
+        sp (spotipy.Spotify): Spotify client
+        songs (list of tuple): (Billboard song name, info dict) pairs
+        resolved (dict): Maps search.resolution_key to a Spotify track id
+        limiter (RateLimiter): Optional rate limiter for the calls
+
+    Returns:
+        dict: Maps rank to the full Spotify track object; songs whose track
+        no longer exists are left out, so they get searched again
+    """
+    if not resolved:
+        return {}
+    wanted = {}
+    for song_name, info in songs:
+        track_id = resolved.get(resolution_key(song_name, info['artists']))
+        if track_id:
+            wanted[info['ranking']] = track_id
+    if not wanted:
+        return {}
+    tracks = fetch_tracks_batched(sp, list(wanted.values()), limiter)
+    return {ranking: tracks[track_id] for ranking, track_id in wanted.items() if track_id in tracks}
+
+def cached_call(cache, endpoint, key, fetch):
+    """
+    Returns a response from the cache, calling `fetch()` only on a miss.
+
+    Args:
+        cache (ResponseCache): Response cache, or None to always fetch
+        endpoint (str): Cache endpoint name, e.g. 'search'
+        key (str): Normalized query or artist id
+        fetch (callable): Makes the actual API call
+
+    Returns:
+        tuple: (response, True if it came from the network)
+    """
+    if cache is not None:
+        value = cache.get(endpoint, key)
+        if value is not None:
+            return value, False
+    with metrics.span('spotify.' + endpoint):
+        value = fetch()
+    if cache is not None:
+        cache.set(endpoint, key, value)
+    return value, True
+
+@metrics.timed('spotify.fetch')
+def fetch_spotify_data(billboard_data, limit=25, max_workers=None, sp=None, limiter=None, cache=None,
+                       known_artists=None, resolved=None):
     """
     Queries Spotify for song metadata and artist top tracks.
 
     Args:
         billboard_data (dict): Dictionary of Billboard song names and info (ranking, artists)
         limit (int): Max number of songs to process (default: 25)
+        max_workers (int): If set, run lookups concurrently with this many threads
+            instead of one at a time with a fixed sleep
+        sp (spotipy.Spotify): Client to use (default: a new authenticated client)
+        limiter (RateLimiter): Shared limiter for the concurrent mode
+            (default: 10 requests per second)
+        cache (ResponseCache): Persistent response cache (default: no caching)
+        known_artists (set of str): Artists whose top tracks are already stored;
+            they are left out of artist_db and never queried
+        resolved (dict): Maps search.resolution_key to an already known Spotify
+            track id; those songs are fetched by id instead of searched
 
     Returns:
         tuple:
             song_db (dict): Maps rank to Spotify metadata for each song
             artist_db (dict): Maps artist name to a list of their top 5 tracks
     """
-    sp = get_spotify_client()
+    if max_workers:
+        return fetch_spotify_data_concurrent(billboard_data, limit, max_workers, sp, limiter, cache,
+                                             known_artists, resolved)
+
+    sp = sp or get_spotify_client()
     song_db = {}
     artist_db = {}
-    seen_artists = set()
-
-    count = 0
-    for song_name, info in billboard_data.items():
-        if count >= limit:
-            break
+    seen_artists = set(known_artists or ())
+    cached_track_ids = {}
+    songs = list(billboard_data.items())[:limit]
+    known_tracks = fetch_resolved_tracks(sp, songs, resolved)
 
+    for song_name, info in songs:
         ranking = info['ranking']
         artists = info['artists']
-        query = f"{song_name} {artists[0]}"
-        result = sp.search(q=query, type='track', limit=1)
-
-        if result['tracks']['items']:
-            track = result['tracks']['items'][0]
-            song_db[ranking] = {
-                'song_name': song_name,
-                'artists': [artist['name'] for artist in track['artists']],
-                'album': track['album']['name'],
-                'album_release_date': track['album']['release_date'],
-                'popularity': track['popularity']
-            }
+        used_network = False
+        track = known_tracks.get(ranking)
+        if track is None:
+            query = f"{song_name} {artists[0]}"
+            result, used_network = cached_call(cache, 'search', normalize_query(query),
+                                               lambda: sp.search(q=query, type='track', limit=1))
+            if result['tracks']['items']:
+                track = result['tracks']['items'][0]
+                if not used_network:
+                    cached_track_ids[ranking] = track['id']
+
+        if track is not None:
+            song_db[ranking] = _song_entry(song_name, track)
 
             for artist in track['artists']:
                 artist_name = artist['name']
@@ -93,10 +323,96 @@ def fetch_spotify_data(billboard_data, limit=25):
 
                 if artist_name not in seen_artists:
                     seen_artists.add(artist_name)
-                    top_tracks = sp.artist_top_tracks(artist_id)['tracks'][:5]
-                    artist_db[artist_name] = [t['name'] for t in top_tracks]
+                    result, fetched = cached_call(cache, 'artist_top_tracks', artist_id,
+                                                  lambda: sp.artist_top_tracks(artist_id))
+                    used_network = used_network or fetched
+                    artist_db[artist_name] = [t['name'] for t in result['tracks'][:5]]
+
+        # Only pace calls that actually went to Spotify
+        if used_network:
+            with metrics.span('spotify.pace_sleep'):
+                time.sleep(0.1)
+
+    refresh_popularity(sp, song_db, cached_track_ids)
+    return song_db, artist_db
+
+def _song_entry(song_name, track):
+    """
+    Builds the song_db entry for a Spotify track search hit.
+    """
+    return {
+        'song_name': song_name,
+        'artists': [artist['name'] for artist in track['artists']],
+        'album': track['album']['name'],
+        'album_release_date': track['album']['release_date'],
+        'popularity': track['popularity'],
+        'track_id': track['id'],
+        'artist_ids': [artist['id'] for artist in track['artists']],
+    }
+
+@metrics.timed('spotify.fetch_concurrent')
+def fetch_spotify_data_concurrent(billboard_data, limit=25, max_workers=8, sp=None, limiter=None, cache=None,
+                                  known_artists=None, resolved=None):
+    """
+    Concurrent version of fetch_spotify_data.
+
+    Searches for every song in parallel, then fetches top tracks for every
+    newly seen artist in parallel. All calls go through one RateLimiter, so
+    the request rate stays bounded and 429 responses slow every worker down.
+
+    Args:
+        billboard_data (dict): Dictionary of Billboard song names and info (ranking, artists)
+        limit (int): Max number of songs to process (default: 25)
+        max_workers (int): Number of concurrent requests (default: 8)
+        sp (spotipy.Spotify): Client to use (default: a new authenticated client)
+        limiter (RateLimiter): Shared rate limiter (default: 10 requests per second)
+        cache (ResponseCache): Persistent response cache (default: no caching)
+        known_artists (set of str): Artists whose top tracks are already stored
+        resolved (dict): Maps search.resolution_key to an already known Spotify track id
+
+    Returns:
+        tuple: The same (song_db, artist_db) as fetch_spotify_data, in the same order
+    """
+    sp = sp or get_spotify_client(manage_retries=True)
+    limiter = limiter or RateLimiter()
+    songs = list(billboard_data.items())[:limit]
+    known_tracks = fetch_resolved_tracks(sp, songs, resolved, limiter)
+    to_search = [item for item in songs if item[1]['ranking'] not in known_tracks]
+
+    def search(item):
+        song_name, info = item
+        query = f"{song_name} {info['artists'][0]}"
+        return cached_call(cache, 'search', normalize_query(query),
+                           lambda: call_with_limiter(limiter, sp.search, q=query, type='track', limit=1))
+
+    def top_tracks(artist_id):
+        return cached_call(cache, 'artist_top_tracks', artist_id,
+                           lambda: call_with_limiter(limiter, sp.artist_top_tracks, artist_id))[0]
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        song_db = {}
+        new_artists = {}
+        cached_track_ids = {}
+        known_artists = known_artists or set()
+        searched = dict(zip((info['ranking'] for _, info in to_search), pool.map(search, to_search)))
+        # Walk the songs in input order, so both dicts match the sequential order
+        for song_name, info in songs:
+            track = known_tracks.get(info['ranking'])
+            if track is None:
+                result, used_network = searched[info['ranking']]
+                if not result['tracks']['items']:
+                    continue
+                track = result['tracks']['items'][0]
+                if not used_network:
+                    cached_track_ids[info['ranking']] = track['id']
+            song_db[info['ranking']] = _song_entry(song_name, track)
+            for artist in track['artists']:
+                if artist['name'] not in known_artists:
+                    new_artists.setdefault(artist['name'], artist['id'])
 
-        count += 1
-        time.sleep(0.1)
+        artist_db = {}
+        for artist_name, result in zip(new_artists, pool.map(top_tracks, new_artists.values())):
+            artist_db[artist_name] = [t['name'] for t in result['tracks'][:5]]
 
+    refresh_popularity(sp, song_db, cached_track_ids, limiter)
     return song_db, artist_db
@@ -0,0 +1,216 @@
+"""
+streaming.py
+
+This module runs the project's analyses over the full chart history
+(every week in ChartEntries) with memory that stays flat as the database
+grows.
+
+How it works:
+- Rows are read in fixed-size chunks (pandas read_sql_query with chunksize)
+  with compact dtypes: int16 ranks, int8 popularity, int32 ids.
+- Each chunk is folded into running totals (counts, sums and the sums
+  needed for a Pearson correlation) with NumPy bincount, then discarded.
+- Artist names are only looked up at the end, for the artists that were
+  actually seen, and returned as a categorical column.
+"""
+import numpy as np
+import pandas as pd
+from database import connect
+
+DB_NAME = "music_data.sqlite"
+
+DEFAULT_CHUNKSIZE = 100_000
+
+# Billboard ranks run from 1 to 100
+MAX_RANK = 100
+
+def _grow(array, size):
+    """
+    Returns `array` padded with zeros to at least `size` elements.
+    """
+    if len(array) >= size:
+        return array
+    return np.concatenate([array, np.zeros(size - len(array), dtype=array.dtype)])
+
+class HistoryAggregator:
+    """
+    Running totals for the history-wide analyses, fed one chunk at a time.
+    """
+
+    def __init__(self):
+        # Sums for the rank/popularity Pearson correlation
+        self.n = 0
+        self.sum_rank = 0.0
+        self.sum_pop = 0.0
+        self.sum_rank_sq = 0.0
+        self.sum_pop_sq = 0.0
+        self.sum_rank_pop = 0.0
+        # Per-rank entry counts and popularity sums
+        self.rank_counts = np.zeros(MAX_RANK + 1, dtype=np.int64)
+        self.rank_pop_sums = np.zeros(MAX_RANK + 1, dtype=np.int64)
+        # Per (release year, month) entry counts; month 0 means year-only release date
+        self.release_counts = np.zeros(0, dtype=np.int64)
+        # Per-artist entry counts and popularity sums, indexed by artist id
+        self.artist_counts = np.zeros(0, dtype=np.int64)
+        self.artist_pop_sums = np.zeros(0, dtype=np.int64)
+
+    def add_entries(self, chunk):
+        """
+        Folds in a chunk of chart entries.
+
+        Args:
+            chunk (pd.DataFrame): 'rank', 'popularity', 'release_year', 'release_month' columns
+        """
+        rated = chunk[chunk['popularity'].notna()]
+        rank = rated['rank'].to_numpy(dtype=np.float64)
+        pop = rated['popularity'].to_numpy(dtype=np.float64)
+        self.n += len(rated)
+        self.sum_rank += rank.sum()
+        self.sum_pop += pop.sum()
+        self.sum_rank_sq += (rank * rank).sum()
+        self.sum_pop_sq += (pop * pop).sum()
+        self.sum_rank_pop += (rank * pop).sum()
+
+        ranks = rated['rank'].to_numpy(dtype=np.int64)
+        self.rank_counts += np.bincount(ranks, minlength=MAX_RANK + 1)[:MAX_RANK + 1]
+        self.rank_pop_sums += np.bincount(ranks, weights=pop, minlength=MAX_RANK + 1)[:MAX_RANK + 1].astype(np.int64)
+
+        dated = chunk[chunk['release_year'].notna()]
+        if len(dated):
+            keys = (dated['release_year'].to_numpy(dtype=np.int64) * 13
+                    + dated['release_month'].fillna(0).to_numpy(dtype=np.int64))
+            counts = np.bincount(keys)
+            self.release_counts = _grow(self.release_counts, len(counts))
+            self.release_counts[:len(counts)] += counts
+
+    def add_artist_links(self, chunk):
+        """
+        Folds in a chunk of (artist, chart entry) links.
+
+        Args:
+            chunk (pd.DataFrame): 'artist_id' and 'popularity' columns
+        """
+        ids = chunk['artist_id'].to_numpy(dtype=np.int64)
+        pop = chunk['popularity'].fillna(0).to_numpy(dtype=np.float64)
+        counts = np.bincount(ids)
+        sums = np.bincount(ids, weights=pop).astype(np.int64)
+        self.artist_counts = _grow(self.artist_counts, len(counts))
+        self.artist_pop_sums = _grow(self.artist_pop_sums, len(sums))
+        self.artist_counts[:len(counts)] += counts
+        self.artist_pop_sums[:len(sums)] += sums
+
+    def correlation(self):
+        """
+        Returns:
+            float: Pearson correlation of rank and popularity over every rated entry (NaN if undefined)
+        """
+        if self.n < 2:
+            return float('nan')
+        cov = self.sum_rank_pop - self.sum_rank * self.sum_pop / self.n
+        var_rank = self.sum_rank_sq - self.sum_rank ** 2 / self.n
+        var_pop = self.sum_pop_sq - self.sum_pop ** 2 / self.n
+        if var_rank <= 0 or var_pop <= 0:
+            return float('nan')
+        return cov / np.sqrt(var_rank * var_pop)
+
+    def rank_popularity(self):
+        """
+        Returns:
+            pd.DataFrame: 'rank', 'entries' and 'mean_popularity' for every rank seen
+        """
+        ranks = np.nonzero(self.rank_counts)[0]
+        return pd.DataFrame({
+            'rank': ranks.astype(np.int16),
+            'entries': self.rank_counts[ranks],
+            'mean_popularity': (self.rank_pop_sums[ranks] / self.rank_counts[ranks]).astype(np.float32),
+        })
+
+    def release_months(self):
+        """
+        Returns:
+            pd.DataFrame: 'year', 'month' (0 for year-only dates) and 'entries'
+        """
+        keys = np.nonzero(self.release_counts)[0]
+        return pd.DataFrame({
+            'year': (keys // 13).astype(np.int16),
+            'month': (keys % 13).astype(np.int8),
+            'entries': self.release_counts[keys],
+        })
+
+def _chunks(conn, query, params, chunksize, dtype):
+    """
+    Yields a query's result as DataFrames of at most `chunksize` rows.
+    """
+    return pd.read_sql_query(query, conn, params=params, chunksize=chunksize, dtype=dtype)
+
+def summarize_history(db_name=DB_NAME, start=None, end=None, chunksize=DEFAULT_CHUNKSIZE):
+    """
+    Computes the history-wide analyses in bounded memory.
+
+    Args:
+        db_name (str): Database file (default: music_data.sqlite)
+        start (str): First chart date to include, YYYY-MM-DD (default: the first stored week)
+        end (str): Last chart date to include, YYYY-MM-DD (default: the last stored week)
+        chunksize (int): Rows held in memory at once (default: 100,000)
+
+    Returns:
+        dict:
+            'entries' (int): Chart entries with a popularity
+            'rank_popularity_corr' (float): Pearson correlation of rank and popularity
+            'rank_popularity' (pd.DataFrame): Mean popularity per rank
+            'release_months' (pd.DataFrame): Chart entries per album release year and month
+            'artists' (pd.DataFrame): 'artist' (categorical), 'entry_count' (chart
+                entries, so a song counts once per week it charted) and
+                'total_popularity' per artist, most entries first
+    """
+    params = (start or '0000-00-00', end or '9999-99-99')
+    agg = HistoryAggregator()
+    conn = connect(db_name, read_only=True)
+    # Each page is read once, so the memory map and page cache database.connect
+    # sets up would only add their size to the peak memory
+    conn.execute('PRAGMA mmap_size = 0')
+    conn.execute('PRAGMA cache_size = -2048')
+    try:
+        for chunk in _chunks(conn, """
+            SELECT ChartEntries.rank, ChartEntries.popularity,
+                   CAST(substr(Albums.release_date, 1, 4) AS INTEGER) AS release_year,
+                   CAST(NULLIF(substr(Albums.release_date, 6, 2), '') AS INTEGER) AS release_month
+            FROM ChartEntries
+            JOIN Songs ON Songs.id = ChartEntries.song_id
+            LEFT JOIN Albums ON Albums.id = Songs.album_id
+            WHERE ChartEntries.chart_date BETWEEN ? AND ?
+        """, params, chunksize, {'rank': 'int16', 'popularity': 'Int8',
+                                 'release_year': 'Int16', 'release_month': 'Int8'}):
+            agg.add_entries(chunk)
+
+        for chunk in _chunks(conn, """
+            SELECT SongArtists.artist_id, ChartEntries.popularity
+            FROM ChartEntries
+            JOIN SongArtists ON SongArtists.song_id = ChartEntries.song_id
+            WHERE ChartEntries.chart_date BETWEEN ? AND ?
+        """, params, chunksize, {'artist_id': 'int32', 'popularity': 'Int8'}):
+            agg.add_artist_links(chunk)
+
+        # Names only for the artists actually seen, fetched in id order
+        ids = np.nonzero(agg.artist_counts)[0]
+        names = {}
+        for start_idx in range(0, len(ids), 500):
+            chunk_ids = [int(i) for i in ids[start_idx:start_idx + 500]]
+            marks = ", ".join("?" * len(chunk_ids))
+            names.update(conn.execute(f"SELECT id, name FROM Artists WHERE id IN ({marks})", chunk_ids))
+    finally:
+        conn.close()
+
+    artists = pd.DataFrame({
+        'artist': pd.Categorical([names.get(int(i)) for i in ids]),
+        'entry_count': agg.artist_counts[ids],
+        'total_popularity': agg.artist_pop_sums[ids],
+    }).sort_values('entry_count', ascending=False, kind='mergesort').reset_index(drop=True)
+
+    return {
+        'entries': agg.n,
+        'rank_popularity_corr': agg.correlation(),
+        'rank_popularity': agg.rank_popularity(),
+        'release_months': agg.release_months(),
+        'artists': artists,
+    }
@@ -0,0 +1,210 @@
+"""
+synthetic.py
+
+This module fills the music database schema with realistic, skewed
+synthetic data for scale tests and benchmarks.
+
+The real database only holds a few weeks of the Hot 100, far too little to
+show how inserts, analyses and charts behave with decades of history. The
+generator simulates weekly charts instead:
+- artists are drawn from a Zipf distribution, so a few artists chart
+  constantly and most chart once or twice, as on the real Hot 100
+- each song debuts with a random appeal that decays week by week; every
+  week a handful of new songs replace the weakest ones and the 100
+  survivors are ranked by current appeal, so songs climb, peak and drop
+  off over multi-week runs
+- a quarter of songs credit a featured artist; albums group each artist's
+  songs, with a tenth of release dates given as a year only
+- Spotify popularity follows rank with noise, and about 5% of songs are
+  "not found on Spotify" (no popularity, album or artist links)
+
+Every week is produced in the same shape as an enrichment batch
+(billboard_data, song_db, artist_db) and written through
+pipeline.load_batch, so the synthetic database goes through exactly the
+insert path, triggers and indexes of a real ingest.
+
+Usage:
+    python synthetic.py synthetic.sqlite --weeks 520
+    python synthetic.py big.sqlite --weeks 10000 --artists 30000   # one million chart entries
+"""
+import argparse
+import os
+from datetime import date, timedelta
+
+import numpy as np
+
+from database import create_music_db, MusicStore
+from pipeline import load_batch
+
+CHART_SIZE = 100
+
+# Date of the first Hot 100
+FIRST_CHART = '1958-08-09'
+
+# Zipf exponent of artist frequency: the top artist gets about 6% of all
+# chart entries, and most artists chart once or twice
+ZIPF_S = 0.8
+
+# Share of songs that credit a featured artist
+FEATURED_SHARE = 0.25
+
+# Words the synthetic titles are made of, so title lengths and trigrams vary
+WORDS = ('Midnight', 'Fire', 'Love', 'City', 'Dream', 'Heart', 'Summer', 'Rain', 'Gold', 'Baby',
+         'Dance', 'Light', 'Wild', 'Blue', 'Road', 'Night', 'Forever', 'Lonely', 'Money', 'Stars',
+         'Electric', 'River', 'Shadow', 'Sugar', 'Thunder', 'Echo', 'Velvet', 'Neon', 'Highway', 'Angel')
+
+def zipf_sampler(n, s, rng):
+    """
+    Returns a function drawing 0-based indexes from a Zipf distribution over n items.
+
+    Args:
+        n (int): Number of items
+        s (float): Zipf exponent; larger means more skewed
+        rng (np.random.Generator): Random source
+
+    Returns:
+        function: Takes a sample size and returns an int array of indexes
+    """
+    cumulative = np.cumsum(1.0 / np.arange(1, n + 1) ** s)
+    cumulative /= cumulative[-1]
+    return lambda size: np.minimum(np.searchsorted(cumulative, rng.random(size)), n - 1)
+
+def generate_weeks(weeks, artists=None, seed=0, zipf_s=ZIPF_S, start=FIRST_CHART):
+    """
+    Simulates consecutive weekly charts.
+
+    Args:
+        weeks (int): Number of chart weeks
+        artists (int): Number of distinct artists to draw from (default: 3 per week, at least 200)
+        seed (int): Random seed, so the same arguments always give the same data (default: 0)
+        zipf_s (float): Zipf exponent of artist frequency (default: 0.8)
+        start (str): Date of the first chart, YYYY-MM-DD (default: 1958-08-09)
+
+    Yields:
+        tuple: (chart_date, billboard_data, song_db, artist_db) per week, shaped like
+        the input of pipeline.load_batch
+    """
+    rng = np.random.default_rng(seed)
+    artists = artists or max(200, weeks * 3)
+    draw_artist = zipf_sampler(artists, zipf_s, rng)
+    first = date.fromisoformat(start)
+
+    # Per-song state; a song's index is also its number
+    titles = []
+    credits = []
+    albums = []
+    found = []
+
+    album_sizes = {}
+    album_dates = {}
+    seen_artists = set()
+    # Songs on the chart, with their appeal at debut, how many weeks it takes to fade and debut week
+    active = np.empty(0, dtype=np.int64)
+    appeal = np.empty(0)
+    lifetime = np.empty(0)
+    debut = np.empty(0)
+
+    for week in range(weeks):
+        chart_day = first + timedelta(days=7 * week)
+        chart_date = chart_day.isoformat()
+
+        # New entrants this week (the first week is a full chart of debuts)
+        count = CHART_SIZE if week == 0 else int(np.clip(rng.poisson(7), 1, 30))
+        leads = draw_artist(count)
+        guests = draw_artist(count)
+        featured = rng.random(count) < FEATURED_SHARE
+        words = rng.integers(0, len(WORDS), size=(count, 2))
+        years_only = rng.random(count) < 0.1
+        new_ids = np.arange(len(titles), len(titles) + count)
+        for i in range(count):
+            lead = f"Artist {leads[i] + 1}"
+            credit = [lead]
+            if featured[i] and guests[i] != leads[i]:
+                credit.append(f"Artist {guests[i] + 1}")
+            number = album_sizes.get(lead, 0)
+            album_sizes[lead] = number + 1
+            # Roughly ten songs per album
+            album = f"{lead} Album {number // 10 + 1}"
+            if album not in album_dates:
+                released = chart_day - timedelta(days=int(rng.integers(0, 60)))
+                album_dates[album] = str(released.year) if years_only[i] else released.isoformat()
+            titles.append(f"{WORDS[words[i, 0]]} {WORDS[words[i, 1]]} {new_ids[i] + 1}")
+            credits.append(credit)
+            albums.append(album)
+        found.extend(rng.random(count) >= 0.05)
+
+        # The weakest songs make room for the new ones, then the rest are ranked
+        active = np.concatenate([active, new_ids])
+        appeal = np.concatenate([appeal, rng.lognormal(0.0, 0.5, count) * 1.5])
+        lifetime = np.concatenate([lifetime, 4 + rng.exponential(8, count)])
+        debut = np.concatenate([debut, np.full(count, week)])
+        order = np.argsort(-appeal * np.exp(-(week - debut) / lifetime), kind='stable')[:CHART_SIZE]
+        active, appeal, lifetime, debut = active[order], appeal[order], lifetime[order], debut[order]
+
+        popularity = np.clip(np.round(95 - 0.45 * np.arange(1, CHART_SIZE + 1)
+                                      + rng.normal(0, 8, CHART_SIZE)), 0, 100).astype(int)
+        billboard_data = {}
+        song_db = {}
+        artist_db = {}
+        for position, song in enumerate(active.tolist()):
+            rank = position + 1
+            billboard_data[titles[song]] = {'ranking': rank, 'artists': credits[song]}
+            if not found[song]:
+                continue
+            song_db[rank] = {
+                'song_name': titles[song],
+                'album': albums[song],
+                'album_release_date': album_dates[albums[song]],
+                'popularity': int(popularity[position]),
+                'artists': credits[song],
+                'track_id': f"synthetic{song + 1}",
+                'artist_ids': [name.replace(" ", "").lower() for name in credits[song]],
+            }
+            for name in credits[song]:
+                if name not in seen_artists:
+                    seen_artists.add(name)
+                    artist_db[name] = [f"{name} Hit {k}" for k in range(1, 6)]
+        yield chart_date, billboard_data, song_db, artist_db
+
+def populate(db_name, weeks, artists=None, seed=0, zipf_s=ZIPF_S, commit_every=52):
+    """
+    Creates a database and fills it with synthetic weekly charts through the ingest write path.
+
+    Args:
+        db_name (str): Database file to create (overwritten)
+        weeks (int): Number of chart weeks (100 chart entries each)
+        artists (int): Number of distinct artists (default: see generate_weeks)
+        seed (int): Random seed (default: 0)
+        zipf_s (float): Zipf exponent of artist frequency (default: 0.8)
+        commit_every (int): Weeks per transaction (default: 52)
+
+    Returns:
+        int: Number of chart entries written
+    """
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(db_name + suffix):
+            os.remove(db_name + suffix)
+    create_music_db(db_name)
+    written = 0
+    with MusicStore(db_name) as store:
+        for week, (chart_date, billboard_data, song_db, artist_db) in enumerate(
+                generate_weeks(weeks, artists, seed, zipf_s)):
+            written += load_batch(store, chart_date, billboard_data, song_db, artist_db)[0]
+            if (week + 1) % commit_every == 0:
+                store.commit()
+    return written
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fill a music database with synthetic weekly charts.")
+    parser.add_argument('db', help="database file to create (overwritten)")
+    parser.add_argument('--weeks', type=int, default=520, help="chart weeks, 100 entries each (default: 520)")
+    parser.add_argument('--artists', type=int, help="distinct artists (default: 3 per week, at least 200)")
+    parser.add_argument('--seed', type=int, default=0, help="random seed (default: 0)")
+    parser.add_argument('--zipf', type=float, default=ZIPF_S, help="Zipf exponent of artist frequency (default: 0.8)")
+    args = parser.parse_args(argv)
+
+    written = populate(args.db, args.weeks, args.artists, args.seed, args.zipf)
+    print(f"✅ Wrote {args.weeks} weeks ({written} chart entries) to {args.db}")
+
+if __name__ == "__main__":
+    main()
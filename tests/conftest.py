@@ -0,0 +1,45 @@
+"""
+Shared fixtures: the project modules live at the repository root, and
+several tests talk to a throwaway local HTTP server instead of Billboard
+or Spotify.
+"""
+import os
+import sys
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+sys.path.insert(0, ROOT)
+
+@pytest.fixture
+def serve():
+    """
+    Starts a local server for a BaseHTTPRequestHandler class.
+
+    Returns:
+        function: Takes the handler class and returns the server's base URL,
+        e.g. "http://127.0.0.1:51234"; every server is shut down after the test
+    """
+    servers = []
+
+    def start(handler):
+        server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_address[1]}"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+@pytest.fixture
+def fixture_path():
+    """
+    Returns:
+        function: Maps a file name to its path in tests/fixtures
+    """
+    return lambda name: os.path.join(FIXTURES, name)
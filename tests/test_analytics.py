@@ -0,0 +1,30 @@
+"""
+The memoizing analytics engine.
+"""
+import pytest
+
+from analytics import AnalyticsEngine
+from database import create_music_db, MusicStore
+
+@pytest.fixture
+def engine(tmp_path):
+    db_name = str(tmp_path / 'analytics.sqlite')
+    create_music_db(db_name)
+    with MusicStore(db_name) as store:
+        store.insert_songs([('Luther', ['Kendrick Lamar & SZA'], 1, 90, None),
+                            ('Espresso', ['Sabrina Carpenter'], 2, 85, None)], '2024-01-06')
+        store.insert_song_artists([('Luther', ['Kendrick Lamar & SZA'], ['Kendrick Lamar', 'SZA']),
+                                   ('Espresso', ['Sabrina Carpenter'], ['Sabrina Carpenter'])])
+    engine = AnalyticsEngine(db_name)
+    yield engine
+    engine.close()
+
+@pytest.mark.parametrize('dataset', ['rank_vs_popularity', 'top_artists_by_song_count', 'artist_popularity_sum'])
+def test_callers_cannot_change_memoized_results(engine, dataset):
+    first = getattr(engine, dataset)()
+    expected = first.copy()
+
+    first.iloc[0, 1] = 0
+    first.drop(index=first.index[-1], inplace=True)
+
+    assert getattr(engine, dataset)().equals(expected)
@@ -0,0 +1,133 @@
+"""
+ArtistWeekStats is maintained by triggers; after every kind of edit it has
+to match a full rebuild (check_artist_stats).
+"""
+import pytest
+
+from database import check_artist_stats, connect, create_music_db, MusicStore
+
+# (title, billboard credit, rank, popularity) per week
+WEEKS = {
+    '2024-01-06': [('Alpha', ['Ann Featuring Bo'], 1, 80), ('Beta', ['Cy'], 2, 70), ('Gamma', ['Ann'], 3, None)],
+    '2024-01-13': [('Beta', ['Cy'], 1, 75), ('Alpha', ['Ann Featuring Bo'], 2, 78)],
+}
+# Spotify artists per title
+CREDITS = {'Alpha': ['Ann', 'Bo'], 'Beta': ['Cy'], 'Gamma': ['Ann']}
+
+@pytest.fixture
+def db_name(tmp_path):
+    db_name = str(tmp_path / 'stats.sqlite')
+    create_music_db(db_name)
+    with MusicStore(db_name) as store:
+        for chart_date, songs in WEEKS.items():
+            store.insert_songs(((title, credit, rank, popularity, None) for title, credit, rank, popularity in songs),
+                               chart_date)
+            store.insert_song_artists((title, credit, CREDITS[title]) for title, credit, _, _ in songs)
+        store.insert_artists(['Dee'])
+        store.commit()
+    return db_name
+
+def stats(db_name):
+    conn = connect(db_name, read_only=True)
+    try:
+        return {(chart_date, name): (count, popularity) for chart_date, name, count, popularity in conn.execute("""
+            SELECT chart_date, Artists.name, song_count, popularity_sum
+            FROM ArtistWeekStats JOIN Artists ON Artists.id = ArtistWeekStats.artist_id
+        """)}
+    finally:
+        conn.close()
+
+def run(db_name, sql, params=()):
+    conn = connect(db_name)
+    try:
+        conn.execute(sql, params)
+    finally:
+        conn.close()
+
+def song_id(title):
+    return f"(SELECT id FROM Songs WHERE name = '{title}')"
+
+def artist_id(name):
+    return f"(SELECT id FROM Artists WHERE name = '{name}')"
+
+def test_insert(db_name):
+    assert check_artist_stats(db_name) == []
+    assert stats(db_name) == {
+        ('2024-01-06', 'Ann'): (2, 80),
+        ('2024-01-06', 'Bo'): (1, 80),
+        ('2024-01-06', 'Cy'): (1, 70),
+        ('2024-01-13', 'Ann'): (1, 78),
+        ('2024-01-13', 'Bo'): (1, 78),
+        ('2024-01-13', 'Cy'): (1, 75),
+    }
+
+def test_insert_counts_links_not_trigger_writes(tmp_path):
+    db_name = str(tmp_path / 'count.sqlite')
+    create_music_db(db_name)
+    with MusicStore(db_name) as store:
+        store.insert_songs([('Alpha', ['Ann Featuring Bo'], 1, 80, None)], '2024-01-06')
+        assert store.insert_song_artists([('Alpha', ['Ann Featuring Bo'], ['Ann', 'Bo'])]) == 2
+        assert store.insert_song_artists([('Alpha', ['Ann Featuring Bo'], ['Ann', 'Bo'])]) == 0
+
+EDITS = {
+    'new entry': (f"INSERT INTO ChartEntries (chart_date, rank, song_id, popularity) VALUES ('2024-01-13', 3, {song_id('Gamma')}, 60)",
+                  {('2024-01-13', 'Ann'): (2, 138)}),
+    'popularity update': ("UPDATE ChartEntries SET popularity = 90 WHERE chart_date = '2024-01-06' AND rank = 1",
+                          {('2024-01-06', 'Ann'): (2, 90), ('2024-01-06', 'Bo'): (1, 90)}),
+    'popularity cleared': ("UPDATE ChartEntries SET popularity = NULL WHERE chart_date = '2024-01-13' AND rank = 1",
+                           {('2024-01-13', 'Cy'): (1, 0)}),
+    'entry moved to another song': (f"UPDATE ChartEntries SET song_id = {song_id('Gamma')} WHERE chart_date = '2024-01-06' AND rank = 2",
+                                    {('2024-01-06', 'Ann'): (3, 150), ('2024-01-06', 'Cy'): None}),
+    'entry deleted': ("DELETE FROM ChartEntries WHERE chart_date = '2024-01-13' AND rank = 2",
+                      {('2024-01-13', 'Ann'): None, ('2024-01-13', 'Bo'): None}),
+    'week deleted': ("DELETE FROM ChartEntries WHERE chart_date = '2024-01-06'",
+                     {('2024-01-06', 'Ann'): None, ('2024-01-06', 'Bo'): None, ('2024-01-06', 'Cy'): None}),
+    'link added': (f"INSERT INTO SongArtists (song_id, artist_id, position) VALUES ({song_id('Beta')}, {artist_id('Dee')}, 2)",
+                   {('2024-01-06', 'Dee'): (1, 70), ('2024-01-13', 'Dee'): (1, 75)}),
+    'link removed': (f"DELETE FROM SongArtists WHERE song_id = {song_id('Alpha')} AND artist_id = {artist_id('Bo')}",
+                     {('2024-01-06', 'Bo'): None, ('2024-01-13', 'Bo'): None}),
+    'shared link removed': (f"DELETE FROM SongArtists WHERE song_id = {song_id('Alpha')} AND artist_id = {artist_id('Ann')}",
+                            {('2024-01-06', 'Ann'): (1, 0), ('2024-01-13', 'Ann'): None}),
+    'song relinked': (f"UPDATE SongArtists SET artist_id = {artist_id('Dee')} WHERE song_id = {song_id('Alpha')} AND artist_id = {artist_id('Bo')}",
+                      {('2024-01-06', 'Bo'): None, ('2024-01-13', 'Bo'): None,
+                       ('2024-01-06', 'Dee'): (1, 80), ('2024-01-13', 'Dee'): (1, 78)}),
+    'link moved to another song': (f"UPDATE SongArtists SET song_id = {song_id('Beta')} WHERE song_id = {song_id('Gamma')}",
+                                   {('2024-01-06', 'Ann'): (2, 150), ('2024-01-13', 'Ann'): (2, 153)}),
+}
+
+@pytest.mark.parametrize('sql, changed', EDITS.values(), ids=list(EDITS))
+def test_edit_keeps_stats_consistent(db_name, sql, changed):
+    expected = stats(db_name)
+    for key, value in changed.items():
+        if value is None:
+            del expected[key]
+        else:
+            expected[key] = value
+
+    run(db_name, sql)
+
+    assert check_artist_stats(db_name) == []
+    assert stats(db_name) == expected
+
+def test_relink_by_delete_and_insert(db_name):
+    conn = connect(db_name)
+    try:
+        conn.execute('BEGIN')
+        conn.execute(f"DELETE FROM SongArtists WHERE song_id = {song_id('Beta')}")
+        conn.execute(f"INSERT INTO SongArtists (song_id, artist_id, position) VALUES ({song_id('Beta')}, {artist_id('Dee')}, 1)")
+        conn.execute('COMMIT')
+    finally:
+        conn.close()
+
+    assert check_artist_stats(db_name) == []
+    result = stats(db_name)
+    assert ('2024-01-06', 'Cy') not in result
+    assert result[('2024-01-13', 'Dee')] == (1, 75)
+
+def test_rebuild_repairs_drift(db_name):
+    run(db_name, "UPDATE ArtistWeekStats SET song_count = 9")
+    assert len(check_artist_stats(db_name)) == 6
+
+    check_artist_stats(db_name, rebuild=True)
+
+    assert check_artist_stats(db_name) == []
@@ -0,0 +1,83 @@
+"""
+Backfill of saved Hot 100 pages served by a local stand-in for billboard.com.
+"""
+import os
+import sqlite3
+from http.server import BaseHTTPRequestHandler
+
+import pytest
+
+from backfill import backfill, chart_dates
+
+@pytest.fixture
+def billboard_site(serve, fixture_path):
+    """
+    Serves tests/fixtures/hot-100-<date>.html at /charts/hot-100/<date>/ and
+    404 for every other week, like Billboard for a date it has no chart for.
+    """
+    class Handler(BaseHTTPRequestHandler):
+        requested = []
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            self.requested.append(self.path)
+            chart_date = self.path.strip('/').split('/')[-1]
+            path = fixture_path(f"hot-100-{chart_date}.html")
+            if not self.path.startswith('/charts/hot-100/') or not os.path.exists(path):
+                self.send_response(404)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            with open(path, 'rb') as f:
+                body = f.read()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    return serve(Handler), Handler
+
+def test_chart_dates_moves_to_chart_saturday():
+    assert chart_dates('2024-01-03', '2024-01-20') == ['2024-01-06', '2024-01-13', '2024-01-20']
+
+def test_backfill_from_saved_pages(tmp_path, billboard_site):
+    base_url, handler = billboard_site
+    db_name = str(tmp_path / 'backfill.sqlite')
+
+    weeks, rows, failures = backfill('2024-01-06', '2024-01-20', db_name, max_workers=2, processes=1,
+                                     base_url=base_url)
+
+    assert (weeks, rows) == (2, 10)
+    # The week with no saved page is reported, not inserted
+    assert [(chart_date, error.response.status_code) for chart_date, error in failures] == [('2024-01-20', 404)]
+
+    conn = sqlite3.connect(db_name)
+    try:
+        per_week = conn.execute(
+            "SELECT chart_date, count(*), min(rank), max(rank) FROM ChartEntries GROUP BY chart_date ORDER BY chart_date"
+        ).fetchall()
+        assert per_week == [('2024-01-06', 5, 1, 5), ('2024-01-13', 5, 1, 5)]
+        # Songs charting both weeks are stored once
+        assert conn.execute("SELECT count(*) FROM Songs").fetchone()[0] == 7
+        assert conn.execute("""
+            SELECT ChartEntries.rank FROM ChartEntries JOIN Songs ON Songs.id = ChartEntries.song_id
+            WHERE Songs.name = 'Snooze' ORDER BY chart_date
+        """).fetchall() == [(4,), (3,)]
+        assert conn.execute("SELECT count(*) FROM ChartEntries WHERE popularity IS NOT NULL").fetchone()[0] == 0
+    finally:
+        conn.close()
+
+def test_backfill_skips_stored_weeks(tmp_path, billboard_site):
+    base_url, handler = billboard_site
+    db_name = str(tmp_path / 'backfill.sqlite')
+    backfill('2024-01-06', '2024-01-13', db_name, max_workers=2, processes=1, base_url=base_url)
+    handler.requested.clear()
+
+    weeks, rows, failures = backfill('2024-01-06', '2024-01-13', db_name, max_workers=2, processes=1,
+                                     base_url=base_url)
+
+    assert (weeks, rows, failures) == (0, 0, [])
+    assert handler.requested == []
@@ -0,0 +1,31 @@
+"""
+Chart page parsing with every parser backend.
+"""
+import pytest
+
+from billboard import PARSERS, parse_chart
+from bench_billboard import sample_chart_html
+
+@pytest.mark.parametrize('backend', list(PARSERS))
+@pytest.mark.parametrize('chart_date', ['2024-01-06', '2024-01-13'])
+def test_parse_chart_week(fixture_path, backend, chart_date):
+    with open(fixture_path(f"hot-100-{chart_date}.html"), 'rb') as f:
+        html = f.read()
+
+    songs, week = parse_chart(html, backend, with_week=True)
+
+    assert week == chart_date
+    assert songs == parse_chart(html, backend)
+    assert sorted(info['ranking'] for info in songs.values()) == [1, 2, 3, 4, 5]
+
+@pytest.mark.parametrize('backend', list(PARSERS))
+def test_parse_chart_week_missing(backend):
+    # Taglines that are not a "Week of" date
+    songs, week = parse_chart(sample_chart_html(rows=3, filler_blocks=5), backend, with_week=True)
+    assert week is None
+    assert len(songs) == 3
+
+@pytest.mark.parametrize('backend', list(PARSERS))
+def test_parse_chart_week_spelled_out(backend):
+    html = b'<html><body><p class="c-tagline a-font-primary-s">Week of January 6, 2024</p></body></html>'
+    assert parse_chart(html, backend, with_week=True) == ({}, '2024-01-06')
@@ -0,0 +1,158 @@
+"""
+Delta ingest: diffing a fresh chart against the previous stored week, and
+run_delta end to end with a fake Spotify client.
+"""
+import pytest
+
+from database import create_music_db, MusicStore
+from delta import diff_chart, run_delta
+from search import resolution_key
+
+# (song_id, name, artists, rank, popularity), as returned by MusicStore.previous_chart
+PREVIOUS = [
+    (1, 'Lovin On Me', 'Jack Harlow', 1, 95),
+    (2, 'Die For You', 'The Weeknd, Ariana Grande', 2, 90),
+    (3, 'Old Town Road', '', 3, None),
+    (4, 'Snooze', 'SZA', 4, 88),
+]
+
+DIFF_CASES = {
+    'same credit, new rank': (
+        {'Lovin On Me': {'ranking': 3, 'artists': ['Jack Harlow']}},
+        {'new': [], 'moved': [('Lovin On Me', 1, 1, 95)]},
+    ),
+    'credit respelled': (
+        {'Die For You': {'ranking': 1, 'artists': ['Weeknd', 'Ariana Grande']}},
+        {'new': [], 'moved': [('Die For You', 2, 2, 90)]},
+    ),
+    'accents and featuring in the title': (
+        {'Die For You (feat. Ariana Grande)': {'ranking': 1, 'artists': ['The Wéeknd']}},
+        {'new': [], 'moved': [('Die For You (feat. Ariana Grande)', 2, 2, 90)]},
+    ),
+    'title-only legacy row': (
+        {'Old Town Road': {'ranking': 5, 'artists': ['Lil Nas X', 'Billy Ray Cyrus']}},
+        {'new': [], 'moved': [('Old Town Road', 3, 3, None)]},
+    ),
+    'same title, different artist': (
+        {'Snooze': {'ranking': 2, 'artists': ['Someone Else']}},
+        {'new': ['Snooze'], 'moved': []},
+    ),
+    'new song': (
+        {'Need A Favor': {'ranking': 1, 'artists': ['Jelly Roll']}},
+        {'new': ['Need A Favor'], 'moved': []},
+    ),
+    'one previous row matches once': (
+        {'Lovin On Me': {'ranking': 1, 'artists': ['Jack Harlow']},
+         'Lovin On Me (Remix)': {'ranking': 2, 'artists': ['Jack Harlow']}},
+        {'new': ['Lovin On Me (Remix)'], 'moved': [('Lovin On Me', 1, 1, 95)]},
+    ),
+}
+
+@pytest.mark.parametrize('billboard_data, expected', DIFF_CASES.values(), ids=list(DIFF_CASES))
+def test_diff_chart(billboard_data, expected):
+    diff = diff_chart(billboard_data, PREVIOUS)
+
+    assert list(diff['new']) == expected['new']
+    assert [(name, song_id, rank, popularity) for name, _, song_id, rank, popularity in diff['moved']] == expected['moved']
+    matched = {song_id for _, song_id, _, _ in expected['moved']}
+    assert diff['dropped'] == [(row[0], row[1], row[3]) for row in PREVIOUS if row[0] not in matched]
+
+def test_diff_chart_against_empty_week():
+    billboard_data = {'Snooze': {'ranking': 1, 'artists': ['SZA']}}
+    assert diff_chart(billboard_data, []) == {'new': billboard_data, 'moved': [], 'dropped': []}
+
+class FakeSpotify:
+    """
+    Answers search, artist_top_tracks and tracks from canned data, and logs every call.
+    """
+
+    def __init__(self, popularity):
+        # Current popularity per track id
+        self.popularity = popularity
+        self.calls = []
+
+    def _track(self, track_id, title, artist):
+        return {
+            'id': track_id,
+            'name': title,
+            'popularity': self.popularity[track_id],
+            'album': {'name': f"{title} (Album)", 'release_date': '2024-01-01'},
+            'artists': [{'name': artist, 'id': 'a' + artist.lower()}],
+        }
+
+    def search(self, q, type, limit):
+        self.calls.append(('search', q))
+        title, artist = q.rsplit(' ', 1)
+        return {'tracks': {'items': [self._track('t' + title.lower(), title, artist)]}}
+
+    def artist_top_tracks(self, artist_id):
+        self.calls.append(('artist_top_tracks', artist_id))
+        return {'tracks': [{'name': f"{artist_id} hit {k}"} for k in range(1, 6)]}
+
+    def tracks(self, ids):
+        self.calls.append(('tracks', list(ids)))
+        return {'tracks': [self._track(i, i[1:].title(), 'Known') if i in self.popularity else None for i in ids]}
+
+@pytest.fixture
+def store(tmp_path):
+    """
+    A database whose 2024-01-06 chart has an enriched song (Alpha), a song
+    resolved to a track but stored without popularity (Beta), a backfilled
+    song with no Spotify data at all (Gamma) and one that drops off (Omega).
+    """
+    db_name = str(tmp_path / 'delta.sqlite')
+    create_music_db(db_name)
+    week = [('Alpha', ['Ann'], 1, 80), ('Beta', ['Bo'], 2, None), ('Gamma', ['Cy'], 3, None), ('Omega', ['Eve'], 4, 60)]
+    with MusicStore(db_name) as store:
+        store.insert_songs(((title, credit, rank, popularity, None) for title, credit, rank, popularity in week),
+                           '2024-01-06')
+        store.insert_resolutions([(*resolution_key('Alpha', ['Ann']), 'talpha', ['aann']),
+                                  (*resolution_key('Beta', ['Bo']), 'tbeta', ['abo']),
+                                  (*resolution_key('Omega', ['Eve']), 'tomega', ['aeve'])])
+        store.commit()
+        yield store
+
+NEXT_WEEK = {
+    'Beta': {'ranking': 1, 'artists': ['Bo']},
+    'Alpha': {'ranking': 2, 'artists': ['Ann']},
+    'Gamma': {'ranking': 3, 'artists': ['Cy']},
+    'Delta': {'ranking': 4, 'artists': ['Dee']},
+}
+
+def week_entries(store, chart_date):
+    return store.conn.execute("""
+        SELECT ChartEntries.rank, Songs.name, ChartEntries.popularity
+        FROM ChartEntries JOIN Songs ON Songs.id = ChartEntries.song_id
+        WHERE chart_date = ? ORDER BY rank
+    """, (chart_date,)).fetchall()
+
+def test_run_delta(store):
+    sp = FakeSpotify({'talpha': 85, 'tbeta': 55, 'tgamma': 40, 'tdelta': 30})
+
+    result = run_delta(store, NEXT_WEEK, '2024-01-13', max_workers=2, sp=sp)
+
+    assert result == {'previous_week': '2024-01-06', 'new': 1, 'moved': 3, 'dropped': 1,
+                      'entries_written': 4, 'top_tracks_added': 10}
+    # Alpha carries last week's popularity; Beta had none to carry, so it is
+    # re-read by track id; Gamma was never enriched, so it is searched like Delta
+    assert week_entries(store, '2024-01-13') == [(1, 'Beta', 55), (2, 'Alpha', 80), (3, 'Gamma', 40), (4, 'Delta', 30)]
+    assert ('tracks', ['tbeta']) in sp.calls
+    assert sorted(q for call, q in sp.calls if call == 'search') == ['Delta Dee', 'Gamma Cy']
+
+def test_run_delta_refresh(store):
+    sp = FakeSpotify({'talpha': 85, 'tbeta': 55, 'tgamma': 40, 'tdelta': 30})
+
+    run_delta(store, NEXT_WEEK, '2024-01-13', refresh=True, max_workers=2, sp=sp)
+
+    assert week_entries(store, '2024-01-13')[:2] == [(1, 'Beta', 55), (2, 'Alpha', 85)]
+    assert ('tracks', ['tbeta', 'talpha']) in sp.calls
+
+def test_run_delta_first_week(tmp_path):
+    db_name = str(tmp_path / 'empty.sqlite')
+    create_music_db(db_name)
+    sp = FakeSpotify({'talpha': 85})
+    with MusicStore(db_name) as store:
+        result = run_delta(store, {'Alpha': {'ranking': 1, 'artists': ['Ann']}}, '2024-01-13', max_workers=2, sp=sp)
+        assert result['previous_week'] is None
+        assert (result['new'], result['moved'], result['entries_written']) == (1, 0, 1)
+        assert week_entries(store, '2024-01-13') == [(1, 'Alpha', 85)]
@@ -0,0 +1,73 @@
+"""
+Offline ingest from a recorded archive (tests/fixtures/replay_week.jsonl.gz).
+
+The archive holds one Hot 100 page with five songs and every Spotify
+response the default pipeline needs for it, including a 429 that is
+answered on the second try.
+"""
+import sqlite3
+
+import pytest
+import requests
+
+import main
+from http_archive import ReplayMiss, load_archive, request_key, replaying
+
+ARCHIVE = 'replay_week.jsonl.gz'
+
+def test_request_key_ignores_query_order():
+    assert (request_key('get', 'https://api.spotify.com/v1/search?type=track&q=Snooze')
+            == request_key('GET', 'https://api.spotify.com/v1/search?q=Snooze&type=track'))
+
+def test_replay_ingest(tmp_path, monkeypatch, fixture_path, capsys):
+    monkeypatch.chdir(tmp_path)
+    db_name = str(tmp_path / 'replay.sqlite')
+
+    main.main(['--replay', fixture_path(ARCHIVE), '--db', db_name])
+
+    out = capsys.readouterr().out
+    assert "Replayed 12 api.spotify.com, 1 www.billboard.com" in out
+    assert "inserted 5 new songs and 30 artist top tracks" in out
+    conn = sqlite3.connect(db_name)
+    try:
+        assert conn.execute("""
+            SELECT ChartEntries.rank, Songs.name, ChartEntries.popularity, Albums.name
+            FROM ChartEntries
+            JOIN Songs ON Songs.id = ChartEntries.song_id
+            JOIN Albums ON Albums.id = Songs.album_id
+            WHERE ChartEntries.chart_date = '2024-01-13'
+            ORDER BY ChartEntries.rank
+        """).fetchall() == [
+            (1, 'Lovin On Me', 95, 'Lovin On Me'),
+            (2, 'Lose Control', 90, "I've Tried Everything But Therapy (Part 1)"),
+            (3, 'Snooze', 88, 'SOS'),
+            (4, 'Need A Favor', 84, 'Whitsitt Chapel'),
+            (5, 'I Remember Everything', 86, 'Zach Bryan'),
+        ]
+        assert conn.execute("SELECT count(*) FROM SongArtists").fetchone()[0] == 6
+        assert conn.execute("SELECT count(*) FROM ArtistTopTracks").fetchone()[0] == 30
+        assert conn.execute("SELECT count(*) FROM Resolutions").fetchone()[0] == 5
+    finally:
+        conn.close()
+
+def test_replay_repeats_recorded_order(fixture_path):
+    # The archive has a 429 followed by a 200 for this search
+    url = 'https://api.spotify.com/v1/search?q=Snooze+SZA&type=track&offset=0&limit=1'
+    assert [e['status'] for e in load_archive(fixture_path(ARCHIVE))[request_key('GET', url)]] == [429, 200]
+
+    with replaying(fixture_path(ARCHIVE)) as log:
+        statuses = [requests.get(url).status_code for _ in range(3)]
+
+    assert statuses == [429, 200, 200]
+    assert log.total() == 3
+
+def test_unrecorded_request_raises_replay_miss(fixture_path):
+    with replaying(fixture_path(ARCHIVE)) as log:
+        with pytest.raises(ReplayMiss):
+            requests.get('https://api.spotify.com/v1/tracks/0000000000000000000000')
+        # Handled like the network being down
+        with pytest.raises(requests.exceptions.ConnectionError):
+            requests.get('https://www.billboard.com/charts/hot-100/1958-08-09/')
+
+    assert log.misses == 2
+    assert log.total() == 0
@@ -0,0 +1,79 @@
+"""
+Schema migrations of a baseline (version 1) database, including several
+processes opening it at once.
+"""
+import multiprocessing
+import sqlite3
+
+import pytest
+
+from database import MIGRATIONS, SCHEMA_VERSION, connect, current_chart_date, migrate
+
+# (name, rank, popularity, album) rows of the original Songs table
+LEGACY_SONGS = [('Luther', 1, 90, 'GNX'), ('Espresso', 2, 85, "Short n' Sweet"), ('Lose Control', 3, 80, None)]
+
+def baseline_db(path, releases):
+    """
+    Creates a version 1 database holding LEGACY_SONGS, with `releases`
+    mapping album name to its stored release date.
+    """
+    conn = sqlite3.connect(path, isolation_level=None)
+    try:
+        MIGRATIONS[0](conn.cursor())
+        conn.execute('PRAGMA user_version = 1')
+        conn.executemany("INSERT INTO Albums (name, release_date) VALUES (?, ?)", releases.items())
+        conn.executemany('''
+            INSERT INTO Songs (name, rank, popularity, album_id)
+            VALUES (?, ?, ?, (SELECT id FROM Albums WHERE name = ?))
+        ''', LEGACY_SONGS)
+    finally:
+        conn.close()
+    return path
+
+def _migrate_when_released(db_name, barrier, results):
+    barrier.wait()
+    try:
+        conn = connect(db_name)
+        try:
+            results.put(migrate(conn))
+        finally:
+            conn.close()
+    except Exception as e:
+        results.put(repr(e))
+
+def test_concurrent_migrations_apply_once(tmp_path):
+    db_name = baseline_db(str(tmp_path / 'old.sqlite'), {'GNX': '2024-11-22', "Short n' Sweet": '2024-08-23'})
+    context = multiprocessing.get_context('fork')
+    barrier = context.Barrier(4)
+    results = context.Queue()
+
+    workers = [context.Process(target=_migrate_when_released, args=(db_name, barrier, results)) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(60)
+
+    assert sorted(results.get(timeout=5) for _ in workers) == [SCHEMA_VERSION] * 4
+    conn = sqlite3.connect(db_name)
+    try:
+        assert conn.execute('PRAGMA user_version').fetchone()[0] == SCHEMA_VERSION
+        assert conn.execute("SELECT chart_date, count(*) FROM ChartEntries GROUP BY chart_date").fetchall() == [
+            ('2024-11-23', 3)]
+    finally:
+        conn.close()
+
+@pytest.mark.parametrize('releases, expected', [
+    ({'GNX': '2024-11-22', "Short n' Sweet": '2024-08'}, '2024-11-23'),
+    ({'GNX': '2024', "Short n' Sweet": '2024-00-00'}, '2024-01-06'),
+    ({'GNX': '0000', "Short n' Sweet": '0000'}, None),
+], ids=['newest release', 'unparseable newest skipped', 'placeholders only'])
+def test_legacy_chart_date(tmp_path, releases, expected):
+    db_name = baseline_db(str(tmp_path / 'old.sqlite'), releases)
+    conn = connect(db_name)
+    try:
+        migrate(conn)
+        dates = conn.execute("SELECT DISTINCT chart_date FROM ChartEntries").fetchall()
+    finally:
+        conn.close()
+
+    assert dates == [(expected or current_chart_date(),)]
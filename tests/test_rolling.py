@@ -0,0 +1,78 @@
+"""
+Incremental rolling statistics: which partitions update() recomputes.
+"""
+import pytest
+
+from database import connect
+from rolling import RollingStats, compute_partition, partition_bounds
+from synthetic import populate
+
+@pytest.fixture
+def db_name(tmp_path):
+    db_name = str(tmp_path / 'rolling.sqlite')
+    populate(db_name, 20, seed=1)
+    return db_name
+
+def run(db_name, sql, params=()):
+    conn = connect(db_name)
+    try:
+        conn.execute(sql, params)
+    finally:
+        conn.close()
+
+def last_week(db_name):
+    conn = connect(db_name, read_only=True)
+    try:
+        return conn.execute("SELECT max(chart_date) FROM ChartEntries").fetchone()[0]
+    finally:
+        conn.close()
+
+def test_unchanged_database_recomputes_nothing(db_name):
+    stats = RollingStats(db_name, partition_weeks=4, max_workers=2)
+    assert len(stats.update()) == 5
+    assert stats.update() == []
+
+def test_edits_that_cancel_out_are_detected(db_name):
+    stats = RollingStats(db_name, partition_weeks=4, max_workers=2)
+    stats.update()
+    week = last_week(db_name)
+    # Swapping two popularities leaves every per-week sum unchanged
+    run(db_name, """
+        UPDATE ChartEntries SET popularity = CASE rank WHEN 1 THEN 10 ELSE 90 END
+        WHERE chart_date = ? AND rank IN (1, 2)
+    """, (week,))
+    stats.update()
+    run(db_name, """
+        UPDATE ChartEntries SET popularity = CASE rank WHEN 1 THEN 90 ELSE 10 END
+        WHERE chart_date = ? AND rank IN (1, 2)
+    """, (week,))
+
+    assert stats.update() == [4]
+    assert stats.rank_deltas(week).set_index('rank').loc[[1, 2], 'popularity'].tolist() == [90, 10]
+
+def test_relinked_song_recomputes_the_partitions_it_charted_in(db_name):
+    stats = RollingStats(db_name, partition_weeks=4, max_workers=2)
+    stats.update()
+    run(db_name, """
+        UPDATE SongArtists SET artist_id = (SELECT max(id) FROM Artists)
+        WHERE song_id = (SELECT song_id FROM ChartEntries WHERE chart_date = '1958-08-09' AND rank = 100)
+    """)
+
+    assert stats.update() == [0]
+
+def test_deleted_week_drops_its_partition(db_name):
+    stats = RollingStats(db_name, partition_weeks=4, max_workers=2)
+    stats.update()
+    run(db_name, "DELETE FROM ChartEntries WHERE chart_date >= '1958-11-29'")
+
+    assert stats.update() == []
+    assert sorted(stats.partitions) == [0, 1, 2, 3]
+
+def test_first_week_looks_back_over_a_gap(db_name):
+    start, end = partition_bounds(1, 4)
+    run(db_name, "DELETE FROM ChartEntries WHERE chart_date = '1958-08-30'")
+
+    deltas = compute_partition(db_name, start, end)['deltas']
+
+    first = deltas[deltas['chart_date'] == start]
+    assert first['previous_rank'].notna().any()
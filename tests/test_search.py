@@ -0,0 +1,97 @@
+"""
+Trigram search over the FTS5 indexes, the triggers keeping them in sync,
+and the normalized-title dedupe MusicStore.insert_songs falls back on.
+"""
+import pytest
+
+from database import connect, create_music_db, MusicStore
+from search import match_song, search
+
+# (title, billboard credit, rank, popularity) on 2024-01-06
+WEEK = [('Luther', ['Kendrick Lamar & SZA'], 1, 90), ('Die With A Smile', ['Lady Gaga & Bruno Mars'], 2, 88),
+        ('Espresso', ['Sabrina Carpenter'], 3, 85)]
+CREDITS = {'Luther': ['Kendrick Lamar', 'SZA'], 'Die With A Smile': ['Lady Gaga', 'Bruno Mars'],
+           'Espresso': ['Sabrina Carpenter']}
+
+@pytest.fixture
+def db_name(tmp_path):
+    db_name = str(tmp_path / 'search.sqlite')
+    create_music_db(db_name)
+    with MusicStore(db_name) as store:
+        store.insert_songs(((title, credit, rank, popularity, None) for title, credit, rank, popularity in WEEK),
+                           '2024-01-06')
+        store.insert_song_artists((title, credit, CREDITS[title]) for title, credit, _, _ in WEEK)
+    return db_name
+
+@pytest.fixture
+def conn(db_name):
+    conn = connect(db_name)
+    yield conn
+    conn.close()
+
+def names(results):
+    return [(kind, name) for _, kind, _, name in results]
+
+def test_misspelled_and_partial_names(conn):
+    assert names(search(conn, "lutehr", kinds=['song'])) == [('song', 'Luther')]
+    assert names(search(conn, "sabrina", kinds=['artist'])) == [('artist', 'Sabrina Carpenter')]
+    assert names(search(conn, "die with"))[0] == ('song', 'Die With A Smile')
+
+def test_score_threshold(conn):
+    (score, _, _, _), = search(conn, "espreso", kinds=['song'])
+    assert 0.5 <= score < 1
+
+    assert search(conn, "espreso", kinds=['song'], min_score=score + 0.01) == []
+    # Shares trigrams with "Espresso" but little else
+    assert names(search(conn, "presidential suite", kinds=['song'], min_score=0)) == [('song', 'Espresso')]
+    assert search(conn, "presidential suite", kinds=['song']) == []
+
+@pytest.mark.parametrize('sql, query, expected', [
+    ("INSERT INTO Songs (name, artists) VALUES ('Birds Of A Feather', 'Billie Eilish')",
+     "birds of a feather", ['Birds Of A Feather']),
+    ("UPDATE Songs SET name = 'Espresso (Remix)' WHERE name = 'Espresso'", "espresso", ['Espresso (Remix)']),
+    ("UPDATE Songs SET name = 'Please Please Please' WHERE name = 'Espresso'", "espresso", []),
+    ("DELETE FROM Songs WHERE name = 'Espresso'", "espresso", []),
+], ids=['insert', 'rename', 'rename away', 'delete'])
+def test_triggers_keep_index_in_sync(conn, sql, query, expected):
+    conn.execute("DELETE FROM ChartEntries")
+    conn.execute("DELETE FROM SongArtists")
+
+    conn.execute(sql)
+
+    assert [name for _, _, _, name in search(conn, query, kinds=['song'])] == expected
+    # Raises if the index disagrees with Songs
+    conn.execute("INSERT INTO SongSearch (SongSearch, rank) VALUES ('integrity-check', 1)")
+
+def test_match_song(conn):
+    luther = conn.execute("SELECT id FROM Songs WHERE name = 'Luther'").fetchone()[0]
+
+    assert match_song(conn, 'luther (with SZA)', ['Kendrick Lamar']) == luther
+    assert match_song(conn, 'Luther', ['SZA', 'Someone Else']) == luther
+    assert match_song(conn, 'Luther', ['Someone Else']) is None
+    assert match_song(conn, 'Lutherr', ['Kendrick Lamar']) is None
+
+def week_songs(store, chart_date):
+    return store.conn.execute("""
+        SELECT ChartEntries.rank, Songs.name FROM ChartEntries JOIN Songs ON Songs.id = ChartEntries.song_id
+        WHERE chart_date = ? ORDER BY rank
+    """, (chart_date,)).fetchall()
+
+def test_insert_songs_reuses_respelled_song(db_name):
+    next_week = [('Luther (feat. SZA)', ['Kendrick Lamar'], 1, 92), ('Die With A Smile', ['Lady Gaga', 'Bruno Mars'], 2, 89)]
+    with MusicStore(db_name) as store:
+        store.insert_songs(((title, credit, rank, popularity, None) for title, credit, rank, popularity in next_week),
+                           '2024-01-13')
+        # Later writes under the new spelling go to the matched song
+        assert store.insert_song_artists([('Luther (feat. SZA)', ['Kendrick Lamar'], ['Kendrick Lamar'])]) == 0
+
+        assert week_songs(store, '2024-01-13') == [(1, 'Luther'), (2, 'Die With A Smile')]
+        assert store.conn.execute("SELECT count(*) FROM Songs").fetchone()[0] == 3
+
+def test_insert_songs_matches_a_song_once_per_week(db_name):
+    next_week = [('Luther (feat. SZA)', ['Kendrick Lamar'], 1, 92), ('Luther', ['Kendrick Lamar & SZA'], 2, 90)]
+    with MusicStore(db_name) as store:
+        store.insert_songs(((title, credit, rank, popularity, None) for title, credit, rank, popularity in next_week),
+                           '2024-01-13')
+
+        assert week_songs(store, '2024-01-13') == [(1, 'Luther (feat. SZA)'), (2, 'Luther')]
@@ -0,0 +1,37 @@
+"""
+The persistent Spotify response cache: size bound, expiry and counters.
+"""
+from spotify_cache import ResponseCache
+
+def test_eviction_drops_least_recently_used_tenth(tmp_path):
+    with ResponseCache(str(tmp_path / 'cache.sqlite'), max_entries=20) as cache:
+        for n in range(20):
+            cache.set('search', f"q{n}", {'n': n})
+        # Replacing an entry does not grow the cache
+        cache.set('search', 'q0', {'n': 0})
+        assert cache.size == 20
+
+        cache.set('search', 'q20', {'n': 20})
+
+        assert cache.size == 18
+        remaining = {row[0] for row in cache.conn.execute('SELECT key FROM Responses')}
+        assert remaining == {f"q{n}" for n in [0] + list(range(4, 21))}
+
+def test_size_survives_reopen(tmp_path):
+    path = str(tmp_path / 'cache.sqlite')
+    with ResponseCache(path) as cache:
+        cache.set('search', 'luther kendrick lamar', {'tracks': {'items': []}})
+    with ResponseCache(path) as cache:
+        assert cache.size == 1
+
+def test_purge_expired_and_summary(tmp_path):
+    with ResponseCache(str(tmp_path / 'cache.sqlite'), ttls={'search': 0}) as cache:
+        cache.set('search', 'luther kendrick lamar', {'tracks': {'items': []}})
+        cache.set('artist_top_tracks', 'a1', {'tracks': []})
+        cache.conn.execute('UPDATE Responses SET created_at = created_at - 1')
+
+        assert cache.get('search', 'luther kendrick lamar') is None
+        assert cache.get('artist_top_tracks', 'a1') == {'tracks': []}
+        assert cache.purge_expired() == 1
+        assert cache.size == 1
+        assert cache.summary() == "artist_top_tracks 1 hits / 0 misses, search 0 hits / 1 misses"
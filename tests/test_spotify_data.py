@@ -0,0 +1,115 @@
+"""
+Concurrent Spotify enrichment against a local stub of the Web API.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+import spotipy
+
+from http_archive import ReplayAuth
+from spotify_data import RateLimiter, call_with_limiter, fetch_spotify_data, get_spotify_client
+
+BILLBOARD = {
+    f"Song {n}": {'ranking': n, 'artists': [f"Artist{n % 3}"]} for n in range(1, 7)
+}
+
+class SpotifyStub(BaseHTTPRequestHandler):
+    """
+    Answers /search and /artists/<id>/top-tracks deterministically. The first
+    `throttled` requests get 429 with a Retry-After of `retry_after` seconds.
+    """
+    throttled = 0
+    retry_after = '1'
+    lock = threading.Lock()
+    requests = []
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body, headers=()):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        for name, value in headers:
+            self.send_header(name, value)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        with self.lock:
+            self.requests.append((time.monotonic(), url.path))
+            throttle = len(self.requests) <= self.throttled
+        if throttle:
+            return self._send(429, {'error': {'status': 429, 'message': 'API rate limit exceeded'}},
+                              [('Retry-After', self.retry_after)])
+        if url.path == '/v1/search':
+            title, artist = parse_qs(url.query)['q'][0].rsplit(' ', 1)
+            track = {
+                'id': title.replace(' ', '').lower(),
+                'name': title,
+                'popularity': 50 + len(title),
+                'album': {'name': f"{artist} Album", 'release_date': '2024-03-01'},
+                'artists': [{'name': artist, 'id': artist.lower()}, {'name': 'Guest', 'id': 'guest'}],
+            }
+            return self._send(200, {'tracks': {'items': [track]}})
+        if url.path.startswith('/v1/artists/') and url.path.endswith('/top-tracks'):
+            artist_id = url.path.split('/')[3]
+            return self._send(200, {'tracks': [{'name': f"{artist_id} hit {k}"} for k in range(1, 8)]})
+        self._send(404, {'error': {'status': 404, 'message': 'Not found'}})
+
+@pytest.fixture
+def stub(serve):
+    handler = type('Stub', (SpotifyStub,), {'requests': []})
+    base = serve(handler)
+    client = get_spotify_client(api_prefix=base + '/v1/', manage_retries=True, auth_manager=ReplayAuth())
+    return handler, client
+
+def test_concurrent_matches_sequential(stub):
+    handler, sp = stub
+    sequential = fetch_spotify_data(BILLBOARD, limit=10, sp=sp)
+    concurrent = fetch_spotify_data(BILLBOARD, limit=10, max_workers=4, sp=sp, limiter=RateLimiter(rate=100))
+
+    assert concurrent == sequential
+    # Same dicts in the same insertion order
+    assert list(concurrent[0]) == list(sequential[0])
+    assert list(concurrent[1]) == list(sequential[1])
+    assert len(sequential[0]) == len(BILLBOARD)
+    assert sequential[1]['Guest'] == ['guest hit 1', 'guest hit 2', 'guest hit 3', 'guest hit 4', 'guest hit 5']
+
+def test_concurrent_absorbs_429(stub):
+    handler, sp = stub
+    expected = fetch_spotify_data(BILLBOARD, limit=10, sp=sp)
+    handler.requests.clear()
+    handler.throttled = 2
+    handler.retry_after = '0.2'
+
+    assert fetch_spotify_data(BILLBOARD, limit=10, max_workers=4, sp=sp, limiter=RateLimiter(rate=100)) == expected
+
+def test_limiter_honours_retry_after(stub):
+    handler, sp = stub
+    handler.throttled = 1
+    limiter = RateLimiter(rate=50)
+
+    result = call_with_limiter(limiter, sp.search, q='Song 1 Artist1', type='track', limit=1)
+
+    assert result['tracks']['items'][0]['name'] == 'Song 1'
+    (rejected, _), (accepted, _) = handler.requests
+    assert accepted - rejected >= 1.0
+    assert limiter.rate < 50
+
+def test_limiter_gives_up_after_max_retries(stub):
+    handler, sp = stub
+    handler.throttled = 10
+    handler.retry_after = '0'
+
+    with pytest.raises(spotipy.SpotifyException) as raised:
+        call_with_limiter(RateLimiter(rate=100), sp.search, q='Song 1 Artist1', type='track', limit=1,
+                          max_retries=2)
+    assert raised.value.http_status == 429
+    assert len(handler.requests) == 3
@@ -1,50 +1,70 @@
-import sqlite3
+import argparse
+import hashlib
+import importlib
+import multiprocessing
 import os
-import matplotlib
-import matplotlib.pyplot as plt
-import numpy as np
+import time
+from concurrent.futures import ProcessPoolExecutor
+import metrics
 
-def connect_to_music_data():
+DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "music_data.sqlite")
+
+class _LazyModule:
+    """
+    Stands in for a module and imports it on first attribute access, so
+    runs that only check data (e.g. every chart is unchanged) never pay
+    for importing matplotlib. numpy, pandas and the analytics engine are
+    likewise imported inside the functions that use them.
     """
-    Sets up a SQLite database connection and cursor to music_data.
 
-    INPUT - NONE
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
 
-    RETURNS - Tuple (cursor, connection)
+plt = _LazyModule('matplotlib.pyplot')
 
+def get_engine(db_path=DB_PATH):
     """
-    path = os.path.dirname(os.path.abspath(__file__))
-    conn = sqlite3.connect(path + "/" + "music_data.sqlite")
-    cur = conn.cursor()
-    return cur, conn
+    INPUT - database file
+    RETURN - the shared analytics engine for it (see analytics.get_engine)
+    """
+    from analytics import get_engine
+    return get_engine(db_path)
 
-def graph_scatter_rank_vs_popularity(cur):
+def finish_figure(fig, filename, show=True, dpi=None):
+    """
+    Saves a finished graph, then shows it or frees it.
+
+    INPUT - figure, output file (format taken from its extension), show flag, DPI (default: matplotlib's)
+    OUTPUT - image file
+    RETURN - None
+    """
+    with metrics.span('visuals.save'):
+        fig.savefig(filename, bbox_inches='tight', dpi=dpi)
+    if show:
+        plt.show()
+    else:
+        # batch renders draw many figures in one process, so release each one
+        plt.close(fig)
+
+def graph_scatter_rank_vs_popularity(engine=None, filename="rank_vs_popularity.png", show=True, dpi=None):
     """
     Graphs scatter plot on Billboard rank vs Spotify popularity.
 
-    INPUT - database cursor
+    INPUT - analytics engine (default: the shared engine for music_data.sqlite),
+            output file, show flag, DPI
     OUTPUT - scatter plot of rank vs popularity
     RETURN - None
     """
     ### retrieve ranks and popularities
-    rank = []
-    popularity = []
-    # get data
-    cur.execute(
-        """
-        SELECT rank, popularity
-        FROM Songs
-        WHERE popularity IS NOT NULL
-        """
-    )
-    # process results
-    result = cur.fetchall()
-    for row in result:
-        r = row[0]
-        p = row[1]
-
-        rank.append(r)
-        popularity.append(p)
+    data = (engine or get_engine(DB_PATH)).rank_vs_popularity()
+    rank = data['rank'].to_numpy()
+    popularity = data['popularity'].to_numpy()
     
     ### make plot
     # create the graph
@@ -60,119 +80,77 @@ def graph_scatter_rank_vs_popularity(cur):
     ax.set_title('Billboard Rank vs Spotify Popularity for Top 100 Songs')
     ax.grid()
 
-    # save the graph
-    fig.savefig("rank_vs_popularity.png", bbox_inches='tight')
-
-    # show the graph
-    plt.show()
+    # save, then show the graph
+    finish_figure(fig, filename, show, dpi)
 
-def graph_scatter_album_release_rank_num(cur):
+def graph_scatter_album_release_rank_num(engine=None, filename="rank_by_album_release.png", show=True, dpi=None):
     """
     Graphs scatter plot of number of billboard ranking songs per album release date by year.
 
-    INPUT - database cursor
+    INPUT - analytics engine (default: the shared engine for music_data.sqlite),
+            output file, show flag, DPI
     OUTPUT - scatter plot of number of ranking songs per release date by year
     RETURN - None
     """
-    # get data
-    releaseDate = []
-    cur.execute(
-        """
-        SELECT Albums.release_date
-        FROM Songs
-        JOIN Albums ON Albums.id = Songs.album_id
-        WHERE Albums.release_date IS NOT NULL
-        ORDER BY Albums.release_date
-        """
-    )
-    result = cur.fetchall()
-    # process results
-    for row in result:
-        d = row[0][:7]
-        y = d[0:4]
-
-        releaseDate.append(d)
-    
-    # split release dates
-    years = {}
+    import numpy as np
+
+    # get data, already bucketed: 13 counts per release year (month 0 = year-only release date)
+    data = (engine or get_engine(DB_PATH)).release_month_counts()
+    years = data['year'].to_numpy()[::13]
+    counts = data['songs'].to_numpy().reshape(-1, 13)
     monthMarks = ['01', '02', '03', '04', '05', '06', '07', '08', '09', '10', '11', '12']
-    prevMonth = 0
-    prevYear = ''
-    for date in range(len(releaseDate)):
-        y = releaseDate[date][:4]
-        m = releaseDate[date][-2:]
-        
-        if y != prevYear:
-            prevYear = y
-            years[prevYear] = [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0]
-            
-            prevMonth = 0
-            for i in range(len(monthMarks)):
-                if monthMarks[prevMonth] == m:
-                    break
-                prevMonth += 1
-            years[prevYear][prevMonth] += 1
-            continue
-        
-        while m != monthMarks[prevMonth]:
-            prevMonth += 1
-        
-        years[prevYear][prevMonth] += 1
-    
+
+    # only add a column for year-only dates if there are any
+    marks = monthMarks
+    columns = counts[:, 1:]
+    if counts[:, 0].any():
+        marks = monthMarks + ['YYYY']
+        columns = np.hstack([counts[:, 1:], counts[:, :1]])
 
     ### make plot
     # create the graph
     fig, ax = plt.subplots()
 
-    colors = ['darkblue', 'lightblue', 'turquoise', 'pink', 'lightgray']
-    c = -1
-    for year, months in years.items():
-        c += 1
-        ax.scatter(monthMarks, months, s=65, facecolors=colors[c], edgecolors='indigo', linewidths=0.5, label=year)
-    
+    # one color per year, spread over a colormap so any number of years fits
+    cmap = plt.get_cmap('viridis')
+    colors = cmap(np.linspace(0, 1, max(len(years), 1)))
+    for c, year in enumerate(years):
+        ax.scatter(marks, columns[c], s=65, facecolors=colors[c], edgecolors='indigo', linewidths=0.5, label=str(year))
+
     # start at origin
     ax.set_ylim(bottom=0)
     # label everything
     ax.set_xlabel('Release Date (MM)')
     ax.set_ylabel('Number of Billboard Ranking Songs')
-    ax.legend()
-    ax.set_title(f"Number of Billboard Ranking Songs per Album Release Date as of {prevYear}-{monthMarks[prevMonth]} (YYYY-MM)")
+    if len(years) <= 10:
+        ax.legend()
+    elif len(years):
+        # too many years for a legend, so show the year scale instead
+        scale = plt.cm.ScalarMappable(cmap=cmap, norm=plt.Normalize(years[0], years[-1]))
+        fig.colorbar(scale, ax=ax, label='Release Year')
+    latest = ''
+    if len(years):
+        last_months = np.nonzero(counts[-1, 1:])[0]
+        latest = f"{years[-1]}-{monthMarks[last_months[-1]]}" if len(last_months) else str(years[-1])
+    ax.set_title(f"Number of Billboard Ranking Songs per Album Release Date as of {latest} (YYYY-MM)")
     ax.grid()
 
-    # save the graph
-    fig.savefig("rank_by_album_release.png", bbox_inches='tight')
-
-    # show the graph
-    plt.show()    
+    # save, then show the graph
+    finish_figure(fig, filename, show, dpi)
 
-def graph__bar_top_artists_by_song_count(cur):
+def graph__bar_top_artists_by_song_count(engine=None, filename="top_artists_by_song.png", show=True, dpi=None):
     """
     Graph bar graph of number of top songs each artist has.
 
-    INPUT - database cursor
+    INPUT - analytics engine (default: the shared engine for music_data.sqlite),
+            output file, show flag, DPI
     OUTPUT - bar graph of number of top songs per artist
     RETURN - None
     """
-    # get data
-    artist = []
-    count = []
-    cur.execute(
-        """
-        SELECT Artists.name AS artist, COUNT(*) AS song_count
-        FROM Songs
-        JOIN ArtistTopTracks ON Songs.name = ArtistTopTracks.track_name
-        JOIN Artists ON ArtistTopTracks.artist_id = Artists.id
-        GROUP BY Artists.name
-        ORDER BY song_count
-        """
-    )
-    results = cur.fetchall()
-    for row in results:
-        a = row[0]
-        c = row[1]
-
-        artist.append(a)
-        count.append(c)
+    # get data, fewest songs first so the longest bar ends up on top
+    data = (engine or get_engine(DB_PATH)).top_artists_by_song_count().iloc[::-1]
+    artist = data['artist'].tolist()
+    count = data['song_count'].to_numpy()
 
 
     ### make plot
@@ -189,51 +167,24 @@ def graph__bar_top_artists_by_song_count(cur):
     ax.set_title('Top Artists by Number of Ranking Songs')
     ax.grid()
 
-    # save the graph
-    fig.savefig("top_artists_by_song.png", bbox_inches='tight')
+    # save, then show the graph
+    finish_figure(fig, filename, show, dpi)
 
-    # show the graph
-    plt.show()    
 
-
-def graph_pie_artist_popularity_sum(cur):
+def graph_pie_artist_popularity_sum(engine=None, filename="artists_by_popularity.png", show=True, dpi=None):
     """
     Makes a pie chart of artists by the sum of the popularity of their top songs.
     Special focus on the top 10 artists.
 
-    INPUT - database cursor
+    INPUT - analytics engine (default: the shared engine for music_data.sqlite),
+            output file, show flag, DPI
     OUTPUT - pie chart of artists by sum of ranking song popularities
     RETURN - None
     """
-    popularity = []
-    artist = []
-    # collect data
-    cur.execute(
-        """
-        SELECT Artists.name AS artist, SUM(Songs.popularity) AS total_popularity
-        FROM Songs
-        JOIN ArtistTopTracks ON Songs.name = ArtistTopTracks.track_name
-        JOIN Artists ON ArtistTopTracks.artist_id = Artists.id
-        GROUP BY Artists.name
-        ORDER BY total_popularity DESC
-        """
-    )
-    # process results -- save top 10 artists
-    result = cur.fetchall()
-    remaining = 0
-    count = 0
-    for row in result:
-        if(count < 10):
-            a = row[0]
-            p = row[1]
-
-            artist.append(a)
-            popularity.append(p)
-            count += 1
-        else:
-            remaining += row[1]
-    artist.append("Other")
-    popularity.append(remaining)
+    # collect data -- save top 10 artists, everyone else is "Other"
+    data = (engine or get_engine(DB_PATH)).artist_popularity_sum()
+    artist = data['artist'].iloc[:10].tolist() + ["Other"]
+    popularity = data['total_popularity'].iloc[:10].tolist() + [int(data['total_popularity'].iloc[10:].sum())]
 
     ### make plot
     # create the graph
@@ -248,17 +199,178 @@ def graph_pie_artist_popularity_sum(cur):
     # label everything
     plt.axis('equal')
 
-    # save the graph
-    fig.savefig("artists_by_popularity.png", bbox_inches='tight')
+    # save, then show the graph
+    finish_figure(fig, filename, show, dpi)
+
+# every chart the batch renderer draws: name -> (graph function, engine dataset it plots)
+# (add new graphs here so they are rendered and cached with the others)
+CHARTS = {
+    "rank_vs_popularity": (graph_scatter_rank_vs_popularity, "rank_vs_popularity"),
+    "rank_by_album_release": (graph_scatter_album_release_rank_num, "release_month_counts"),
+    "top_artists_by_song": (graph__bar_top_artists_by_song_count, "top_artists_by_song_count"),
+    "artists_by_popularity": (graph_pie_artist_popularity_sum, "artist_popularity_sum"),
+}
+
+def _matplotlib_version():
+    """
+    RETURN - installed matplotlib version, read from package metadata without importing it
+    """
+    from importlib.metadata import version
+    return version('matplotlib')
+
+def chart_hash(name, engine, fmt="png", dpi=None):
+    """
+    Fingerprints everything a chart image depends on: its dataset, the
+    plotting code and the output options.
 
-    # show the graph
-    plt.show()    
+    INPUT - chart name from CHARTS, analytics engine, image format, DPI
+    OUTPUT - NONE
+    RETURN - sha256 hex digest
+    """
+    import pandas as pd
+
+    graph, dataset = CHARTS[name]
+    data = getattr(engine, dataset)()
+    digest = hashlib.sha256()
+    digest.update(repr((name, fmt, dpi, list(data.columns), _matplotlib_version())).encode())
+    digest.update(graph.__code__.co_code)
+    digest.update(repr(graph.__code__.co_consts).encode())
+    digest.update(pd.util.hash_pandas_object(data, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+def _hash_path(filename):
+    """
+    INPUT - image file
+    RETURN - file the image's content hash is stored in, next to the image
+    """
+    return filename + ".sha256"
+
+def _write_hash(filename, digest):
+    """
+    Records the content hash of a rendered image next to it.
+
+    INPUT - image file, content hash of what it shows
+    OUTPUT - <filename>.sha256
+    RETURN - None
+    """
+    with open(_hash_path(filename), "w") as f:
+        f.write(digest + "\n")
+
+def is_fresh(filename, digest):
+    """
+    INPUT - image file, content hash of what it should show
+    OUTPUT - NONE
+    RETURN - True if the image exists and was rendered from that exact content
+    """
+    if not os.path.exists(filename):
+        return False
+    try:
+        with open(_hash_path(filename)) as f:
+            return f.read().strip() == digest
+    except OSError:
+        return False
+
+def render_chart(name, out_dir=".", fmt="png", dpi=None, db_path=DB_PATH, digest=None):
+    """
+    Renders one chart headlessly (Agg backend, never shown).
+    Runs inside a batch worker process, which opens its own engine.
+
+    INPUT - chart name from CHARTS, output directory, image format, DPI, database file,
+            content hash to record next to the image (default: none)
+    OUTPUT - image file <out_dir>/<name>.<fmt> (and <name>.<fmt>.sha256)
+    RETURN - seconds spent rendering
+    """
+    plt.switch_backend('Agg')
+    start = time.perf_counter()
+    filename = os.path.join(out_dir, f"{name}.{fmt}")
+    with metrics.span('visuals.render.' + name):
+        CHARTS[name][0](get_engine(db_path), filename=filename, show=False, dpi=dpi)
+    if digest is not None:
+        # written only after the image, so a failed render is never marked fresh
+        _write_hash(filename, digest)
+    return time.perf_counter() - start
+
+def render_all(names=None, out_dir=".", fmt="png", dpi=None, workers=None, db_path=DB_PATH, force=False):
+    """
+    Renders charts in parallel worker processes, skipping charts whose
+    dataset and plotting parameters have not changed since their last render.
+
+    INPUT - chart names (default: all of CHARTS), output directory, image format,
+            DPI, number of worker processes (default: one per chart), database file,
+            force flag (render even if unchanged)
+    OUTPUT - image files in out_dir
+    RETURN - dictionary of chart name -> render seconds, None if skipped as unchanged,
+             or the exception that stopped it
+    """
+    names = list(names or CHARTS)
+    os.makedirs(out_dir, exist_ok=True)
+    engine = get_engine(db_path)
+    results = {}
+    stale = {}
+    for name in names:
+        digest = chart_hash(name, engine, fmt, dpi)
+        if not force and is_fresh(os.path.join(out_dir, f"{name}.{fmt}"), digest):
+            results[name] = None
+        else:
+            stale[name] = digest
+    if not stale:
+        return results
+
+    # Spawned, not forked: a forked worker would inherit the SQLite connection
+    # of the engine cached in this process
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers or len(stale), mp_context=context) as pool:
+        futures = {name: pool.submit(render_chart, name, out_dir, fmt, dpi, db_path, digest)
+                   for name, digest in stale.items()}
+        for name, future in futures.items():
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                results[name] = e
+            else:
+                # Spans recorded inside the worker process are lost with it
+                metrics.observe('visuals.render.' + name, results[name])
+    return {name: results[name] for name in names}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Draw the music data charts.")
+    parser.add_argument('--batch', action='store_true', help="render headlessly in parallel instead of showing each chart")
+    parser.add_argument('--charts', nargs='+', choices=list(CHARTS), help="charts to render in batch mode (default: all)")
+    parser.add_argument('--format', default='png', help="image format in batch mode, e.g. png, svg, pdf (default: png)")
+    parser.add_argument('--dpi', type=int, default=None, help="image resolution (default: matplotlib's)")
+    parser.add_argument('--out-dir', default='.', help="where batch mode writes images (default: current directory)")
+    parser.add_argument('--workers', type=int, default=None, help="render processes in batch mode (default: one per chart)")
+    parser.add_argument('--force', action='store_true', help="re-render in batch mode even if a chart's data is unchanged")
+    args = parser.parse_args(argv)
+
+    if not args.batch:
+        # make all visuals, one window at a time
+        engine = get_engine(DB_PATH)
+        for name, (graph, _) in CHARTS.items():
+            filename = f"{name}.png"
+            with metrics.span('visuals.render.' + name):
+                graph(engine, filename=filename, dpi=args.dpi)
+            # the image was just overwritten, so its hash must describe this render
+            _write_hash(filename, chart_hash(name, engine, "png", args.dpi))
+        return 0
+
+    start = time.perf_counter()
+    results = render_all(args.charts, args.out_dir, args.format, args.dpi, args.workers, force=args.force)
+    failed = 0
+    skipped = 0
+    for name, result in results.items():
+        if result is None:
+            skipped += 1
+            print(f"✅ {name}.{args.format} unchanged, skipped")
+        elif isinstance(result, Exception):
+            failed += 1
+            print(f"❌ {name}: {result!r}")
+        else:
+            print(f"✅ {name}.{args.format} rendered in {result * 1000:.0f} ms")
+    rendered = len(results) - failed - skipped
+    print(f"Rendered {rendered}, skipped {skipped} unchanged, {failed} failed in {time.perf_counter() - start:.2f}s")
+    return 1 if failed else 0
 
 # make all visuals
 if __name__ == "__main__":
-    cur, conn = connect_to_music_data()
-    graph_scatter_rank_vs_popularity(cur)
-    graph_scatter_album_release_rank_num(cur)
-    graph__bar_top_artists_by_song_count(cur)
-    graph_pie_artist_popularity_sum(cur)
-    conn.close()
+    raise SystemExit(main())